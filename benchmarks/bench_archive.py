@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""benchmark zipping a setup file: ZipFile.write vs. the parallel writer
+
+The input mixes random (incompressible, like an LZMA compressed setup
+file) and repetitive data.
+
+usage: python benchmarks/bench_archive.py [size in MB] [workers ...]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from innosetup import archive
+
+
+def make_input(filename, size):
+    block = os.urandom(1024 * 1024)
+    with open(filename, 'wb') as fp:
+        for i in range(size):
+            fp.write(block if i % 2 else os.urandom(1024 * 1024))
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(args):
+    size = int(args[0]) if args else 256
+    workers = [int(i) for i in args[1:]] or [2, 4, os.cpu_count() or 1]
+    dirname = tempfile.mkdtemp(prefix='innosetup-bench-')
+    try:
+        setupfile = os.path.join(dirname, 'setup.exe')
+        zipname = setupfile + '.zip'
+        make_input(setupfile, size)
+
+        def zipfile_write():
+            with zipfile.ZipFile(zipname, 'w', zipfile.ZIP_DEFLATED) as z:
+                z.write(setupfile, 'setup.exe')
+
+        cases = [
+            ('ZipFile.write', zipfile_write),
+            ('package', lambda: archive.package(setupfile, zipname)),
+            ]
+        for n in sorted(set(workers)):
+            cases.append(('package workers=%d' % n,
+                          lambda n=n: archive.package(setupfile, zipname,
+                                                      workers=n)))
+        for name, func in cases:
+            elapsed = timed(func)
+            print('%-22s %8.3f s %8.1f MB/s %12d bytes'
+                  % (name, elapsed, size / elapsed, os.path.getsize(zipname)))
+    finally:
+        shutil.rmtree(dirname)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""benchmark suite of `InnoScript` script generation
+
+Each case runs the hot paths of `InnoScript.create` with a fake builder
+and reports the best time and the peak of traced memory.
+
+usage: python benchmarks/bench_generate.py [--quick] [case ...]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+from fakes import FakeBuilder, NullIssFile
+
+from innosetup.innosetup import InnoScript
+
+
+# (name, files, user script lines, services, comservers)
+CASES = [
+    ('small', 100, 10, 1, 1),
+    ('medium', 5000, 100, 4, 4),
+    ('large', 20000, 1000, 10, 10),
+    ('huge', 100000, 5000, 20, 20),
+]
+QUICK = ('small', 'medium')
+
+
+def measure(func, repeat):
+    """get (best seconds, peak bytes) of `func()`"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def sections(script, text):
+    return dict((name, lines) for _, name, lines in script.parse_iss(text))
+
+
+def bench_case(name, count, userlines, services, comservers, repeat):
+    builder = FakeBuilder(count, services, comservers)
+    try:
+        text = builder.user_script(userlines)
+        builder.inno_script = text
+        script = InnoScript(builder)
+        user = sections(script, text)
+        fp = NullIssFile()
+
+        steps = [
+            ('parse_iss', lambda: list(script.parse_iss(text))),
+            ('handle_iss_setup',
+             lambda: script.handle_iss_setup(user['Setup'], fp)),
+            ('handle_iss_files',
+             lambda: script.handle_iss_files(user['Files'], fp)),
+            ('handle_iss_run',
+             lambda: script.handle_iss_run(user['Run'], fp)),
+            ('_iter_bin_files',
+             lambda: list(script._iter_bin_files('service_exe_files',
+                                                 user['Run']))),
+            ('create', script.create),
+            ]
+        for step, func in steps:
+            script.payload_files = []
+            script.input_files = []
+            elapsed, peak = measure(func, repeat)
+            print('%-8s %7d files %5d lines  %-18s %9.3f ms %9.1f KiB'
+                  % (name, count, userlines, step, elapsed * 1000,
+                     peak / 1024.0))
+        size = os.path.getsize(script.issfile)
+        print('%-8s %7d files %5d lines  %-18s %9d bytes'
+              % (name, count, userlines, 'script size', size))
+    finally:
+        builder.cleanup()
+
+
+def main(args):
+    quick = '--quick' in args
+    names = [i for i in args if not i.startswith('-')]
+    for case in CASES:
+        if names and case[0] not in names:
+            continue
+        if quick and not names and case[0] not in QUICK:
+            continue
+        bench_case(*case, repeat=1 if case[1] >= 100000 else 3)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
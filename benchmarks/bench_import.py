@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""benchmark the time to import `innosetup`
+
+Each import is done in a fresh interpreter and compared with an empty
+interpreter start. Windows-only modules imported eagerly are listed.
+
+usage: python benchmarks/bench_import.py [repeat]
+"""
+
+import os
+import sys
+import subprocess
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('py2exe', 'winreg', 'win32api', 'distutils.msvccompiler',
+         'innosetup.command', )
+
+CODE = '''
+import sys, time
+start = time.perf_counter()
+%s
+print(time.perf_counter() - start)
+print(' '.join(i for i in %r if i in sys.modules))
+'''
+
+
+def run(statement):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [i for i in [env.get('PYTHONPATH')] if i])
+    out = subprocess.check_output(
+        [sys.executable, '-c', CODE % (statement, HEAVY)], env=env)
+    elapsed, modules = out.decode().split('\n', 1)
+    return float(elapsed), modules.split()
+
+
+def main(args):
+    repeat = int(args[0]) if args else 10
+    for statement in ('pass', 'import innosetup',
+                      'from innosetup.innosetup import InnoScript'):
+        results = [run(statement) for _ in range(repeat)]
+        best = min(i[0] for i in results)
+        print('%-45s %8.2f ms  eager: %s'
+              % (statement, best * 1000, ', '.join(results[0][1]) or '-'))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""benchmark `InnoScript.handle_iss_files` over growing distributions
+
+usage: python benchmarks/bench_iss_files.py [count ...]
+"""
+
+import sys
+import time
+
+from fakes import FakeBuilder, NullIssFile
+
+from innosetup.innosetup import InnoScript
+
+
+def bench(count, repeat=3):
+    builder = FakeBuilder(count)
+    try:
+        script = InnoScript(builder)
+        lines = builder.user_script(count // 10).splitlines()
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            script.handle_iss_files(lines, NullIssFile())
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+    finally:
+        builder.cleanup()
+
+
+def main(args):
+    counts = [int(i) for i in args] or [1000, 5000, 20000]
+    for count in counts:
+        elapsed = bench(count)
+        print('%8d files: %8.3f s  (%6.2f us/file)'
+              % (count, elapsed, elapsed / count * 1e6))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
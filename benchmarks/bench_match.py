@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""benchmark file name matching: the old `findfiles` vs. `Matcher`
+
+Names look like a py2exe dist tree. The old `findfiles` is kept here
+as the baseline. Each baseline is checked to match the same names as
+`Matcher` before timed.
+
+usage: python benchmarks/bench_match.py [count]
+"""
+
+import os
+import sys
+import time
+import fnmatch
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from innosetup.match import Matcher
+
+
+EXTS = ('.pyd', '.dll', '.pyc', '.txt', '.png', '.tcl', '.manifest', )
+PATTERNS = [
+    '*.pdb', '*.pyc', 're:^lib/tests/', 'lib/tcl/*/demos/*', 'mfc*.dll',
+    '*.manifest', 'unittest*', 're:\\.orig$', '[a-c]*.txt', 'w9xpopen.exe',
+]
+
+
+def old_findfiles(filenames, *conditions):
+    """`findfiles` before `innosetup.match`"""
+    def check(filename):
+        filename = filename.lower()
+        for i in conditions:
+            i = i.lower()
+            if i.startswith('.'):  # compare ext
+                if os.path.splitext(filename)[1] != i:
+                    return
+            elif i.count('.') == 1:  # compare basename
+                if os.path.basename(filename) != i:
+                    return
+            else:  # contains
+                if i not in os.path.basename(filename):
+                    return
+        return True
+
+    return [i for i in filenames if check(i)]
+
+
+def fnmatch_any(names, patterns):
+    """a loop over patterns for each name, with `Matcher`'s semantics
+
+    Names are compared case-insensitively by `/` separated parts, a glob
+    of n parts matches the last n parts of a name.
+    """
+    patterns = [i.lower().split('/') for i in patterns]
+    result = []
+    for name in names:
+        parts = name.lower().replace('\\', '/').split('/')
+        for p in patterns:
+            if len(p) <= len(parts) and all(
+                    fnmatch.fnmatchcase(a, b)
+                    for a, b in zip(parts[-len(p):], p)):
+                result.append(name)
+                break
+    return result
+
+
+def make_names(count):
+    rnd = random.Random(0)
+    dirs = ['lib', 'lib/tests', 'lib/tcl/tk8.5/demos', 'lib/encodings', '']
+    names = []
+    for i in range(count):
+        dirname = rnd.choice(dirs)
+        name = '%s%d%s' % (rnd.choice(['mod', 'mfc', 'msvcr', 'data']), i,
+                           rnd.choice(EXTS))
+        names.append(dirname + '\\' + name if dirname else name)
+    return names
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(result)
+
+
+def main(args):
+    count = int(args[0]) if args else 100000
+    names = make_names(count)
+    conditions = ('msvcr', '.dll')
+    matcher = Matcher(conditions, all_of=True)
+    patterns = Matcher(PATTERNS)
+    globs = [i for i in PATTERNS if not i.startswith('re:')]
+    globmatcher = Matcher(globs)
+    cases = [
+        ('old findfiles', lambda: old_findfiles(names, *conditions)),
+        ('Matcher all_of', lambda: matcher.filter(names)),
+        ('Matcher compile+filter',
+         lambda: Matcher(conditions, all_of=True).filter(names)),
+        ('fnmatch %d globs' % len(globs), lambda: fnmatch_any(names, globs)),
+        ('Matcher %d globs' % len(globs), lambda: globmatcher.filter(names)),
+        ('Matcher %d patterns' % len(PATTERNS),
+         lambda: patterns.filter(names)),
+        ]
+    # compare the same work
+    assert old_findfiles(names, *conditions) == matcher.filter(names)
+    assert fnmatch_any(names, globs) == globmatcher.filter(names)
+    for name, func in cases:
+        elapsed, matched = timed(func)
+        print('%-24s %8.3f s %8.3f us/name %8d matched'
+              % (name, elapsed, elapsed / count * 1e6, matched))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""a fake `innosetup` command and distributions for benchmarks"""
+
+import os
+import sys
+import shutil
+import tempfile
+from distutils.dist import Distribution
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from innosetup.innosetup import DEFAULT_OPTIONS
+
+
+DATA_EXTS = ('.pyd', '.dll', '.dat', '.txt', '.png', '.html', )
+
+
+class NullIssFile(object):
+    """discard everything written"""
+
+    def write(self, s):
+        pass
+
+    def addline(self, line):
+        pass
+
+    def issline(self, **kwargs):
+        pass
+
+
+class FakeBuilder(object):
+    """stands in for the `innosetup` command
+
+    `count` files are spread over nested directories under `lib`, plus
+    `services` service exes and `comservers` COM server exes and dlls.
+    Files are created empty on disk. Call `cleanup()` when done.
+    """
+
+    def __init__(self, count, services=0, comservers=0, dirsize=200):
+        self.dist_dir = tempfile.mkdtemp(prefix='innosetup-bench-')
+        self.lib_dir = os.path.join(self.dist_dir, 'lib')
+        self.distribution = Distribution(dict(
+            name='benchmark', version='1.0.0.0', author='author',
+            author_email='author@example.com', url='http://example.com/',
+            description='benchmark application'))
+        self.distribution.dist_files = []
+        for k, v in DEFAULT_OPTIONS.items():
+            setattr(self, k, v)
+        self.bundle_vcr = False
+        self.bundle_files = 3
+        self.modules = {}
+        self.other_depends = []
+        self.python_consts = {
+            'PYTHON_VERION': '3.4', 'PYTHON_VER': '34',
+            'PYTHON_DIR': 'C:\\Python34', 'PYTHON_DLL': 'python34.dll',
+            }
+        self.python_x64 = False
+
+        self.console_exe_files = [os.path.join(self.dist_dir, 'console.exe')]
+        self.windows_exe_files = [os.path.join(self.dist_dir, 'windows.exe')]
+        self.service_exe_files = []
+        self.comserver_files = []
+        self.fileinfo = {}
+        for i in range(services):
+            filename = os.path.join(self.dist_dir, 'service%d.exe' % i)
+            self.service_exe_files.append(filename)
+            self.fileinfo[filename] = {
+                'cmdline_style': ('py2exe', 'pywin32')[i % 2]}
+        for i in range(comservers):
+            ext = ('.exe', '.dll')[i % 2]
+            self.comserver_files.append(
+                os.path.join(self.dist_dir, 'comserver%d%s' % (i, ext)))
+
+        self.lib_files = []
+        for i in range(count):
+            dirname = os.path.join(self.lib_dir, 'pkg%d' % (i // dirsize),
+                                   'sub%d' % (i // dirsize % 3))
+            self.lib_files.append(os.path.join(
+                dirname, 'mod%06d%s' % (i, DATA_EXTS[i % len(DATA_EXTS)])))
+
+        for filename in self.files():
+            dirname = os.path.dirname(filename)
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            open(filename, 'w').close()
+
+    def files(self):
+        return (self.console_exe_files + self.windows_exe_files +
+                self.service_exe_files + self.comserver_files +
+                self.lib_files)
+
+    def user_script(self, lines):
+        """get a user script with about `lines` lines
+
+        The [Files] section references every 10th file.
+        """
+        result = [
+            '[Setup]',
+            'AppId={{00000000-0000-0000-0000-000000000000}',
+            'Compression=lzma2',
+            '[Languages]',
+            'Name: "en"; MessagesFile: "compiler:Default.isl"',
+            '[Files]',
+            ]
+        for filename in self.lib_files[:lines * 10:10]:
+            relname = filename[len(self.dist_dir) + 1:].replace(os.sep, '\\')
+            result.append('Source: "%s"; DestDir: "{app}\\%s"; '
+                          'Flags: ignoreversion'
+                          % (relname, relname.rsplit('\\', 1)[0]))
+        result.append('[Run]')
+        result.append('Filename: "{app}\\windows.exe"; '
+                      'Description: "Launch"; Flags: postinstall')
+        return '\n'.join(result) + '\n'
+
+    def cleanup(self):
+        shutil.rmtree(self.dist_dir, ignore_errors=True)
@@ -9,7 +9,22 @@ __version__ = '0.6.9'
 import sys
 
 import distutils.command
-from .innosetup import (innosetup, DEFAULT_ISS, DEFAULT_CODES)
+from .innosetup import (InnoScript, DEFAULT_ISS)
+
+# `innosetup` is the command class, it imports `py2exe` on first access.
+del innosetup
+
+
+def __getattr__(name):
+    if name in ('innosetup', 'install_patches'):
+        from . import command
+        value = getattr(command, name)
+        globals()[name] = value
+        return value
+    if name == 'DEFAULT_CODES':
+        from .innosetup import default_codes
+        return default_codes()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 
 distutils.command.__all__.append('innosetup')
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""command line interface
+
+python -m innosetup generate manifest.json [-o distutils.iss]
+"""
+
+import sys
+import argparse
+
+from .standalone import ManifestBuilder, generate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m innosetup')
+    commands = parser.add_subparsers(dest='command')
+    command = commands.add_parser(
+        'generate', help='generate an InnoSetup script from a manifest')
+    command.add_argument('manifest', help='a manifest file (JSON)')
+    command.add_argument('-o', '--output', default='',
+                         help='the script file (default: '
+                         '<dist_dir>/distutils.iss)')
+    args = parser.parse_args(argv)
+
+    if args.command != 'generate':
+        parser.print_help()
+        return 2
+
+    try:
+        builder = ManifestBuilder.fromfile(args.manifest)
+        script = generate(builder, args.output)
+    except (EnvironmentError, ValueError) as e:
+        parser.error(str(e))
+    print(script.issfile)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""packaging of the built setup file
+
+The setup file is read once in large chunks which are fed to the zip
+writer and the hash functions together. The zip file is written
+sequentially (with data descriptors), so it's hashed while written.
+
+With `workers`, deflate runs on a thread pool: chunks are compressed
+independently (primed with the tail of the previous chunk) and joined
+into one standard deflate stream, like pigz does.
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import hashlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+COMPRESSIONS = {
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA,
+}
+
+
+class HashingWriter(object):
+    """a write-only stream which hashes and counts written bytes
+
+    It has no `tell` nor `seek`, so `ZipFile` writes it sequentially.
+    """
+
+    def __init__(self, fp, algorithm='sha256'):
+        self.fp = fp
+        self.hash = hashlib.new(algorithm)
+        self.size = 0
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+        return self.fp.write(data)
+
+    def flush(self):
+        self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+
+
+def checksum(filename, algorithm='sha256'):
+    """get {'size': n, algorithm: hexdigest} of a file"""
+    h = hashlib.new(algorithm)
+    size = 0
+    with open(filename, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+            size += len(chunk)
+    return {'size': size, algorithm: h.hexdigest()}
+
+
+def package(setupfile, zipname='', compression='deflated', level=None,
+            algorithm='sha256', workers=0):
+    """zip `setupfile` and get checksums of it and the zip in one pass
+
+    `compression` is a key of `COMPRESSIONS` (`stored` suits the already
+    compressed setup file). `workers` > 1 deflates on that many threads.
+    Returns {basename: {'size': n, algorithm: hexdigest}} of `setupfile`
+    and the zip file if `zipname` is given.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError('unknown compression: %s' % compression)
+    if level is not None:
+        level = int(level)
+    workers = int(workers or 0)
+    if zipname and compression == 'deflated' and workers > 1:
+        return parallel_package(setupfile, zipname, level, algorithm,
+                                workers)
+
+    h = hashlib.new(algorithm)
+    size = 0
+    with open(setupfile, 'rb') as src:
+        if not zipname:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                h.update(chunk)
+                size += len(chunk)
+            result = {}
+        else:
+            with open(zipname, 'wb') as raw:
+                out = HashingWriter(raw, algorithm)
+                with zipfile.ZipFile(out, 'w', COMPRESSIONS[compression],
+                                     compresslevel=level) as zip:
+                    info = zipfile.ZipInfo.from_file(
+                        setupfile, os.path.basename(setupfile))
+                    info.compress_type = COMPRESSIONS[compression]
+                    # ZipFile.write() does the same for its ZipInfo
+                    info._compresslevel = level
+                    with zip.open(info, 'w', force_zip64=True) as dst:
+                        for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                            h.update(chunk)
+                            size += len(chunk)
+                            dst.write(chunk)
+            result = {os.path.basename(zipname): {
+                'size': out.size, algorithm: out.hash.hexdigest()}}
+
+    result[os.path.basename(setupfile)] = {
+        'size': size, algorithm: h.hexdigest()}
+    return result
+
+
+DICT_SIZE = 32 * 1024
+
+
+def _deflate(data, level, zdict, last):
+    if zdict:
+        c = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        c = zlib.compressobj(level, zlib.DEFLATED, -15)
+    # a sync flush ends a chunk on a byte boundary without the final block
+    return c.compress(data) + c.flush(zlib.Z_FINISH if last
+                                      else zlib.Z_SYNC_FLUSH)
+
+
+def _dostime(timestamp):
+    t = time.localtime(timestamp)
+    year = max(t.tm_year, 1980)
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+def parallel_package(setupfile, zipname, level=None, algorithm='sha256',
+                     workers=2):
+    """`package()` which deflates chunks on `workers` threads
+
+    The zip file has one zip64 entry with a data descriptor, which any
+    zip reader can open.
+    """
+    if level is None:
+        level = zlib.Z_DEFAULT_COMPRESSION
+    name = os.path.basename(setupfile).encode('utf_8')
+    dostime, dosdate = _dostime(os.path.getmtime(setupfile))
+    total = os.path.getsize(setupfile)
+
+    h = hashlib.new(algorithm)
+    crc = 0
+    size = 0
+    csize = 0
+    with open(setupfile, 'rb') as src, open(zipname, 'wb') as raw:
+        out = HashingWriter(raw, algorithm)
+        # local file header, sizes are in the data descriptor
+        out.write(struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, 45, 0x08, zipfile.ZIP_DEFLATED,
+            dostime, dosdate, 0, 0xffffffff, 0xffffffff, len(name), 20))
+        out.write(name)
+        out.write(struct.pack('<HHQQ', 0x0001, 16, 0, 0))
+
+        def chunks():
+            tail = b''
+            read = 0
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                read += len(chunk)
+                yield chunk, tail, read >= total
+                if not chunk or read >= total:
+                    break
+                tail = chunk[-DICT_SIZE:]
+
+        with ThreadPoolExecutor(workers) as pool:
+            pending = []
+            for chunk, tail, last in chunks():
+                h.update(chunk)
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                pending.append(pool.submit(_deflate, chunk, level, tail, last))
+                # keep memory bounded
+                while len(pending) > workers * 2:
+                    data = pending.pop(0).result()
+                    csize += len(data)
+                    out.write(data)
+            for future in pending:
+                data = future.result()
+                csize += len(data)
+                out.write(data)
+
+        # data descriptor
+        out.write(struct.pack('<IIQQ', 0x08074b50, crc, csize, size))
+
+        # central directory
+        cdoffset = out.size
+        out.write(struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, 45, 45, 0x08,
+            zipfile.ZIP_DEFLATED, dostime, dosdate, crc, 0xffffffff,
+            0xffffffff, len(name), 20, 0, 0, 0, 0, 0))
+        out.write(name)
+        out.write(struct.pack('<HHQQ', 0x0001, 16, size, csize))
+        cdsize = out.size - cdoffset
+
+        # zip64 end of central directory record and locator
+        eocd64 = out.size
+        out.write(struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0,
+                              1, 1, cdsize, cdoffset))
+        out.write(struct.pack('<IIQI', 0x07064b50, 0, eocd64, 1))
+        out.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, 1, 1,
+                              min(cdsize, 0xffffffff), 0xffffffff, 0))
+
+    return {
+        os.path.basename(setupfile): {'size': size, algorithm: h.hexdigest()},
+        os.path.basename(zipname): {
+            'size': out.size, algorithm: out.hash.hexdigest()},
+        }
+
+
+def write_checksums(basename, checksums, algorithm='sha256'):
+    """write `<basename>.json` and `<basename>.<algorithm>sums`
+
+    The latter is the format of `sha256sum -c`.
+    """
+    with open(basename + '.json', 'w') as fp:
+        json.dump(checksums, fp, indent=1, sort_keys=True)
+    with open('%s.%ssums' % (basename, algorithm), 'w') as fp:
+        for name in sorted(checksums):
+            fp.write('%s *%s\n' % (checksums[name][algorithm], name))
+    return [basename + '.json', '%s.%ssums' % (basename, algorithm)]
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""caches shared between builds"""
+
+import os
+import json
+import uuid
+import shutil
+
+
+def copyfile(src, dst):
+    """copy to a temporary name and rename it to `dst` atomically"""
+    tmp = '%s.%s.tmp' % (dst, uuid.uuid4().hex)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def dirsize(dirname):
+    size = 0
+    for root, dirs, files in os.walk(dirname):
+        for i in files:
+            try:
+                size += os.path.getsize(os.path.join(root, i))
+            except EnvironmentError:
+                pass
+    return size
+
+
+class InstallerCache(object):
+    """a content-addressed directory of built files
+
+    Entries are directories named by the key and hold the cached files by
+    their names. Every change is done by renaming a complete file or
+    directory, so several processes can share a cache without locks. A
+    reader racing with eviction just gets a cache miss.
+
+    `maxsize` is the size limit in bytes, least recently used entries are
+    evicted over it. 0 means no limit.
+    """
+
+    def __init__(self, root, maxsize=0):
+        self.root = root
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def entry(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key, name, dst):
+        """copy the cached file `name` to `dst`, return False on miss"""
+        entry = self.entry(key)
+        try:
+            copyfile(os.path.join(entry, name), dst)
+            # mark as recently used
+            os.utime(entry, None)
+        except EnvironmentError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def put(self, key, name, src):
+        """store the file `src` as `name` under `key`"""
+        entry = self.entry(key)
+        if not os.path.isdir(entry):
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            tmp = os.path.join(self.root,
+                               '%s.%s.tmp' % (key, uuid.uuid4().hex))
+            os.makedirs(tmp)
+            try:
+                shutil.copyfile(src, os.path.join(tmp, name))
+                try:
+                    os.rename(tmp, entry)
+                except FileNotFoundError:
+                    # the prefix directory is removed by eviction
+                    os.makedirs(os.path.dirname(entry), exist_ok=True)
+                    os.rename(tmp, entry)
+            except EnvironmentError:
+                # another process created the same entry
+                pass
+            finally:
+                if os.path.isdir(tmp):
+                    shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isfile(os.path.join(entry, name)):
+            try:
+                copyfile(src, os.path.join(entry, name))
+            except EnvironmentError:
+                # the entry is evicted by another process
+                pass
+        self.evict()
+
+    def entries(self):
+        """get (last used time, size, path) of all entries"""
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for prefix in os.listdir(self.root):
+            parent = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(parent):
+                continue
+            for key in os.listdir(parent):
+                entry = os.path.join(parent, key)
+                try:
+                    result.append((os.path.getmtime(entry),
+                                   dirsize(entry), entry))
+                except EnvironmentError:
+                    pass
+        return result
+
+    def sweep(self):
+        """remove evicted entries left by failed removals
+
+        A removal fails if a file is in use on Windows. Returns the size of
+        the entries which still remain.
+        """
+        remaining = 0
+        if not os.path.isdir(self.root):
+            return remaining
+        for name in os.listdir(self.root):
+            if not name.endswith('.del'):
+                continue
+            trash = os.path.join(self.root, name)
+            shutil.rmtree(trash, ignore_errors=True)
+            if os.path.exists(trash):
+                remaining += dirsize(trash)
+        return remaining
+
+    def evict(self):
+        """remove least recently used entries over `maxsize`"""
+        if not self.maxsize:
+            return
+        entries = sorted(self.entries())
+        total = self.sweep() + sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.maxsize:
+                break
+            trash = os.path.join(self.root, '%s.%s.del' % (
+                os.path.basename(entry), uuid.uuid4().hex))
+            try:
+                os.rename(entry, trash)
+            except EnvironmentError:
+                # already evicted by another process
+                continue
+            shutil.rmtree(trash, ignore_errors=True)
+            if not os.path.exists(trash):
+                total -= size
+            self.remove_prefix(entry)
+
+    def remove_prefix(self, entry):
+        """remove the `<key[:2]>` directory of `entry` if it is empty"""
+        try:
+            os.rmdir(os.path.dirname(entry))
+        except OSError:
+            # other entries remain or it is already removed
+            pass
+
+    def clear(self):
+        for _, _, entry in self.entries():
+            shutil.rmtree(entry, ignore_errors=True)
+            self.remove_prefix(entry)
+        self.sweep()
+
+
+class FileCache(object):
+    """persistent values of files keyed by (path, size, mtime)
+
+    Entries of changed files are just missed and overwritten.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._dirty = False
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            try:
+                with open(self.filename) as fp:
+                    self._entries = json.load(fp)
+            except (EnvironmentError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def key(self, pathname):
+        return os.path.normcase(os.path.abspath(pathname))
+
+    def lookup(self, pathname):
+        """get the entry dict of an unchanged file or None"""
+        try:
+            st = os.stat(pathname)
+        except EnvironmentError:
+            return None
+        entry = self.entries.get(self.key(pathname))
+        if entry and entry['size'] == st.st_size \
+                and entry['mtime'] == st.st_mtime:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, pathname, **values):
+        try:
+            st = os.stat(pathname)
+        except EnvironmentError:
+            return
+        self.entries[self.key(pathname)] = dict(
+            size=st.st_size, mtime=st.st_mtime, **values)
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        dirname = os.path.dirname(self.filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        tmp = '%s.%s.tmp' % (self.filename, uuid.uuid4().hex)
+        with open(tmp, 'w') as fp:
+            json.dump(self.entries, fp, indent=0, sort_keys=True)
+        os.replace(tmp, self.filename)
+        self._dirty = False
+
+    def clear(self):
+        """invalidate all entries"""
+        self._entries = {}
+        self._dirty = False
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+
+class DLLCache(FileCache):
+    """persistent classification of DLLs
+
+    Each entry holds whether the DLL is a system DLL and its company name.
+    """
+
+    def get(self, pathname):
+        """get (system, company) or None"""
+        entry = self.lookup(pathname)
+        if entry is None:
+            return None
+        return entry['system'], entry['company']
+
+    def set(self, pathname, system, company=''):
+        self.store(pathname, system=bool(system), company=company)
+
+
+class ModuleGraphCache(FileCache):
+    """persistent imports found in the code of modules
+
+    Each entry holds the arguments of the import hook calls made while
+    scanning the module, and its global names and star imports.
+    """
+
+    def get(self, pathname):
+        """get the entry of an unchanged module or None"""
+        return self.lookup(pathname)
+
+    def set(self, pathname, imports, globalnames, starimports):
+        self.store(pathname, imports=imports, globalnames=globalnames,
+                   starimports=starimports)
+
+
+class LanguageIndex(object):
+    """persistent lists of `.isl` files of Inno Setup installations
+
+    An entry is keyed by the install directory and is valid while the
+    mtimes of the directory and its subdirectories (ex. `Languages`) are
+    the same.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            try:
+                with open(self.filename) as fp:
+                    self._entries = json.load(fp)
+            except (EnvironmentError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def stamp(self, dirname):
+        stamp = [os.stat(dirname).st_mtime]
+        for entry in sorted(os.scandir(dirname), key=lambda i: i.name):
+            if entry.is_dir():
+                stamp.append(entry.stat().st_mtime)
+        return stamp
+
+    def scan(self, dirname):
+        """get paths of `.isl` files relative to `dirname`"""
+        files = []
+        for root, dirs, names in os.walk(dirname):
+            for name in names:
+                if name.lower().endswith('.isl'):
+                    relname = os.path.relpath(os.path.join(root, name),
+                                              dirname)
+                    files.append(relname.replace(os.sep, '\\'))
+        return sorted(files)
+
+    def get(self, dirname):
+        """get the `.isl` files of an install directory"""
+        if not dirname or not os.path.isdir(dirname):
+            return []
+        key = os.path.normcase(os.path.abspath(dirname))
+        stamp = self.stamp(dirname)
+        entry = self.entries.get(key)
+        if entry and entry['stamp'] == stamp:
+            self.hits += 1
+            return entry['files']
+        self.misses += 1
+        files = self.scan(dirname)
+        self.entries[key] = dict(stamp=stamp, files=files)
+        self.save()
+        return files
+
+    def save(self):
+        dirname = os.path.dirname(self.filename)
+        try:
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            tmp = '%s.%s.tmp' % (self.filename, uuid.uuid4().hex)
+            with open(tmp, 'w') as fp:
+                json.dump(self.entries, fp, indent=0, sort_keys=True)
+            os.replace(tmp, self.filename)
+        except EnvironmentError:
+            # the index is only an optimization
+            pass
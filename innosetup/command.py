@@ -0,0 +1,477 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""the `innosetup` distutils command
+
+`py2exe` is patched by `install_patches()` when the command runs.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from distutils.errors import DistutilsExecError, DistutilsOptionError
+import importlib.machinery
+from modulefinder import packagePathMap
+
+from py2exe.build_exe import py2exe
+from py2exe import build_exe, mf as modulefinder
+
+from . import peresource
+from .cache import DLLCache, ModuleGraphCache
+from .innosetup import DEFAULT_OPTIONS, InnoScript, VariantBuilder
+from .stage import Stager
+from .trace import Tracer
+
+
+# py2exe modifies the python DLL (its version resource) after copied
+modified_dlls = re.compile(r'^python\d*(_d)?\.dll$', re.IGNORECASE)
+
+
+class innosetup(py2exe):
+
+    # setup()'s argument is in self.distribution.
+    user_options = py2exe.user_options + [
+        ('inno-setup-exe=', None,
+         'a path to InnoSetup exe file (ISCC.exe or Compil32.exe)'),
+        ('inno-script=', None,
+         'a path to InnoSetup script file or an InnoSetup script string'),
+        ('bundle-vcr=', None,
+         'bundle msvc*XX.dll and mfc*.dll and their manifest files'),
+         ('zip=', None, 'zip setup file'),
+        ('zip-compression=', None,
+         'compression of the zip file: stored, deflated (default), '
+         'bzip2 or lzma'),
+        ('zip-level=', None, 'compression level of the zip file'),
+        ('zip-workers=', None,
+         'number of threads to deflate the zip file (default: 0, one)'),
+        ('checksums', None,
+         'write sizes and SHA-256 of the setup file and the zip file'),
+        ('force-compile', None,
+         'compile the installer even if nothing has changed'),
+        ('cache-dir=', None,
+         'a directory to share built installers between builds'),
+        ('cache-size=', None,
+         'maximum size of the cache directory in MB (default: 0, no limit)'),
+        ('clear-dll-cache', None,
+         'invalidate the cache of system DLL classification'),
+        ('clear-module-cache', None,
+         'invalidate the cache of imports found in modules'),
+        ('coalesce-files', None,
+         'merge [Files] entries of directories into one entry'),
+        ('trace=', None,
+         'write timings and resource usage of build phases to the file'),
+        ('trace-format=', None,
+         'format of the trace file, "json" (default) or "chrome"'),
+        ('compile-timeout=', None,
+         'kill the compiler after the seconds (default: 0, no limit)'),
+        ('variants=', None,
+         'installer variants, a list of dicts or a JSON file of it'),
+        ('variant-jobs=', None,
+         'number of variants compiled at once (default: CPU count)'),
+        ('update-from=', None,
+         'build an update installer from the release manifest '
+         '(<setup>.files.json) of a previous release'),
+        ('release-manifest', None,
+         'write the release manifest <setup>.files.json'),
+        ('hash-workers=', None,
+         'number of threads to hash payload files (default: CPU count)'),
+        ('include-files=', None,
+         'patterns of files to add to [Files] (default: all files)'),
+        ('exclude-files=', None,
+         'patterns of files not to add to [Files]'),
+        ('profile-compression', None,
+         'compile with each compression profile and keep the best one'),
+        ('profile-matrix=', None,
+         'compression settings to try, a dict or a JSON file of it'),
+        ('profile-budget=', None,
+         'limits of the chosen profile, ex. "time=120,size=500" '
+         '(seconds, MB)'),
+        ('skip-validation', None,
+         'compile the script without checking it'),
+        ('stage-mode=', None,
+         'how files are put in dist_dir: copy (default), auto, reflink, '
+         'hardlink or symlink'),
+        ]
+    boolean_options = py2exe.boolean_options + [
+        'force-compile', 'clear-dll-cache', 'clear-module-cache',
+        'coalesce-files', 'checksums', 'release-manifest', 'skip-validation',
+        'profile-compression']
+    description = 'create an executable file and an installer by InnoSetup'
+    fileinfo = {}
+    modules = {}
+    script = None
+
+    def initialize_options(self):
+        # get py2exe's command options
+        options = dict(self.distribution.command_options.get('py2exe', {}))
+        options.update(self.distribution.command_options.get('innosetup', {}))
+        self.distribution.command_options['innosetup'] = options
+
+        py2exe.initialize_options(self)
+        for k, v in DEFAULT_OPTIONS.items():
+            setattr(self, k, v)
+        self.clear_dll_cache = False
+        self.clear_module_cache = False
+        self.analysis_time = 0.0
+        self.trace = ''
+        self.trace_format = 'json'
+        self.tracer = Tracer()
+        self.variants = []
+        self.variant_jobs = 0
+        self.stager = None
+        self.script = None
+        self.fileinfo = {}
+        self.modules = {}
+
+    def build_service(self, target, template, arcname):
+        result = py2exe.build_service(self, target, template, arcname)
+        self.fileinfo.setdefault(result, {})['cmdline_style'] = \
+            getattr(target, "cmdline_style", "py2exe")
+        return result
+
+    def create_modulefinder(self):
+        mf = py2exe.create_modulefinder(self)
+        # reuse imports of unchanged modules found by the last builds
+        mf.__class__ = type('Caching' + mf.__class__.__name__,
+                            (CachingModuleFinder, mf.__class__), {})
+        mf.graphcache = modulecache
+        return mf
+
+    def copy_file(self, infile, outfile, preserve_mode=1, preserve_times=1,
+                  link=None, level=1):
+        if self.stager is None or self.stager.mode == 'copy' or link \
+                or self.dry_run:
+            return py2exe.copy_file(self, infile, outfile, preserve_mode,
+                                    preserve_times, link, level)
+        if os.path.isdir(outfile):
+            outfile = os.path.join(outfile, os.path.basename(infile))
+        # py2exe's templates and the python DLL are modified after copied,
+        # a link would modify the installed files
+        private = modified_dlls.match(os.path.basename(infile)) \
+            or os.path.abspath(infile).startswith(
+                os.path.dirname(os.path.abspath(build_exe.__file__)))
+        self.stager.stage(infile, outfile, private=bool(private))
+        return outfile, 1
+
+    def find_needed_modules(self, *args, **kwargs):
+        start = time.perf_counter()
+        with self.tracer.phase('find modules') as entry:
+            try:
+                return py2exe.find_needed_modules(self, *args, **kwargs)
+            finally:
+                self.analysis_time += time.perf_counter() - start
+                # the counts after the analysis
+                entry['args'].update(hits=modulecache.hits,
+                                     misses=modulecache.misses)
+
+    def plat_finalize(self, modules, py_files, extensions, dlls):
+        py2exe.plat_finalize(self, modules, py_files, extensions, dlls)
+        self.modules = modules
+
+    def run(self):
+        install_patches()
+        if self.clear_dll_cache:
+            dllcache.clear()
+        if self.clear_module_cache:
+            modulecache.clear()
+        self.stager = Stager(self.stage_mode or 'copy')
+        try:
+            self._run()
+        finally:
+            if self.trace:
+                self.tracer.save(self.trace, self.trace_format)
+
+    def _run(self):
+        isSystemDLL.elapsed = 0.0
+        with self.tracer.phase('py2exe'):
+            py2exe.run(self)
+            self.tracer.add('classify DLLs', isSystemDLL.elapsed,
+                            hits=dllcache.hits, misses=dllcache.misses)
+        if packagepathmap.lookups:
+            print('package path lookups: %d, %d served from memo'
+                  % (packagepathmap.lookups, packagepathmap.hits))
+        if dllcache.hits or dllcache.misses:
+            print('DLL classification cache: %d hits, %d misses'
+                  % (dllcache.hits, dllcache.misses))
+            dllcache.save()
+        if modulecache.hits or modulecache.misses:
+            print('module graph cache: %d hits, %d misses (%.0f%%), '
+                  'analysis %.1f seconds' % (
+                      modulecache.hits, modulecache.misses,
+                      100.0 * modulecache.hits
+                      / (modulecache.hits + modulecache.misses),
+                      self.analysis_time))
+            modulecache.save()
+        if self.stager.files:
+            print(self.stager.report())
+            self.tracer.count('copied bytes', self.stager.copied_bytes)
+            self.tracer.count('linked bytes', self.stager.linked_bytes)
+
+        if self.variants:
+            self.build_variants()
+            return
+
+        script = self.script = InnoScript(self)
+        #print "*** creating the inno setup script ***"
+        with self.tracer.phase('create'):
+            script.create()
+        #print "*** compiling the inno setup script ***"
+        with self.tracer.phase('compile'):
+            script.compile()
+
+    def payload_manifest(self):
+        """get {filename: (size, mtime, digest)} of the payload files
+
+        The manifest is saved as `distutils.payload.json` next to the
+        script. The script is created if it isn't yet.
+        """
+        if self.script is None:
+            self.script = InnoScript(self)
+            self.script.create()
+        return self.script.payload_manifest()
+
+    def build_variants(self):
+        """create and compile the scripts of all variants
+
+        The compilers run in parallel, a failed variant doesn't stop the
+        others. Phases of the variants are traced with their names.
+        """
+        variants = self.variants
+        if isinstance(variants, str):
+            if os.path.isfile(variants):
+                with open(variants) as fp:
+                    variants = json.load(fp)
+            else:
+                variants = json.loads(variants)
+        names = [variant.get('name') for variant in variants]
+        if not all(names) or len(set(names)) != len(names):
+            raise DistutilsOptionError('variants need unique names: %s'
+                                       % ', '.join(map(str, names)))
+
+        scripts = []
+        failures = []
+        zipnames = {}
+        for variant in variants:
+            script = InnoScript(VariantBuilder(self, variant))
+            with self.tracer.phase('create', variant=script.variant) as entry:
+                try:
+                    script.create()
+                    # the same zip file given to variants by themselves
+                    if script.zipname in zipnames:
+                        raise DistutilsOptionError(
+                            'zip file %s is also written by variant %s' % (
+                                script.zipname, zipnames[script.zipname]))
+                except Exception as e:
+                    entry['error'] = repr(e)
+                    print('variant %s: failed (%s)' % (script.variant, e))
+                    failures.append(script.variant)
+                    continue
+                finally:
+                    self.tracer.merge(script.tracer, variant=script.variant)
+            if script.zipname:
+                zipnames[script.zipname] = script.variant
+            # the tracer is merged again after compiled in a thread
+            script.tracer = Tracer()
+            scripts.append(script)
+
+        def compile(script):
+            start = time.perf_counter()
+            try:
+                script.compile()
+                return time.perf_counter() - start, None
+            except Exception as e:
+                return time.perf_counter() - start, e
+
+        jobs = int(self.variant_jobs or 0) or os.cpu_count() or 1
+        with self.tracer.phase('compile', variants=len(scripts)):
+            with ThreadPoolExecutor(jobs) as pool:
+                results = list(pool.map(compile, scripts))
+            for script in scripts:
+                self.tracer.merge(script.tracer, variant=script.variant)
+
+        for script, (elapsed, error) in zip(scripts, results):
+            self.tracer.add('compile %s' % script.variant, elapsed,
+                            error=repr(error) if error else None)
+            print('variant %s: %s in %.1f seconds' % (
+                script.variant, 'failed (%s)' % error if error else 'done',
+                elapsed))
+            if error:
+                failures.append(script.variant)
+        if failures:
+            raise DistutilsExecError('%d of %d variants failed: %s' % (
+                len(failures), len(variants), ', '.join(failures)))
+
+
+#
+# fix a problem py2exe.mf misses some modules
+#
+class PackagePathMap(object):
+    """`packagePathMap` which also asks the import system
+
+    Packages are found by spec lookup. Misses and namespace packages are
+    not imported, regular packages are since their `__init__` may extend
+    `__path__` (ex. `win32com`). Results including failures are memoized.
+    """
+
+    def __init__(self):
+        self.memo = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def get(self, name, default=None):
+        try:
+            return packagePathMap[name]
+        except LookupError:
+            pass
+        # path from Python import system
+        self.lookups += 1
+        if name in self.memo:
+            self.hits += 1
+        path = self.locations(name)
+        if path is None:
+            return default
+        return path[1:]
+
+    def locations(self, name):
+        """get all locations of a package, [] for a module, None if missing"""
+        if name not in self.memo:
+            self.memo[name] = self.find_locations(name)
+        return self.memo[name]
+
+    def find_locations(self, name):
+        module = sys.modules.get(name)
+        if module is not None:
+            return list(getattr(module, '__path__', []))
+
+        parent, _, _ = name.rpartition('.')
+        path = None
+        if parent:
+            path = self.locations(parent)
+            if not path:
+                return None
+        try:
+            spec = importlib.machinery.PathFinder.find_spec(name, path)
+        except (ImportError, ValueError):
+            return None
+        if spec is None:
+            return None
+        if spec.submodule_search_locations is None:
+            return []
+        if not spec.has_location:
+            return list(spec.submodule_search_locations)
+        try:
+            __import__(name)
+        except ImportError:
+            return None
+        return list(getattr(sys.modules[name], '__path__', []))
+
+    def __setitem__(self, name, value):
+        packagePathMap[name] = value
+packagepathmap = PackagePathMap()
+
+
+#
+# reuse the import graph of unchanged modules between builds
+#
+modulecache = ModuleGraphCache(os.path.join(
+    os.path.expanduser('~'), '.innosetup',
+    'modules-%d%d.json' % sys.version_info[:2]))
+
+
+class CachingModuleFinder(object):
+    """a mixin of the module finder which caches scan results
+
+    Import hook calls made while scanning a module's code are recorded
+    with its global names. For an unchanged module, the calls are made
+    again without scanning the byte code. Modules are still resolved and
+    loaded, so the graph is built from current files.
+    """
+    graphcache = None
+
+    def scan_code(self, co, m):
+        recording = getattr(self, '_recording', None)
+        if recording is None:
+            recording = self._recording = []
+        pathname = getattr(m, '__file__', None)
+        # nested code objects of the module being scanned
+        if recording and recording[-1][0] is m or not pathname \
+                or self.graphcache is None:
+            return super(CachingModuleFinder, self).scan_code(co, m)
+
+        entry = self.graphcache.get(pathname)
+        if entry is not None:
+            recording.append((m, None))
+            try:
+                for name, fromlist, level, bycaller in entry['imports']:
+                    self._safe_import_hook(name, m if bycaller else None,
+                                           fromlist, level)
+            finally:
+                recording.pop()
+            m.globalnames.update(dict.fromkeys(entry['globalnames'], 1))
+            m.starimports.update(dict.fromkeys(entry['starimports'], 1))
+            return
+
+        calls = []
+        recording.append((m, calls))
+        try:
+            super(CachingModuleFinder, self).scan_code(co, m)
+        finally:
+            recording.pop()
+        self.graphcache.set(pathname, calls, sorted(m.globalnames),
+                            sorted(m.starimports))
+
+    def _safe_import_hook(self, name, caller, fromlist, level=-1):
+        # `from . import name` is hooked without the caller
+        recording = getattr(self, '_recording', None)
+        if recording and recording[-1][1] is not None \
+                and caller in (recording[-1][0], None):
+            recording[-1][1].append([
+                name, list(fromlist) if fromlist else fromlist, level,
+                caller is not None])
+        return super(CachingModuleFinder, self)._safe_import_hook(
+            name, caller, fromlist, level)
+
+
+# fix a problem that `py2exe` includes MinWin's ApiSet Stub DLLs on Windows 7.
+# http://www.avertlabs.com/research/blog/index.php/2010/01/05/windows-7-kernel-api-refactoring/
+
+dllcache = DLLCache(os.path.join(os.path.expanduser('~'), '.innosetup',
+                                 'dllcache.json'))
+
+
+def isSystemDLL(pathname):
+    start = time.perf_counter()
+    try:
+        cached = dllcache.get(pathname)
+        if cached is not None:
+            return cached[0]
+        result = build_exe._isSystemDLL(pathname)
+        company = ''
+        if not result:
+            try:
+                company = peresource.versioninfo(pathname).get(
+                    'CompanyName', '')
+                result = company.lower() == 'microsoft corporation'
+            except Exception:
+                pass
+        dllcache.set(pathname, result, company)
+        return result
+    finally:
+        isSystemDLL.elapsed += time.perf_counter() - start
+
+
+isSystemDLL.elapsed = 0.0
+
+
+def install_patches():
+    """patch `py2exe` for the problems above, it's done only once"""
+    if modulefinder.packagePathMap is not packagepathmap:
+        modulefinder.packagePathMap = packagepathmap
+
+    if sys.getwindowsversion()[:2] >= (6, 1) \
+            and build_exe.isSystemDLL is not isSystemDLL:
+        build_exe._isSystemDLL = build_exe.isSystemDLL
+        build_exe.isSystemDLL = isSystemDLL
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Inno Setup compiler driver
+
+`ISCC.exe` (the console compiler) is preferred to `Compil32.exe /cc` since
+it reports each file being compressed on stdout. The output is streamed
+line by line to a callback and kept as the compile log. The progress is
+the count of compressed files against the number of files given.
+
+>>> Compiler('C:\\\\Program Files\\\\Inno Setup 5\\\\Compil32.exe').compile(
+...     'dist\\\\distutils.iss')  # doctest: +SKIP
+
+Several compiles can be supervised by asyncio::
+
+    results = asyncio.run(compile_all([
+        (Compiler(exepath), 'a.iss'), (Compiler(exepath), 'b.iss')]))
+
+Any executable which takes a script path can stand in for the compiler.
+"""
+
+import os
+import re
+import time
+import codecs
+import asyncio
+import locale
+from distutils.errors import DistutilsExecError
+
+
+class CompileError(DistutilsExecError):
+    """the compiler failed, timed out or couldn't be started"""
+
+    def __init__(self, message, result=None):
+        DistutilsExecError.__init__(self, message)
+        self.result = result
+
+
+class CompileResult(object):
+
+    def __init__(self, command, returncode, log, elapsed):
+        self.command = command
+        self.returncode = returncode
+        self.log = log
+        self.elapsed = elapsed
+
+
+file_pattern = re.compile(r'^\s*Compressing:\s*(.+?)\s*$')
+
+
+def parse_line(line):
+    """get (event, value) pairs from a line of ISCC output"""
+    events = [('line', line)]
+    m = file_pattern.match(line)
+    if m:
+        events.append(('file', m.group(1)))
+    return events
+
+
+def find_iscc(exepath):
+    """get ISCC.exe next to `exepath` if there is"""
+    if os.path.basename(exepath).lower() == 'compil32.exe':
+        iscc = os.path.join(os.path.dirname(exepath), 'ISCC.exe')
+        if os.path.isfile(iscc):
+            return iscc
+    return exepath
+
+
+class Compiler(object):
+    """run the compiler for a script
+
+    `timeout` is in seconds (None or 0 is no limit). `callback` is called
+    with (event, value) where event is 'line', 'file' or 'progress'.
+    'progress' (percent) follows each 'file' if `files`, the number of
+    files to compress, is given. If `logfile` is given, the whole output is
+    written to it.
+    """
+
+    def __init__(self, exepath, timeout=None, callback=None, logfile='',
+                 files=0):
+        self.exepath = find_iscc(exepath)
+        self.timeout = timeout or None
+        self.callback = callback
+        self.logfile = logfile
+        self.files = files
+        self.compressed = 0
+
+    def command(self, issfile):
+        if os.path.basename(self.exepath).lower() == 'compil32.exe':
+            return [self.exepath, '/cc', issfile]
+        return [self.exepath, issfile]
+
+    def emit(self, line, log):
+        log.append(line)
+        if self.callback:
+            for event, value in parse_line(line):
+                self.callback(event, value)
+                if event == 'file' and self.files:
+                    self.compressed += 1
+                    self.callback('progress', min(
+                        100, self.compressed * 100 // self.files))
+
+    async def _read(self, stream, log):
+        # a character may be split between chunks
+        decoder = codecs.getincrementaldecoder(
+            locale.getpreferredencoding(False))('replace')
+        rest = ''
+        while True:
+            data = await stream.read(4096)
+            if not data:
+                break
+            # progress may be updated by '\r'
+            lines = re.split(r'\r\n|\r|\n', rest + decoder.decode(data))
+            rest = lines.pop()
+            for line in lines:
+                if line.strip():
+                    self.emit(line, log)
+        rest += decoder.decode(b'', final=True)
+        if rest.strip():
+            self.emit(rest, log)
+
+    async def compile_async(self, issfile):
+        """compile `issfile`, raise CompileError on failure"""
+        command = self.command(issfile)
+        log = []
+        self.compressed = 0
+        start = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT)
+        except EnvironmentError as e:
+            raise CompileError('cannot run %s: %s' % (command[0], e))
+
+        async def communicate():
+            await self._read(process.stdout, log)
+            return await process.wait()
+
+        try:
+            returncode = await asyncio.wait_for(communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            result = CompileResult(command, None, log,
+                                   time.perf_counter() - start)
+            self.write_log(result)
+            raise CompileError('%s timed out after %s seconds'
+                               % (command[0], self.timeout), result)
+
+        result = CompileResult(command, returncode, log,
+                               time.perf_counter() - start)
+        self.write_log(result)
+        if returncode != 0:
+            raise CompileError('%s failed with exit code %d'
+                               % (command[0], returncode), result)
+        return result
+
+    def compile(self, issfile):
+        return asyncio.run(self.compile_async(issfile))
+
+    def write_log(self, result):
+        if not self.logfile:
+            return
+        with open(self.logfile, 'w', encoding='utf_8') as fp:
+            fp.write('> %s\n' % ' '.join(result.command))
+            for line in result.log:
+                fp.write(line + '\n')
+            fp.write('exit code: %s, %.1f seconds\n'
+                     % (result.returncode, result.elapsed))
+
+
+async def compile_all(jobs, limit=None):
+    """compile (compiler, issfile) pairs concurrently
+
+    At most `limit` compilers run at once. The result list has a
+    CompileResult or a CompileError for each job.
+    """
+    semaphore = asyncio.Semaphore(limit or len(jobs) or 1)
+
+    async def run(compiler, issfile):
+        async with semaphore:
+            try:
+                return await compiler.compile_async(issfile)
+            except CompileError as e:
+                return e
+
+    return await asyncio.gather(*[run(c, i) for c, i in jobs])
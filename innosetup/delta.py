@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""release manifests and update (delta) installers
+
+A release manifest has the files installed by a release, keyed by the
+path relative to `{app}`::
+
+    {
+        "app_id": "{{8B3F...}",
+        "version": "1.0.0.0",
+        "files": {
+            "example.exe": {"size": 24576, "sha256": "9f86d0..."},
+            "lib\\\\library.zip": {"size": 1048576, "sha256": "60303a..."}
+        }
+    }
+
+An update installer made from the manifest of the previous release has
+only changed and added files, and removes the files which are gone.
+"""
+
+import json
+
+
+def release_files(installed, manifest):
+    """get the `files` of a release manifest
+
+    `installed` is {installed path: filename}, `manifest` is a payload
+    manifest ({filename: (size, mtime, digest)}) of the files.
+    """
+    files = {}
+    for name, filename in installed.items():
+        size, mtime, digest = manifest[filename]
+        files[name] = {'size': size, 'sha256': digest}
+    return files
+
+
+def read_release(filename):
+    """read a release manifest"""
+    with open(filename) as fp:
+        release = json.load(fp)
+    if not isinstance(release.get('files'), dict):
+        raise ValueError('not a release manifest: %s' % filename)
+    return release
+
+
+def write_release(filename, app_id, version, files):
+    """write a release manifest"""
+    with open(filename, 'w') as fp:
+        json.dump(dict(app_id=app_id, version=version, files=files), fp,
+                  indent=1, sort_keys=True)
+
+
+def digest(entry):
+    return entry.get('size'), entry.get('sha256')
+
+
+def diff(previous, current):
+    """compare `files` of two releases
+
+    Returns lists of (changed, added, removed) installed paths. Paths are
+    compared case-insensitively as Windows does, `removed` are the paths
+    of `previous`.
+    """
+    old = dict((name.lower(), name) for name in previous)
+    new = dict((name.lower(), name) for name in current)
+    changed = []
+    added = []
+    for key, name in sorted(new.items()):
+        if key not in old:
+            added.append(name)
+        elif digest(previous[old[key]]) != digest(current[name]):
+            changed.append(name)
+    removed = [old[key] for key in sorted(old) if key not in new]
+    return changed, added, removed
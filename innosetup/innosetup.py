@@ -1,27 +1,62 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+"""InnoSetup script generation
+
+This module doesn't import Windows-only modules nor `py2exe` at import
+time, the command is in `innosetup.command`.
+"""
+
 import os
 import sys
+import ntpath
 import platform
-import imp
-import subprocess
+import re
 import ctypes
 import codecs
+import fnmatch
 import uuid
-import winreg
-import distutils.msvccompiler
-from modulefinder import packagePathMap
-from zipfile import (ZipFile, ZIP_DEFLATED)
+import time
+import copy
+import json
+import shutil
+import tempfile
+from collections import namedtuple
+from types import MappingProxyType
 from xml.etree import ElementTree
 
-import win32api  # for read pe32 resource
-from py2exe.build_exe import *
-from py2exe import build_exe, mf as modulefinder
 
 
 DEFAULT_ISS = ""
-DEFAULT_CODES = """
+# options of builders read by `InnoScript`, the `innosetup` command and
+# other builders start with these
+DEFAULT_OPTIONS = dict(
+    inno_setup_exe='',
+    inno_script='',
+    bundle_vcr=True,
+    zip=False,
+    zip_compression='deflated',
+    zip_level=None,
+    zip_workers=0,
+    checksums=False,
+    regist_startup=False,
+    force_compile=False,
+    cache_dir='',
+    cache_size=0,
+    coalesce_files=False,
+    compile_timeout=0,
+    update_from='',
+    release_manifest=False,
+    hash_workers=0,
+    stage_mode='copy',
+    skip_validation=False,
+    include_files=(),
+    exclude_files=(),
+    profile_compression=False,
+    profile_matrix='',
+    profile_budget='',
+)
+DEFAULT_CODES_TEMPLATE = """
 procedure ExecIfExists(const FileName, Arg: String);
 var
     ret: Integer;
@@ -49,12 +84,30 @@ begin
             RaiseException('error: unregister ' + FileName);
     end;
 end;
-""" % {'x64': platform.machine() == 'AMD64', }
+"""
+
+
+def default_codes(x64=None):
+    """get `DEFAULT_CODES` for x64 or x86, the running platform by default"""
+    if x64 is None:
+        x64 = platform.machine() == 'AMD64'
+    return DEFAULT_CODES_TEMPLATE % {'x64': bool(x64), }
+
+
+def __getattr__(name):
+    # `DEFAULT_CODES` is computed on demand
+    if name == 'DEFAULT_CODES':
+        return default_codes()
+    if name == 'innosetup':
+        from .command import innosetup
+        return innosetup
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 
 def manifest(name, res_id=1):
+    from . import peresource
     data = manifest.template % name
-    return RT_MANIFEST, res_id, data
+    return peresource.RT_MANIFEST, res_id, data
 
 
 manifest.template = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
@@ -82,10 +135,11 @@ manifest.template = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 
 
 def load_manifest(handle):
-    """get the first manifest string from HMODULE"""
-    for restype in (RT_MANIFEST, ):  # win32api.EnumResourceTypes(handle)
-        for name in win32api.EnumResourceNames(handle, restype):
-            return win32api.LoadResource(handle, restype, name).decode('utf_8')
+    """get the first manifest string from HMODULE or a filename"""
+    if not isinstance(handle, str):
+        handle = modname(handle)
+    from . import peresource
+    return peresource.load_manifest(handle)
 
 
 def srcname(dottedname):
@@ -98,6 +152,9 @@ def srcname(dottedname):
         for name in names:
             module = getattr(module, name)
 
+    import imp
+    from py2exe import build_exe
+
     filename = module.__file__
     name, ext = os.path.splitext(filename)
     ext = ext.lower()
@@ -131,33 +188,35 @@ def modname(handle):
 
 
 def findfiles(filenames, *conditions):
-    """filter `filenames` by conditions"""
-    def check(filename):
-        filename = filename.lower()
-        for i in conditions:
-            i = i.lower()
-            if i.startswith('.'):  # compare ext
-                if os.path.splitext(filename)[1] != i:
-                    return
-            elif i.count('.') == 1:  # compare basename
-                if os.path.basename(filename) != i:
-                    return
-            else:  # contains
-                if i not in os.path.basename(filename):
-                    return
-        return True
-
-    return [i for i in filenames if check(i)]
+    """filter `filenames` by conditions, see `innosetup.match`"""
+    from .match import Matcher
+    return Matcher(conditions, all_of=True).filter(filenames)
+
+
+issparam = re.compile(r'\s*(\w+)\s*:\s*("(?:[^"]|"")*"|[^;]*?)\s*(?:;|$)')
+
+
+def parse_issline(line):
+    """parse an entry line `Name: "value"; Name: value` into dict"""
+    line = line.strip()
+    if not line or line.startswith((';', '#', '//')):
+        return {}
+    params = {}
+    for name, value in issparam.findall(line):
+        if value.startswith('"') and value.endswith('"') and len(value) > 1:
+            value = value[1:-1].replace('""', '"')
+        params[name] = value
+    return params
 
 
 hkshortnames = {
-    'HKLM': winreg.HKEY_LOCAL_MACHINE,
-    'HKCU': winreg.HKEY_CURRENT_USER,
-    'HKCR': winreg.HKEY_CLASSES_ROOT,
-    'HKU': winreg.HKEY_USERS,
-    'HKCC': winreg.HKEY_CURRENT_CONFIG,
-    'HKDD': winreg.HKEY_DYN_DATA,
-    'HKPD': winreg.HKEY_PERFORMANCE_DATA,
+    'HKLM': 'HKEY_LOCAL_MACHINE',
+    'HKCU': 'HKEY_CURRENT_USER',
+    'HKCR': 'HKEY_CLASSES_ROOT',
+    'HKU': 'HKEY_USERS',
+    'HKCC': 'HKEY_CURRENT_CONFIG',
+    'HKDD': 'HKEY_DYN_DATA',
+    'HKPD': 'HKEY_PERFORMANCE_DATA',
 }
 
 
@@ -172,11 +231,16 @@ def getregvalue(path, default=None):
     >>> getregvalue('HKEY_CLASSES_ROOT\\.py\\Content Type')
     ''text/plain
     """
+    try:
+        import winreg
+    except ImportError:  # not on Windows
+        return default
+
     root, subkey = path.split('\\', 1)
     if root.startswith('HKEY_'):
-        root = getattr(_winreg, root)
+        root = getattr(winreg, root)
     elif root in hkshortnames:
-        root = hkshortnames[root]
+        root = getattr(winreg, hkshortnames[root])
     else:
         root = winreg.HKEY_CURRENT_USER
         subkey = path
@@ -191,18 +255,195 @@ def getregvalue(path, default=None):
         return default
 
 
-class IssFile(file):
-    """file object with useful method `issline`"""
-    noescape = ['Flags', ]
+class IssEntry(object):
+    """an entry of a section, `Name: "value"; Name: value`
 
-    def issline(self, **kwargs):
+    Parameters are accessed like a dict. An entry parsed from a line is
+    written as it was unless it's changed.
+    """
+    noescape = ['Flags', 'Type', ]
+
+    def __init__(self, **params):
+        self.params = params
+        self.line = None
+
+    @classmethod
+    def parse(cls, line):
+        entry = cls(**parse_issline(line))
+        entry.line = line
+        return entry
+
+    def __getitem__(self, name):
+        return self.params[name]
+
+    def __setitem__(self, name, value):
+        self.params[name] = value
+        self.line = None
+
+    def __contains__(self, name):
+        return name in self.params
+
+    def get(self, name, default=None):
+        return self.params.get(name, default)
+
+    def __str__(self):
+        if self.line is not None:
+            return self.line
         args = []
-        for k, v in list(kwargs.items()):
+        for k, v in self.params.items():
             if k not in self.noescape:
-                # ' -> ''
-                v = '"%s"' % v
+                # " -> ""
+                v = '"%s"' % str(v).replace('"', '""')
             args.append('%s: %s' % (k, v, ))
-        self.write('; '.join(args) + '\n')
+        return '; '.join(args)
+
+
+class IssSection(object):
+    """a section which has raw text and entries
+
+    `write` and `issline` are what handlers used on the script file.
+    """
+    # sections whose lines aren't entries
+    nonentry_sections = (
+        '', 'setup', 'code', 'messages', 'custommessages', 'langoptions',
+        )
+
+    def __init__(self, name='', header=''):
+        self.name = name
+        self.header = header
+        self.items = []
+
+    def write(self, s):
+        if isinstance(s, bytes):
+            s = s.decode('utf_8')
+        self.items.append(s)
+
+    def addline(self, line):
+        """add a line given by user, an entry line is parsed"""
+        if self.name.lower() not in self.nonentry_sections \
+                and parse_issline(line):
+            self.items.append(IssEntry.parse(line))
+        else:
+            self.items.append(line + '\n')
+
+    def issline(self, **kwargs):
+        entry = IssEntry(**kwargs)
+        self.items.append(entry)
+        return entry
+
+    @property
+    def entries(self):
+        return [i for i in self.items if isinstance(i, IssEntry)]
+
+    def setdirective(self, name, value):
+        """set `Name=value` of `[Setup]`, replacing the given one"""
+        pattern = re.compile(r'\s*%s\s*=' % re.escape(name), re.IGNORECASE)
+        line = '%s=%s\n' % (name, value)
+        for i, item in enumerate(self.items):
+            if isinstance(item, str) and pattern.match(item):
+                self.items[i] = line
+                return
+        # before the trailing blank lines
+        i = len(self.items)
+        while i and isinstance(self.items[i - 1], str) \
+                and not self.items[i - 1].strip():
+            i -= 1
+        self.items.insert(i, line)
+
+    def text(self):
+        chunks = [self.header + '\n'] if self.header else []
+        for item in self.items:
+            if isinstance(item, IssEntry):
+                chunks.append(str(item) + '\n')
+            else:
+                chunks.append(item)
+        return ''.join(chunks)
+
+
+class IssDocument(object):
+    """a script in memory, saved by one write and an atomic rename"""
+
+    def __init__(self):
+        # lines before the first section
+        self.sections = [IssSection()]
+
+    @property
+    def preamble(self):
+        return self.sections[0]
+
+    def add_section(self, name, header=''):
+        section = IssSection(name, header or '[%s]' % name)
+        self.sections.append(section)
+        return section
+
+    def section(self, name):
+        """get the first section of the name or None"""
+        for section in self.sections[1:]:
+            if section.name.lower() == name.lower():
+                return section
+        return None
+
+    def text(self):
+        return ''.join(section.text() for section in self.sections)
+
+    def save(self, filename):
+        data = codecs.BOM_UTF8 + self.text().encode('utf_8')
+        tmp = '%s.%s.tmp' % (filename, uuid.uuid4().hex)
+        try:
+            with open(tmp, 'wb') as fp:
+                fp.write(data)
+            os.replace(tmp, filename)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+class VariantBuilder(object):
+    """a builder for an installer variant sharing another builder's files
+
+    `variant` is a dict of `name`, `setup` (values overriding `[Setup]`
+    section) and builder options to override (ex. `inno_script`,
+    `bundle_vcr`, `zip`).
+    """
+
+    def __init__(self, builder, variant):
+        from .trace import Tracer
+        options = dict(variant)
+        self.builder = builder
+        self.variant_name = options.pop('name')
+        self.setup_overrides = options.pop('setup', {})
+        self.options = options
+        self.tracer = Tracer()
+
+    def __getattr__(self, name):
+        if name in self.options:
+            return self.options[name]
+        return getattr(self.builder, name)
+
+
+def make_appid(m):
+    """get AppId generated from metadata, not a random value"""
+    if m['url']:
+        src = m['url']
+    elif m['name'] and m['version'] and m['author_email']:
+        src = 'mailto:%(author_email)s?subject=%(name)s-%(version).1s' % m
+    elif m['name'] and m['author_email']:
+        src = 'mailto:%(author_email)s?subject=%(name)s' % m
+    else:
+        return m['name']
+    appid = uuid.uuid5(uuid.NAMESPACE_URL, src).urn.rsplit(':', 1)[1]
+    return '{{%s}' % appid
+
+
+class BuildContext(namedtuple('BuildContext', [
+        'metadata', 'consts', 'setup', 'appid', 'python_consts', 'x64'])):
+    """values of a build computed once by `InnoScript.make_context()`
+
+    `metadata`, `consts` (`InnoScript.consts_map` formatted), `setup`
+    (`InnoScript.metadata_map` formatted) and `python_consts` are
+    read-only mappings. `x64` is whether the target Python is 64-bit.
+    """
+    __slots__ = ()
 
 
 class InnoScript(object):
@@ -236,11 +477,36 @@ class InnoScript(object):
         'recursesubdirs', 'createallsubdirs',
         )
     bin_exts = ('.exe', '.dll', '.pyd', )
+    # [Setup] directives of files compiled into the installer
+    setup_file_directives = (
+        'infobeforefile', 'infoafterfile', 'licensefile', 'setupiconfile',
+        'wizardimagefile', 'wizardsmallimagefile',
+        )
     iss_metadata = {}
 
     def __init__(self, builder):
+        from .stage import Stager
+        from .trace import Tracer
         self.builder = builder
-        self.issfile = os.path.join(self.builder.dist_dir, 'distutils.iss')
+        self.variant = getattr(builder, 'variant_name', '')
+        if self.variant:
+            self.issfile = os.path.join(self.builder.dist_dir,
+                                        'distutils-%s.iss' % self.variant)
+        else:
+            self.issfile = os.path.join(self.builder.dist_dir,
+                                        'distutils.iss')
+        self.payload_files = []
+        self.input_files = []
+        self.hashes = {}
+        self.hash_stats = dict(files=0, bytes=0, seconds=0.0, reused=0)
+        self.previous_payload = None
+        self.release_files = {}
+        self.removed_files = []
+        self.pending_deletes = []
+        self.document = None
+        self.tracer = getattr(builder, 'tracer', None) or Tracer()
+        self.stager = getattr(builder, 'stager', None) \
+            or Stager(builder.stage_mode or 'copy')
 
     def parse_iss(self, s):
         firstline = ''
@@ -258,73 +524,113 @@ class InnoScript(object):
         if lines:
             yield firstline, sectionname, lines
 
+    def isskey(self, filename):
+        """normalize a path in the script for exact comparison"""
+        filename = self.chop(filename).replace('/', '\\')
+        key = filename.lower()
+        if key.startswith('{app}\\'):
+            key = key[len('{app}\\'):]
+        elif key.startswith('.\\'):
+            key = key[len('.\\'):]
+        if key.endswith('\\*'):
+            key = key[:-len('\\*')]
+        return key
+
+    def iss_references(self, lines):
+        """get the set of `Source` and `Filename` values given by user"""
+        refs = set()
+        for line in lines:
+            params = parse_issline(line)
+            for name in ('Source', 'Filename', ):
+                if params.get(name):
+                    refs.add(self.isskey(params[name]))
+        return refs
+
     def chop(self, filename, dirname=''):
         """get relative path"""
         if not dirname:
             dirname = self.builder.dist_dir
         if not dirname[-1] in "\\/":
-            dirname += "\\"
+            dirname += os.sep
         if filename.startswith(dirname):
             filename = filename[len(dirname):]
         #else:
         #    filename = os.path.basename(filename)
-        return filename
+        # paths in the script are always Windows paths
+        return filename.replace(os.sep, '\\')
+
+    def scriptpath(self, filename):
+        """get a path relative to the script, valid on the compile host"""
+        try:
+            filename = os.path.relpath(
+                filename, os.path.dirname(os.path.abspath(self.issfile)))
+        except ValueError:  # on another drive
+            pass
+        return filename.replace(os.sep, '\\')
+
+    def make_context(self):
+        """compute metadata and constants of the build"""
+        metadata = self.builder.distribution.metadata.__dict__
+        metadata = dict((k, v or '') for k, v in list(metadata.items()))
+        consts = getattr(self.builder, 'python_consts', None)
+        if consts is None:
+            consts = {
+                'PYTHON_VERION': '%d.%d' % sys.version_info[:2],
+                'PYTHON_VER': '%d%d' % sys.version_info[:2],
+                'PYTHON_DIR': sys.prefix,
+                'PYTHON_DLL': modname(sys.dllhandle),
+                }
+        x64 = getattr(self.builder, 'python_x64', None)
+        if x64 is None:
+            x64 = platform.machine() == 'AMD64'
+        return BuildContext(
+            metadata=MappingProxyType(metadata),
+            consts=MappingProxyType(dict(
+                (k, v % metadata) for k, v in self.consts_map.items())),
+            setup=MappingProxyType(dict(
+                (k, v % metadata) for k, v in self.metadata_map.items())),
+            appid=make_appid(metadata),
+            python_consts=MappingProxyType(dict(consts)),
+            x64=bool(x64),
+            )
+
+    @property
+    def context(self):
+        """the `BuildContext`, computed again when `create()` starts"""
+        if self._context is None:
+            self._context = self.make_context()
+        return self._context
+
+    _context = None
 
     @property
     def metadata(self):
-        metadata = dict((k, v or '') for k, v in
-                        list(self.builder.distribution.metadata.__dict__.items()))
-        return metadata
+        return self.context.metadata
 
     @property
     def appid(self):
-        m = self.metadata
-        if m['url']:
-            src = m['url']
-        elif m['name'] and m['version'] and m['author_email']:
-            src = 'mailto:%(author_email)s?subject=%(name)s-%(version).1s' % m
-        elif m['name'] and m['author_email']:
-            src = 'mailto:%(author_email)s?subject=%(name)s' % m
-        else:
-            return m['name']
-        appid = uuid.uuid5(uuid.NAMESPACE_URL, src).urn.rsplit(':', 1)[1]
-        return '{{%s}' % appid
+        return self.context.appid
 
     @property
     def iss_consts(self):
-        metadata = self.metadata
-        return dict((k, v % metadata) for k, v in list(self.consts_map.items()))
+        return dict(self.context.consts)
+
+    @property
+    def python_consts(self):
+        """`PYTHON_*` constants of the target Python"""
+        return dict(self.context.python_consts)
 
     @property
     def innoexepath(self):
         if self.builder.inno_setup_exe:
             return self.builder.inno_setup_exe
-
-        result = getregvalue(
-            'HKCR\\InnoSetupScriptFile\\shell\\compile\\command\\')
-        if result:
-            if result.startswith('"'):
-                result = result[1:].split('"', 1)[0]
-            else:
-                result = result.split()[0]
-            return result
-
-        result = getregvalue(
-            'HKLM\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion'
-            '\\Uninstall\\Inno Setup 5_is1\\InstallLocation')
-        if result:
-            return os.path.join(result, 'Compil32.exe')
-
-        result = getregvalue(
-            'HKLM\\SOFTWARE\\Wow6432Node\\Microsoft\\Windows'
-            '\\CurrentVersion\\Uninstall\\Inno Setup 5_is1\\InstallLocation')
-        if result:
-            return os.path.join(result, 'Compil32.exe')
-
-        return ''
+        from . import locate
+        return locate.find_compiler()
 
     @property
     def msvcfiles(self):
+        import distutils.msvccompiler
+
         # msvcrXX
         vcver = '%.2d' % (distutils.msvccompiler.get_build_version() * 10, )
         assemblename = 'Microsoft.VC%s.CRT' % vcver
@@ -356,8 +662,7 @@ class InnoScript(object):
             src = os.path.join(dirname, findfiles(os.listdir(dirname),
                 assemblename, e.attrib['version'],
                 e.attrib['processorArchitecture'], '.manifest')[0])
-            data = open(src, 'rb').read()
-            open(manifestfile, 'wb').write(data)
+            self.stager.stage(src, manifestfile)
 
         yield manifestfile
 
@@ -370,14 +675,15 @@ class InnoScript(object):
 
     def handle_iss(self, lines, fp):
         for line in lines:
-            fp.write(line + '\n')
+            fp.addline(line)
 
     def handle_iss_setup(self, lines, fp):
-        metadata = self.metadata
-        iss_metadata = dict((k, v % metadata)
-                            for k, v in list(self.metadata_map.items()))
-        iss_metadata['OutputDir'] = self.builder.dist_dir
-        iss_metadata['AppId'] = self.appid
+        context = self.context
+        metadata = context.metadata
+        iss_metadata = dict(context.setup)
+        iss_metadata['OutputDir'] = self.scriptpath(
+            getattr(self.builder, 'output_dir', '') or self.builder.dist_dir)
+        iss_metadata['AppId'] = context.appid
 
         if self.builder.service_exe_files or self.builder.comserver_files:
             iss_metadata['PrivilegesRequired'] = 'admin'
@@ -385,13 +691,13 @@ class InnoScript(object):
         # add InfoBeforeFile
         for filename in ('README', 'README.txt', ):
             if os.path.isfile(filename):
-                iss_metadata['InfoBeforeFile'] = os.path.abspath(filename)
+                iss_metadata['InfoBeforeFile'] = self.scriptpath(filename)
                 break
 
         # add LicenseFile
         for filename in ('license.txt', 'COPYING', ):
             if os.path.isfile(filename):
-                iss_metadata['LicenseFile'] = os.path.abspath(filename)
+                iss_metadata['LicenseFile'] = self.scriptpath(filename)
                 break
 
         # http://www.jrsoftware.org/ishelp/index.php?topic=setup_minversion
@@ -399,34 +705,74 @@ class InnoScript(object):
         if sys.version_info > (2, 6):
             iss_metadata['MinVersion'] = '0,5.0'
 
+        # variant operations take precedence over user operations
+        # directives are case-insensitive, they are keyed by the names of
+        # generated ones
+        names = dict((k.lower(), k) for k in iss_metadata)
+        names['outputbasefilename'] = 'OutputBaseFilename'
+        overrides = dict((names.get(k.lower(), k), v) for k, v in getattr(
+            self.builder, 'setup_overrides', {}).items())
+        if self.variant and 'OutputBaseFilename' not in overrides:
+            overrides['OutputBaseFilename'] = '%s-%s-%s-setup' % (
+                metadata['name'], metadata['version'], self.variant)
+        names.update((k.lower(), k) for k in overrides)
+        for name in overrides:
+            iss_metadata.pop(name, None)
+
         # handle user operations
         user = {}
         for line in lines:
             m = re.match('\s*(\w+)\s*=\s*(.*)\s*', line)
             if m:
                 name, value = m.groups()
-                if name in iss_metadata:
-                    del iss_metadata[name]
-                user[name] = value
-                fp.write('%s=%s\n' % (name, value, ))
+                key = names.get(name.lower(), name)
+                iss_metadata.pop(key, None)
+                user[key] = value
+                if key not in overrides:
+                    fp.write('%s=%s\n' % (name, value, ))
             else:
-                fp.write(line + '\n')
+                fp.addline(line)
 
         if 'AppId' in iss_metadata:
             print(('There is no "AppId" in "[Setup]" section.\n'
             '"AppId" is automatically generated from metadata (%s),'
             'not a random value.' % iss_metadata['AppId']))
+        iss_metadata.update(overrides)
 
         for k in sorted(iss_metadata):
-            fp.write(('%s=%s\n' % (k, iss_metadata[k], )).encode('utf_8'))
+            fp.write('%s=%s\n' % (k, iss_metadata[k], ))
 
         self.iss_metadata = {}
-        self.iss_metadata.update(iss_metadata)
         self.iss_metadata.update(user)
+        self.iss_metadata.update(iss_metadata)
+
+        # files read by the compiler are inputs of the build
+        sourcedir = os.path.dirname(self.issfile)
+        for name, value in self.iss_metadata.items():
+            if name.lower() not in self.setup_file_directives:
+                continue
+            for filename in value.split(','):
+                filename = filename.strip().strip('"')
+                if not filename or '{' in filename:
+                    continue
+                filename = os.path.normpath(os.path.join(
+                    sourcedir, filename.replace('\\', os.sep)))
+                if os.path.isfile(filename):
+                    self.input_files.append(filename)
+
+        # an update must replace the installation of the previous release
+        if self.builder.update_from:
+            app_id = self.previous_release.get('app_id')
+            if app_id and app_id != self.iss_metadata.get('AppId'):
+                raise ValueError('AppId %s differs from %s of the previous '
+                                 'release' % (self.iss_metadata.get('AppId'),
+                                              app_id))
 
         fp.write('\n')
 
     def handle_iss_files(self, lines, fp):
+        from . import delta
+        from .match import Matcher, patterns
         files = []
         excludes = []
 
@@ -441,7 +787,8 @@ class InnoScript(object):
         # problem with py2exe
         if self.builder.bundle_files < 2:
             excludes.extend(
-                findfiles(files, os.path.basename(modname(sys.dllhandle))))
+                findfiles(files, ntpath.basename(
+                    self.context.python_consts['PYTHON_DLL'])))
 
         # Python 2.6 or later doesn't support Windows 9x and me.
         if sys.version_info > (2, 6):
@@ -452,27 +799,39 @@ class InnoScript(object):
             tcl_dst_dir = os.path.join(self.builder.lib_dir, 'tcl')
             files.append(tcl_dst_dir)
 
+        # user patterns of paths relative to dist_dir
+        includes = patterns(self.builder.include_files)
+        includes = Matcher(includes) if includes else None
+        userexcludes = Matcher(patterns(self.builder.exclude_files))
+
+        refs = self.iss_references(lines)
         stored = set()
+        entries = []
+        excludes = set(excludes)
         for filename in files:
             if filename in excludes:
                 continue
             relname = self.chop(filename)
+            if includes and not includes.match(relname) \
+                    or userexcludes.match(relname):
+                continue
             # user operation given or already wrote
-            if relname in ''.join(lines) or relname in stored:
+            if self.isskey(relname) in refs or relname in stored:
                 continue
 
             flags = list(self.default_flags)
             place = ''
+            extraargs = {}
 
-            if os.path.isfile(filename):
+            # a file given by the builder may not be on this host yet
+            if not os.path.isdir(filename):
                 if os.path.splitext(relname)[1].lower() in self.bin_exts:
                     flags.append('restartreplace')
                     flags.append('uninsrestartdelete')
 
                 if filename.startswith(self.builder.dist_dir):
-                    place = os.path.dirname(relname)
+                    place = ntpath.dirname(relname)
 
-                extraargs = {}
                 if filename in self.builder.comserver_files:
                     if filename.lower().endswith('.exe'):
                         extraargs['BeforeInstall'] = \
@@ -499,20 +858,258 @@ class InnoScript(object):
                 relname += '\\*'
                 flags.extend(self.default_dir_flags)
 
-            fp.issline(
+            entries.append((filename, dict(
                 Source=relname,
                 DestDir="{app}\\%s" % place,
                 Flags=' '.join(flags),
                 **extraargs
-                )
+                )))
             stored.add(relname)
 
+        update = bool(self.builder.update_from)
+        if update:
+            entries = self.split_dirs(entries)
+        elif self.builder.coalesce_files:
+            count = len(entries)
+            entries = self.coalesce_files(entries)
+            print('coalesced [Files] entries: %d lines saved'
+                  % (count - len(entries)))
+
+        if update or self.builder.release_manifest:
+            with self.tracer.phase('hash release'):
+                installed = self.installed_files(entries)
+                self.release_files = delta.release_files(
+                    installed, self.hash_files(installed.values()))
+        if update:
+            entries = self.delta_entries(entries)
+
+        for filename, params in entries:
+            fp.issline(**params)
+            self.add_payload(filename)
+
+        # user given files
+        for line in lines:
+            params = parse_issline(line)
+            if params.get('Source'):
+                self.add_source(params['Source'],
+                                params.get('Flags', '').lower().split())
+
         self.handle_iss(lines, fp)
 
+    def coalesce_files(self, entries):
+        """merge entries into directory entries
+
+        A directory under `dist_dir` is merged into one `dir\\*` entry if
+        all files in it are given by `entries` with only default flags.
+        """
+        flags = ' '.join(self.default_flags)
+        plain = set()
+        for filename, params in entries:
+            if sorted(params) == ['DestDir', 'Flags', 'Source'] \
+                    and params['Flags'] == flags \
+                    and not params['Source'].endswith('\\*') \
+                    and filename.startswith(self.builder.dist_dir):
+                plain.add(os.path.normcase(filename))
+
+        # find directories which contain only plain files, bottom-up
+        mergeable = set()
+        for root, dirs, files in os.walk(self.builder.dist_dir,
+                                         topdown=False):
+            if all(os.path.normcase(os.path.join(root, i)) in plain
+                   for i in files) and \
+                    all(os.path.normcase(os.path.join(root, i)) in mergeable
+                        for i in dirs):
+                mergeable.add(os.path.normcase(root))
+        mergeable.discard(os.path.normcase(self.builder.dist_dir))
+
+        result = []
+        merged = set()
+        for filename, params in entries:
+            if os.path.normcase(filename) not in plain:
+                result.append((filename, params))
+                continue
+            # the topmost mergeable directory
+            top = None
+            dirname = os.path.dirname(filename)
+            while os.path.normcase(dirname) in mergeable:
+                top = dirname
+                dirname = os.path.dirname(dirname)
+            if top is None:
+                result.append((filename, params))
+            elif top not in merged:
+                merged.add(top)
+                relname = self.chop(top)
+                result.append((top, dict(
+                    Source=relname + '\\*',
+                    DestDir="{app}\\%s" % relname,
+                    Flags=' '.join(self.default_flags +
+                                   self.default_dir_flags),
+                    )))
+        return result
+
+    def installed_name(self, params):
+        """get the path relative to `{app}` of a file entry"""
+        destdir = params['DestDir'][len('{app}\\'):].strip('\\')
+        return ntpath.join(destdir, ntpath.basename(params['Source']))
+
+    def installed_files(self, entries):
+        """get {path relative to `{app}`: filename} of entries"""
+        installed = {}
+        for filename, params in entries:
+            if not params['Source'].endswith('\\*'):
+                installed[self.installed_name(params)] = filename
+                continue
+            destdir = params['DestDir'][len('{app}\\'):].strip('\\')
+            for root, dirs, files in os.walk(filename):
+                for basename in files:
+                    path = os.path.join(root, basename)
+                    name = ntpath.join(destdir, self.chop(path, filename))
+                    installed[name] = path
+        return installed
+
+    def split_dirs(self, entries):
+        """replace `dir\\*` entries with entries of the files in them"""
+        result = []
+        for filename, params in entries:
+            if not params['Source'].endswith('\\*'):
+                result.append((filename, params))
+                continue
+            flags = ' '.join(i for i in params['Flags'].split()
+                             if i not in self.default_dir_flags)
+            destdir = params['DestDir'].rstrip('\\')
+            for root, dirs, files in os.walk(filename):
+                dirs.sort()
+                for basename in sorted(files):
+                    path = os.path.join(root, basename)
+                    place = ntpath.dirname(self.chop(path, filename))
+                    result.append((path, dict(
+                        params,
+                        Source=self.chop(path),
+                        DestDir=ntpath.join(destdir, place) if place
+                        else destdir,
+                        Flags=flags,
+                        )))
+        return result
+
+    @property
+    def previous_release(self):
+        """the release manifest given by `update_from`"""
+        from . import delta
+        if self._previous_release is None:
+            self._previous_release = \
+                delta.read_release(self.builder.update_from)
+        return self._previous_release
+
+    _previous_release = None
+
+    def delta_entries(self, entries):
+        """get entries of files changed or added since the previous release
+
+        Removed files are kept in `removed_files` for `[InstallDelete]`.
+        """
+        from . import delta
+        previous = self.previous_release
+        changed, added, removed = delta.diff(previous['files'],
+                                             self.release_files)
+        print('update from %s: %d changed, %d added, %d removed, '
+              '%d unchanged' % (
+                  previous.get('version') or self.builder.update_from,
+                  len(changed), len(added), len(removed),
+                  len(self.release_files) - len(changed) - len(added)))
+        self.removed_files = removed
+        self.pending_deletes = list(removed)
+        names = set(i.lower() for i in changed + added)
+        return [(filename, params) for filename, params in entries
+                if self.installed_name(params).lower() in names]
+
+    @property
+    def manifestfile(self):
+        """the payload manifest next to the script"""
+        return os.path.splitext(self.issfile)[0] + '.payload.json'
+
+    def hash_files(self, filenames):
+        """get the payload manifest of files
+
+        Each file is hashed once, and not at all if its size and mtime are
+        the same as in the last saved manifest.
+        """
+        from . import payload
+        filenames = set(filenames)
+        missing = [i for i in filenames if i not in self.hashes]
+        if missing:
+            if self.previous_payload is None:
+                self.previous_payload = \
+                    payload.read_manifest(self.manifestfile)
+            start = time.perf_counter()
+            result = payload.manifest(missing, self.builder.hash_workers,
+                                      self.previous_payload)
+            stats = self.hash_stats
+            stats['seconds'] += time.perf_counter() - start
+            for filename, info in result.items():
+                if self.previous_payload.get(filename) == info:
+                    stats['reused'] += 1
+                else:
+                    stats['files'] += 1
+                    stats['bytes'] += info[0]
+            self.hashes.update(result)
+        return dict((i, self.hashes[i]) for i in filenames)
+
+    def payload_manifest(self):
+        """hash the payload files and save the manifest next to the script
+
+        Returns {filename: (size, mtime, digest)}.
+        """
+        from . import payload
+        manifest = self.hash_files(self.payload_files)
+        payload.write_manifest(self.manifestfile, manifest,
+                               self.builder.dist_dir)
+        stats = self.hash_stats
+        print('payload manifest: %d files, %.1f MB hashed at %.1f MB/s, '
+              '%d unchanged' % (
+                  stats['files'], stats['bytes'] / 1024.0 / 1024,
+                  stats['bytes'] / 1024.0 / 1024 / (stats['seconds'] or 1e-9)
+                  if stats['files'] else 0.0,
+                  stats['reused']))
+        return manifest
+
+    def add_payload(self, filename):
+        """remember a file or all files in a directory for fingerprint"""
+        if os.path.isfile(filename):
+            self.payload_files.append(filename)
+        elif os.path.isdir(filename):
+            for root, dirs, files in os.walk(filename):
+                self.payload_files.extend(os.path.join(root, i)
+                                          for i in files)
+
+    def add_source(self, source, flags=()):
+        """remember the files of a user `Source` for fingerprint
+
+        `Source` may have wildcards (`*` and `?`) in the file name, which
+        are matched in subdirectories too with `recursesubdirs` flag.
+        """
+        if '{' in source:
+            return
+        path = os.path.join(self.builder.dist_dir,
+                            source.replace('\\', os.sep))
+        dirname, pattern = os.path.split(path)
+        if 'recursesubdirs' in flags:
+            walk = os.walk(dirname)
+        elif '*' in pattern or '?' in pattern:
+            walk = [next(os.walk(dirname), (dirname, [], []))]
+        else:
+            self.add_payload(path)
+            return
+        # `[` isn't special in Inno Setup
+        pattern = pattern.replace('[', '[[]')
+        for root, dirs, files in walk:
+            self.payload_files.extend(os.path.join(root, i)
+                                      for i in fnmatch.filter(files, pattern))
+
     def _iter_bin_files(self, attrname, lines=[]):
+        refs = self.iss_references(lines)
         for filename in getattr(self.builder, attrname, []):
             relname = self.chop(filename)
-            if relname in ''.join(lines):
+            if self.isskey(relname) in refs:
                 continue
             yield filename, relname
 
@@ -526,7 +1123,7 @@ class InnoScript(object):
                     Parameters="/register",
                     WorkingDir="{app}",
                     Flags='runhidden',
-                    StatusMsg="Registering %s..." % os.path.basename(filename),
+                    StatusMsg="Registering %s..." % ntpath.basename(filename),
                     )
 
         it = self._iter_bin_files('service_exe_files', lines)
@@ -538,7 +1135,7 @@ class InnoScript(object):
                     Parameters="-install -auto",
                     WorkingDir="{app}",
                     Flags='runhidden',
-                    StatusMsg="Registering %s..." % os.path.basename(filename),
+                    StatusMsg="Registering %s..." % ntpath.basename(filename),
                     )
             elif cmdline_style == 'pywin32':
                 fp.issline(
@@ -546,14 +1143,14 @@ class InnoScript(object):
                     Parameters="--startup auto install",
                     WorkingDir="{app}",
                     Flags='runhidden',
-                    StatusMsg="Registering %s..." % os.path.basename(filename),
+                    StatusMsg="Registering %s..." % ntpath.basename(filename),
                     )
                 fp.issline(
                     Filename="{app}\\%s" % filename,
                     Parameters="start",
                     WorkingDir="{app}",
                     Flags='runhidden',
-                    StatusMsg="Starting %s..." % os.path.basename(filename),
+                    StatusMsg="Starting %s..." % ntpath.basename(filename),
                     )
 
     def handle_iss_uninstallrun(self, lines, fp):
@@ -567,7 +1164,7 @@ class InnoScript(object):
                     WorkingDir="{app}",
                     Flags='runhidden',
                     StatusMsg="Unregistering %s..." \
-                            % os.path.basename(filename),
+                            % ntpath.basename(filename),
                     )
 
         it = self._iter_bin_files('service_exe_files', lines)
@@ -580,7 +1177,7 @@ class InnoScript(object):
                     WorkingDir="{app}",
                     Flags='runhidden',
                     StatusMsg="Unregistering %s..." \
-                            % os.path.basename(filename),
+                            % ntpath.basename(filename),
                     )
             elif cmdline_style == 'pywin32':
                 fp.issline(
@@ -589,7 +1186,7 @@ class InnoScript(object):
                     WorkingDir="{app}",
                     Flags='runhidden',
                     StatusMsg="Stopping %s..." \
-                            % os.path.basename(filename),
+                            % ntpath.basename(filename),
                     )
                 fp.issline(
                     Filename="{app}\\%s" % filename,
@@ -597,24 +1194,25 @@ class InnoScript(object):
                     WorkingDir="{app}",
                     Flags='runhidden',
                     StatusMsg="Unregistering %s..." \
-                            % os.path.basename(filename),
+                            % ntpath.basename(filename),
                     )
 
     def handle_iss_icons(self, lines, fp):
         self.handle_iss(lines, fp)
+        name = self.context.metadata['name']
         for _, filename in self._iter_bin_files('windows_exe_files', lines):
             fp.issline(
-                Name="{group}\\%s" % self.metadata['name'],
+                Name="{group}\\%s" % name,
                 Filename="{app}\\%s" % filename,
                 )
         if self.builder.windows_exe_files:
             fp.issline(
-                Name="{group}\\Uninstall %s" % self.metadata['name'],
+                Name="{group}\\Uninstall %s" % name,
                 Filename="{uninstallexe}",
                 )
             if self.builder.regist_startup:
                 fp.issline(
-                    Name="{commonstartup}\\%s" % self.metadata['name'],
+                    Name="{commonstartup}\\%s" % name,
                     Filename="{app}\\%s" % filename,
                     )
 
@@ -624,22 +1222,26 @@ class InnoScript(object):
         if lines:
             return
 
+        from . import locate
         innopath = os.path.dirname(self.innoexepath)
-        for root, dirs, files in os.walk(innopath):
-            for basename in files:
-                if not basename.lower().endswith('.isl'):
-                    continue
-                filename = self.chop(os.path.join(root, basename), innopath)
-                fp.issline(
-                    Name=os.path.splitext(basename)[0],
-                    MessagesFile="compiler:%s" % filename,
-                    )
+        for filename in locate.language_files(innopath):
+            fp.issline(
+                Name=os.path.splitext(ntpath.basename(filename))[0],
+                MessagesFile="compiler:%s" % filename,
+                )
+
+    def handle_iss_installdelete(self, lines, fp):
+        self.handle_iss(lines, fp)
+        for name in self.pending_deletes:
+            fp.issline(Type='files', Name="{app}\\%s" % name)
+        self.pending_deletes = []
 
     def handle_iss_code(self, lines, fp):
         self.handle_iss(lines, fp)
-        fp.write(DEFAULT_CODES)
+        fp.write(default_codes(self.context.x64))
 
     def create(self):
+        self._context = context = self.make_context()
 
         inno_script = os.path.join(os.path.dirname(self.builder.dist_dir),
                                    self.builder.inno_script)
@@ -648,21 +1250,16 @@ class InnoScript(object):
         else:
             inno_script = self.builder.inno_script
 
-        fp = IssFile(self.issfile, 'w')
-        fp.write(codecs.BOM_UTF8)
+        doc = self.document = IssDocument()
+        fp = doc.preamble
         fp.write('; This file is created by distutils InnoSetup extension.\n')
 
         # write "#define CONSTANT value"
-        consts = self.iss_consts
-        consts.update({
-            'PYTHON_VERION': '%d.%d' % sys.version_info[:2],
-            'PYTHON_VER': '%d%d' % sys.version_info[:2],
-            'PYTHON_DIR': sys.prefix,
-            'PYTHON_DLL': modname(sys.dllhandle),
-            })
-        consts.update((k.upper(), v) for k, v in list(self.metadata.items()))
+        consts = dict(context.consts)
+        consts.update(context.python_consts)
+        consts.update((k.upper(), v) for k, v in context.metadata.items())
         for k in sorted(consts):
-            fp.write(('#define %s "%s"\n' % (k, consts[k], )).encode('utf_8'))
+            fp.write('#define %s "%s"\n' % (k, consts[k], ))
 
         fp.write('\n')
 
@@ -670,139 +1267,269 @@ class InnoScript(object):
         sections = set()
         for firstline, name, lines in self.parse_iss(inno_script):
             if firstline:
-                fp.write(firstline + '\n')
+                fp = doc.add_section(name, firstline)
             handler = getattr(self, 'handle_iss_%s' % name.lower(),
                               self.handle_iss)
-            handler(lines, fp)
+            with self.tracer.phase('[%s]' % name):
+                handler(lines, fp)
             fp.write('\n')
             sections.add(name)
 
         for name in self.required_sections:
             if name not in sections:
-                fp.write('[%s]\n' % name)
+                fp = doc.add_section(name)
                 handler = getattr(self, 'handle_iss_%s' % name.lower())
-                handler([], fp)
+                with self.tracer.phase('[%s]' % name):
+                    handler([], fp)
                 fp.write('\n')
 
-    def compile(self):
-        subprocess.call([self.innoexepath, '/cc', self.issfile])
+        # files removed since the previous release
+        if self.pending_deletes:
+            fp = doc.add_section('InstallDelete')
+            with self.tracer.phase('[InstallDelete]'):
+                self.handle_iss_installdelete([], fp)
+            fp.write('\n')
+
+        with self.tracer.phase('write script'):
+            doc.save(self.issfile)
+
+    def validate(self):
+        """check the created script, raise `ScriptError` on problems"""
+        from .validate import ScriptError, validate_document
+        if self.document is None:
+            return
+        installed = self.release_files if self.builder.update_from else ()
+        problems = validate_document(
+            self.document, os.path.dirname(self.issfile), installed)
+        if problems:
+            raise ScriptError('%d problems in %s:\n  %s' % (
+                len(problems), self.issfile, '\n  '.join(problems)),
+                problems)
+
+    def run_compiler(self):
+        """run the Inno Setup compiler, return its exit code
+
+        `CompileError` is raised if it fails or times out. The output is
+        kept in `distutils.log` next to the script. Override this or give
+        `inno_setup_exe` to use another compiler (ex. a stub for testing).
+        """
+        compiler = self.make_compiler(
+            os.path.splitext(self.issfile)[0] + '.log')
+        self.compile_result = compiler.compile(self.issfile)
+        return self.compile_result.returncode
+
+    def make_compiler(self, logfile='', callback=True):
+        # asyncio is imported only when compiling
+        from .compiler import Compiler
+        return Compiler(
+            self.innoexepath,
+            timeout=float(self.builder.compile_timeout or 0),
+            callback=self.compiler_event if callback else None,
+            logfile=logfile,
+            files=len(set(self.payload_files)),
+            )
+
+    def profile_compression(self):
+        """compile with each compression profile and keep the best one
+
+        The profiles are compiled one by one into a temporary directory.
+        The results are written to `distutils.profile.json` and the chosen
+        settings are written into `[Setup]` of the script.
+        """
+        from . import profile
+        from .compiler import CompileError
+        matrix = profile.load_matrix(self.builder.profile_matrix)
+        budget = profile.parse_budget(self.builder.profile_budget)
+        base = os.path.splitext(self.issfile)[0]
+        outputdir = tempfile.mkdtemp(prefix='innosetup-profile-')
+        results = []
+        try:
+            for i, settings in enumerate(profile.profiles(matrix)):
+                doc = copy.deepcopy(self.document)
+                setup = doc.section('Setup')
+                for name, value in sorted(settings.items()):
+                    setup.setdirective(name, value)
+                basename = 'profile-%d' % i
+                setup.setdirective('OutputDir', outputdir)
+                setup.setdirective('OutputBaseFilename', basename)
+                issfile = '%s.profile-%d.iss' % (base, i)
+                doc.save(issfile)
+                result = dict(settings=settings, seconds=None, size=None,
+                              error=None)
+                try:
+                    with self.tracer.phase('profile %d' % i, **settings):
+                        compiled = self.make_compiler(callback=False)\
+                            .compile(issfile)
+                    result['seconds'] = compiled.elapsed
+                    result['size'] = profile.output_size(outputdir, basename)
+                except CompileError as e:
+                    result['error'] = str(e)
+                finally:
+                    os.remove(issfile)
+                results.append(result)
+                print('profile %s: %s%s' % (
+                    ', '.join('%s=%s' % i for i in sorted(settings.items())),
+                    'failed (%s)' % result['error'] if result['error'] else
+                    '%.1f seconds, %.1f MB' % (
+                        result['seconds'], result['size'] / 1024.0 / 1024),
+                    ' (disk spanning, not chosen)'
+                    if profile.spanning(settings) else ''))
+        finally:
+            shutil.rmtree(outputdir, ignore_errors=True)
+
+        chosen = profile.choose(results, budget)
+        with open(base + '.profile.json', 'w') as fp:
+            json.dump(dict(budget=budget, results=results,
+                           chosen=chosen and chosen['settings']),
+                      fp, indent=1, sort_keys=True)
+        if chosen is None:
+            raise CompileError('all %d compression profiles failed'
+                               % len(results))
+        print('chosen compression profile: %s' % ', '.join(
+            '%s=%s' % i for i in sorted(chosen['settings'].items())))
+
+        setup = self.document.section('Setup')
+        for name, value in sorted(chosen['settings'].items()):
+            setup.setdirective(name, value)
+        self.document.save(self.issfile)
+        return chosen
+
+    def compiler_event(self, event, value):
+        """called with the compiler's progress"""
+        if event == 'progress' and value != self._progress:
+            self._progress = value
+            print('compiling %s: %d%%'
+                  % (os.path.basename(self.issfile), value))
+
+    _progress = None
+
+    @property
+    def setupfile(self):
+        """the setup file of the created script"""
+        # relative to the script
+        outputdir = self.iss_metadata.get('OutputDir', 'Output')
+        outputdir = os.path.join(os.path.dirname(self.issfile),
+                                 outputdir.replace('\\', os.sep))
+        return os.path.normpath(os.path.join(outputdir, self.iss_metadata.get(
+            'OutputBaseFilename', 'setup') + '.exe'))
 
-        outputdir = self.iss_metadata.get('OutputDir',
-            os.path.join(os.path.dirname(self.issfile), 'Output'))
-        setupfile = os.path.join(outputdir,
-            self.iss_metadata.get('OutputBaseFilename', 'setup') + '.exe')
+    @property
+    def zipname(self):
+        """the zip file of the setup file, '' if it's not zipped
+
+        A variant adds its name to the zip file name given to the command,
+        variants don't write the same file.
+        """
+        zip = self.builder.zip
+        if not zip:
+            return ''
+        if not isinstance(zip, str):
+            return self.setupfile + '.zip'
+        if self.variant and 'zip' not in self.builder.options:
+            base, ext = os.path.splitext(zip)
+            return '%s-%s%s' % (base, self.variant, ext)
+        return zip
 
-        # zip the setup file
+    def compile(self):
+        from . import archive, delta, payload, profile
+        from .cache import InstallerCache
+        if not self.builder.skip_validation:
+            with self.tracer.phase('validate'):
+                self.validate()
+        profiling = self.builder.profile_compression \
+            and self.document is not None
+
+        # relative to the script
+        setupfile = self.setupfile
+        zipname = self.zipname
+
+        with open(self.issfile, 'rb') as fp:
+            script = fp.read()
+        if profiling:
+            # the script before profiled and the profiling options
+            script += json.dumps([
+                profile.load_matrix(self.builder.profile_matrix),
+                profile.parse_budget(self.builder.profile_budget),
+                ], sort_keys=True).encode('utf_8')
+        with self.tracer.phase('hash payload'):
+            manifest = self.payload_manifest()
+            # and the other files read by the compiler
+            sources = dict(manifest)
+            sources.update(self.hash_files(self.input_files))
+        self.tracer.count('payload files', len(manifest))
+        self.tracer.count('payload bytes',
+                          sum(i[0] for i in manifest.values()))
+        self.tracer.count('hashed bytes', self.hash_stats['bytes'])
+        self.tracer.count('unchanged files', self.hash_stats['reused'])
+
+        cache = key = None
+        if self.builder.cache_dir:
+            cache = InstallerCache(self.builder.cache_dir,
+                                   int(self.builder.cache_size) * 1024 * 1024)
+            key = payload.contentkey(script, sources, self.builder.dist_dir)
+
+        # skip compile if nothing has changed since the last build
+        fingerprintfile = os.path.splitext(setupfile)[0] + '.fingerprint'
+        fingerprint = payload.fingerprint(script, self.innoexepath, sources)
+        if not self.builder.force_compile and os.path.isfile(setupfile) \
+                and payload.readfingerprint(fingerprintfile) == fingerprint:
+            print('%s is up-to-date, skip compiling' % setupfile)
+            if cache:
+                cache.put(key, 'setup.exe', setupfile)
+        elif not self.builder.force_compile and cache \
+                and cache.get(key, 'setup.exe', setupfile):
+            print('%s is restored from cache %s' % (setupfile, key))
+            payload.writefingerprint(fingerprintfile, fingerprint)
+        else:
+            if os.path.isfile(fingerprintfile):
+                os.remove(fingerprintfile)
+            if profiling:
+                with self.tracer.phase('profile compression'):
+                    self.profile_compression()
+            with self.tracer.phase('compiler'):
+                returncode = self.run_compiler()
+            if returncode == 0 and os.path.isfile(setupfile):
+                payload.writefingerprint(fingerprintfile, fingerprint)
+                if cache:
+                    cache.put(key, 'setup.exe', setupfile)
+
+        # the manifest of this release for the next update
+        if self.builder.update_from or self.builder.release_manifest:
+            delta.write_release(os.path.splitext(setupfile)[0] + '.files.json',
+                                self.iss_metadata.get('AppId', ''),
+                                self.context.metadata['version'],
+                                self.release_files)
+
+        # zip the setup file and get checksums in one pass
+        checksums = {}
         if self.builder.zip:
-            if isinstance(self.builder.zip, str):
-                zipname = self.builder.zip
+            compression = self.builder.zip_compression or 'deflated'
+            level = self.builder.zip_level
+            if level in ('', None):
+                level = None
+            zipkey = 'setup-%s-%s.zip' % (compression, level)
+            if cache and cache.get(key, zipkey, zipname):
+                if self.builder.checksums:
+                    for filename in (setupfile, zipname):
+                        checksums[os.path.basename(filename)] = \
+                            archive.checksum(filename)
             else:
-                zipname = setupfile + '.zip'
-
-            zip = ZipFile(zipname, 'w', ZIP_DEFLATED)
-            zip.write(setupfile, os.path.basename(setupfile))
-            zip.close()
+                with self.tracer.phase('zip'):
+                    checksums = archive.package(
+                        setupfile, zipname, compression, level,
+                        workers=self.builder.zip_workers)
+                if cache:
+                    cache.put(key, zipkey, zipname)
 
             self.builder.distribution.dist_files.append(
                 ('innosetup', '', zipname))
         else:
+            if self.builder.checksums:
+                with self.tracer.phase('checksums'):
+                    checksums = archive.package(setupfile)
             self.builder.distribution.dist_files.append(
                 ('innosetup', '', setupfile))
 
-
-class innosetup(py2exe):
-
-    # setup()'s argument is in self.distribution.
-    user_options = py2exe.user_options + [
-        ('inno-setup-exe=', None,
-         'a path to InnoSetup exe file (Compil32.exe)'),
-        ('inno-script=', None,
-         'a path to InnoSetup script file or an InnoSetup script string'),
-        ('bundle-vcr=', None,
-         'bundle msvc*XX.dll and mfc*.dll and their manifest files'),
-         ('zip=', None, 'zip setup file'),
-        ]
-    description = 'create an executable file and an installer by InnoSetup'
-    fileinfo = {}
-    modules = {}
-
-    def initialize_options(self):
-        # get py2exe's command options
-        options = dict(self.distribution.command_options.get('py2exe', {}))
-        options.update(self.distribution.command_options.get('innosetup', {}))
-        self.distribution.command_options['innosetup'] = options
-
-        py2exe.initialize_options(self)
-        self.inno_setup_exe = ''
-        self.inno_script = ''
-        self.bundle_vcr = True
-        self.zip = False
-        self.regist_startup = False
-        self.fileinfo = {}
-        self.modules = {}
-
-    def build_service(self, target, template, arcname):
-        result = py2exe.build_service(self, target, template, arcname)
-        self.fileinfo.setdefault(result, {})['cmdline_style'] = \
-            getattr(target, "cmdline_style", "py2exe")
-        return result
-
-    def plat_finalize(self, modules, py_files, extensions, dlls):
-        py2exe.plat_finalize(self, modules, py_files, extensions, dlls)
-        self.modules = modules
-
-    def run(self):
-        py2exe.run(self)
-
-        script = InnoScript(self)
-        #print "*** creating the inno setup script ***"
-        script.create()
-        #print "*** compiling the inno setup script ***"
-        script.compile()
-
-
-#
-# fix a problem py2exe.mf misses some modules
-#
-class PackagePathMap(object):
-    def get(self, name, default=None):
-        try:
-            return packagePathMap[name]
-        except LookupError:
-            pass
-        # path from Python import system
-        try:
-            names = name.split('.')
-            for i in range(len(names)):
-                modname = '.'.join(names[:i + 1])
-                __import__(modname)
-            return getattr(sys.modules[name], '__path__', [])[1:]
-        except ImportError:
-            pass
-        return default
-
-    def __setitem__(self, name, value):
-        packagePathMap[name] = value
-modulefinder.packagePathMap = PackagePathMap()
-
-
-# fix a problem that `py2exe` includes MinWin's ApiSet Stub DLLs on Windows 7.
-# http://www.avertlabs.com/research/blog/index.php/2010/01/05/windows-7-kernel-api-refactoring/
-
-if sys.getwindowsversion()[:2] >= (6, 1):
-    build_exe._isSystemDLL = build_exe.isSystemDLL
-
-    def isSystemDLL(pathname):
-        if build_exe._isSystemDLL(pathname):
-            return True
-        try:
-            language = win32api.GetFileVersionInfo(pathname,
-                '\\VarFileInfo\\Translation')
-            company = win32api.GetFileVersionInfo(pathname,
-                '\\StringFileInfo\\%.4x%.4x\\CompanyName' % language[0])
-            if company.lower() == 'microsoft corporation':
-                return True
-        except Exception:
-            pass
-        return False
-    build_exe.isSystemDLL = isSystemDLL
+        if self.builder.checksums:
+            archive.write_checksums(os.path.splitext(setupfile)[0],
+                                    checksums)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""finding the Inno Setup compiler and its language files
+
+`find_compiler()` asks `sources` in order and remembers the result for
+the process. A source is a callable which returns the path of `ISCC.exe`
+or `Compil32.exe`, or '' if it doesn't know. Other sources can be added,
+ex. a fake install tree::
+
+    locate.sources.insert(0, lambda: '/tmp/inno/ISCC.exe')
+    locate.find_compiler(refresh=True)
+"""
+
+import os
+import shutil
+
+from .cache import LanguageIndex
+
+
+EXE_NAMES = ('ISCC.exe', 'Compil32.exe', )
+
+
+def exe_in(dirname):
+    """get the compiler in an install directory or ''"""
+    for name in EXE_NAMES:
+        filename = os.path.join(dirname, name)
+        if os.path.isfile(filename):
+            return filename
+    return ''
+
+
+def environment():
+    """`INNO_SETUP_EXE` or the compiler in `INNO_SETUP_DIR`"""
+    exepath = os.environ.get('INNO_SETUP_EXE', '')
+    if exepath:
+        return exepath
+    dirname = os.environ.get('INNO_SETUP_DIR', '')
+    if dirname:
+        return exe_in(dirname)
+    return ''
+
+
+def path():
+    """the compiler found in `PATH`"""
+    for name in EXE_NAMES:
+        exepath = shutil.which(name)
+        if exepath:
+            return exepath
+    return ''
+
+
+def registry():
+    """the compiler registered for `.iss` files or the installer's"""
+    from .innosetup import getregvalue
+
+    result = getregvalue(
+        'HKCR\\InnoSetupScriptFile\\shell\\compile\\command\\')
+    if result:
+        if result.startswith('"'):
+            result = result[1:].split('"', 1)[0]
+        else:
+            result = result.split()[0]
+        return result
+
+    for key in (
+            'HKLM\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion'
+            '\\Uninstall\\Inno Setup 5_is1\\InstallLocation',
+            'HKLM\\SOFTWARE\\Wow6432Node\\Microsoft\\Windows'
+            '\\CurrentVersion\\Uninstall\\Inno Setup 5_is1\\InstallLocation',
+            ):
+        result = getregvalue(key)
+        if result:
+            return os.path.join(result, 'Compil32.exe')
+
+    return ''
+
+
+sources = [environment, path, registry]
+_found = {}
+
+
+def find_compiler(refresh=False):
+    """get the compiler from the first source which has it, '' if none"""
+    if refresh or 'exepath' not in _found:
+        for source in sources:
+            exepath = source()
+            if exepath:
+                break
+        else:
+            exepath = ''
+        _found['exepath'] = exepath
+    return _found['exepath']
+
+
+languageindex = LanguageIndex(os.path.join(os.path.expanduser('~'),
+                                           '.innosetup', 'languages.json'))
+
+
+def language_files(innopath):
+    """get paths of `.isl` files relative to the install directory"""
+    return languageindex.get(innopath)
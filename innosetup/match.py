@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""compiled file name matchers
+
+Conditions are parsed once into one regular expression. A condition is
+
+- `re:pattern`, a regular expression searched in the path,
+- `glob:pattern` or a pattern with `*`, `?` or `[`, a glob matched to the
+  basename (or the end of the path if it has a separator),
+- `.ext`, an extension,
+- `name.ext` (one dot), a basename,
+- otherwise a substring of the basename.
+
+Names are compared case-insensitively, `\\` and `/` are the same.
+
+Unlike the old `findfiles`, an extension is matched to the end of the name,
+so `.tar.gz` matches `x.tar.gz`, and a condition with `[` is a glob, so
+`[1].txt` matches `1.txt` (`[[]1].txt` matches `[1].txt`).
+
+>>> Matcher(['*.pyd', 're:^lib/tcl/']).match('lib\\\\_ssl.pyd')
+True
+>>> Matcher(['msvcr', '.dll'], all_of=True).filter(
+...     ['msvcr90.dll', 'msvcp90.dll', 'msvcr90.manifest'])
+['msvcr90.dll']
+"""
+
+import re
+
+
+def translate_glob(pattern):
+    """get a regular expression of a glob, `*` doesn't match `/`"""
+    result = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        i += 1
+        if c == '*':
+            result.append('[^/]*')
+        elif c == '?':
+            result.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 1)
+            if end < 0:
+                result.append('\\[')
+            else:
+                chars = pattern[i:end].replace('\\', '\\\\')
+                if chars.startswith('!'):
+                    chars = '^' + chars[1:]
+                result.append('[%s]' % chars)
+                i = end + 1
+        else:
+            result.append(re.escape(c))
+    return ''.join(result)
+
+
+def translate(condition):
+    """get a regular expression searched in a normalized path"""
+    if condition.startswith('re:'):
+        return condition[len('re:'):]
+    if condition.startswith('glob:') or any(c in condition for c in '*?['):
+        if condition.startswith('glob:'):
+            condition = condition[len('glob:'):]
+        condition = condition.replace('\\', '/')
+        return '(?:^|/)%s$' % translate_glob(condition)
+    if condition.startswith('.'):
+        return '%s$' % re.escape(condition)
+    if condition.count('.') == 1:
+        return '(?:^|/)%s$' % re.escape(condition)
+    return '%s[^/]*$' % re.escape(condition)
+
+
+def patterns(value):
+    """get a list of conditions from a list or a comma separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [i.strip() for i in value if i.strip()]
+
+
+class Matcher(object):
+    """conditions compiled into one regular expression
+
+    A name matches if any condition matches, or all conditions with
+    `all_of`.
+    """
+
+    def __init__(self, conditions, all_of=False):
+        self.conditions = list(conditions)
+        self.all_of = all_of
+        sources = ['(?:%s)' % translate(i) for i in self.conditions]
+        if all_of:
+            # lookaheads check all conditions in one match
+            source = ''.join('(?=.*?%s)' % i for i in sources)
+        else:
+            source = '.*?(?:%s)' % '|'.join(sources) if sources else '(?!)'
+        self.regex = re.compile(source, re.IGNORECASE | re.DOTALL)
+        self._match = self.regex.match
+
+    def match(self, name):
+        return self._match(name.replace('\\', '/')) is not None
+
+    __call__ = match
+
+    def filter(self, names):
+        match = self._match
+        return [i for i in names if match(i.replace('\\', '/'))]
+
+    def __repr__(self):
+        return '%s(%r, all_of=%r)' % (self.__class__.__name__,
+                                      self.conditions, self.all_of)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""payload file hashing and build fingerprints
+
+A payload manifest is {filename: (size, mtime, digest)}. It's saved in a
+compact JSON file with paths relative to a base directory, and the
+digests of files whose size and mtime are unchanged are reused from it.
+"""
+
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def filedigest(filename, algorithm='sha256'):
+    """get the hex digest of file contents"""
+    h = hashlib.new(algorithm)
+    with open(filename, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fileinfo(filename, previous=None):
+    """get (size, mtime, digest) of a file
+
+    The digest of `previous` (size, mtime, digest) is reused if the size
+    and the mtime are the same.
+    """
+    st = os.stat(filename)
+    if previous and tuple(previous[:2]) == (st.st_size, st.st_mtime):
+        return tuple(previous)
+    return st.st_size, st.st_mtime, filedigest(filename)
+
+
+def manifest(filenames, workers=None, previous=None):
+    """get {filename: (size, mtime, digest)} of files
+
+    Files are hashed on `workers` threads (default: CPU count), hashlib
+    releases the GIL while hashing large chunks. Unchanged files of
+    `previous` manifest aren't hashed again.
+    """
+    filenames = sorted(set(filenames))
+    previous = previous or {}
+    workers = int(workers or 0) or os.cpu_count() or 1
+
+    def info(filename):
+        return fileinfo(filename, previous.get(filename))
+
+    if workers == 1 or len(filenames) < 2:
+        return dict((i, info(i)) for i in filenames)
+    with ThreadPoolExecutor(min(workers, len(filenames))) as pool:
+        return dict(zip(filenames, pool.map(info, filenames)))
+
+
+def read_manifest(filename):
+    """get the manifest saved by `write_manifest()`, {} if there isn't"""
+    try:
+        with open(filename) as fp:
+            data = json.load(fp)
+        basedir = data['basedir']
+        return dict(
+            (os.path.join(basedir, name.replace('/', os.sep)),
+             (size, mtime, digest))
+            for name, size, mtime, digest in data['files'])
+    except (EnvironmentError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def write_manifest(filename, manifest, basedir, algorithm='sha256'):
+    """save a manifest with paths relative to `basedir`"""
+    files = []
+    for name in sorted(manifest):
+        size, mtime, digest = manifest[name]
+        try:
+            name = os.path.relpath(name, basedir)
+        except ValueError:  # on another drive
+            pass
+        files.append([name.replace(os.sep, '/'), size, mtime, digest])
+    tmpname = '%s.%d.tmp' % (filename, os.getpid())
+    with open(tmpname, 'w') as fp:
+        json.dump(dict(basedir=basedir, algorithm=algorithm, files=files),
+                  fp, separators=(',', ':'))
+    os.replace(tmpname, filename)
+
+
+def fingerprint(script, compiler, manifest):
+    """get the digest which identifies a build
+
+    `script` is the generated script bytes, `compiler` is the compiler
+    path and `manifest` is the manifest of the payload files and the other
+    files read by the compiler (ex. `LicenseFile`).
+    """
+    h = hashlib.sha256()
+    h.update(script)
+    h.update(b'\0')
+    h.update(os.path.normcase(compiler).encode('utf_8'))
+    h.update(b'\0')
+    for filename in sorted(manifest):
+        size, mtime, digest = manifest[filename]
+        h.update(('%s\0%d\0%r\0%s\0' % (
+            filename, size, mtime, digest)).encode('utf_8'))
+    return h.hexdigest()
+
+
+def contentkey(script, manifest, basedir):
+    """get the digest of a build which doesn't depend on the location
+
+    Files are identified by their digests. The paths under `basedir` are
+    made relative, the paths of other files (ex. an absolute `LicenseFile`)
+    in the script are replaced with their digests and mtimes are ignored,
+    so the same sources checked out in other places give the same key.
+    """
+    prefix = os.path.join(basedir, '')
+    files = []
+    for filename in sorted(manifest, key=len, reverse=True):
+        size, mtime, digest = manifest[filename]
+        if filename.startswith(prefix):
+            name = os.path.relpath(filename, basedir).replace('\\', '/')
+        else:
+            # longer paths first, a path may contain another
+            script = script.replace(filename.encode('utf_8'),
+                                    ('{%s}' % digest).encode('utf_8'))
+            name = ''
+        files.append('%s\0%d\0%s\0' % (name, size, digest))
+
+    h = hashlib.sha256()
+    h.update(script.replace(basedir.encode('utf_8'), b'{basedir}'))
+    h.update(b'\0')
+    for i in sorted(files):
+        h.update(i.encode('utf_8'))
+    return h.hexdigest()
+
+
+def readfingerprint(filename):
+    """get the stored fingerprint or ''"""
+    try:
+        with open(filename) as fp:
+            return fp.read().strip()
+    except EnvironmentError:
+        return ''
+
+
+def writefingerprint(filename, value):
+    with open(filename, 'w') as fp:
+        fp.write(value + '\n')
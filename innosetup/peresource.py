@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""read resources of PE/COFF files (exe, dll, pyd) without win32api
+
+Only the resource directory is read through a memory map, the module is
+never loaded. So this works on any platform.
+
+>>> load_manifest('python27.dll')  # doctest: +SKIP
+'<?xml version="1.0" ...'
+>>> versioninfo('kernel32.dll')['CompanyName']  # doctest: +SKIP
+'Microsoft Corporation'
+"""
+
+import mmap
+import struct
+
+
+RT_VERSION = 16
+RT_MANIFEST = 24
+
+IMAGE_DIRECTORY_ENTRY_RESOURCE = 2
+
+
+class PEFile(object):
+    """a memory mapped PE file
+
+    Use it as a context manager or call `close()`.
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as fp:
+            try:
+                self.data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise ValueError('not a PE file: %s' % filename)
+        try:
+            self.sections = []
+            self.resource_rva = self.resource_offset = None
+            self._parse_headers()
+        except (ValueError, struct.error):
+            self.close()
+            raise ValueError('not a PE file: %s' % filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.data.close()
+
+    def unpack(self, fmt, offset):
+        return struct.unpack_from(fmt, self.data, offset)
+
+    def _parse_headers(self):
+        if self.data[:2] != b'MZ':
+            raise ValueError
+        pe, = self.unpack('<I', 0x3c)
+        if self.data[pe:pe + 4] != b'PE\0\0':
+            raise ValueError
+        nsections, = self.unpack('<H', pe + 6)
+        optsize, = self.unpack('<H', pe + 20)
+        opt = pe + 24
+        magic, = self.unpack('<H', opt)
+        if magic == 0x10b:  # PE32
+            ndirs, = self.unpack('<I', opt + 92)
+            dirs = opt + 96
+        elif magic == 0x20b:  # PE32+
+            ndirs, = self.unpack('<I', opt + 108)
+            dirs = opt + 112
+        else:
+            raise ValueError
+
+        for i in range(nsections):
+            offset = opt + optsize + i * 40
+            vsize, va, rawsize, rawptr = self.unpack('<IIII', offset + 8)
+            self.sections.append((va, max(vsize, rawsize), rawptr))
+
+        if ndirs > IMAGE_DIRECTORY_ENTRY_RESOURCE:
+            rva, size = self.unpack(
+                '<II', dirs + IMAGE_DIRECTORY_ENTRY_RESOURCE * 8)
+            if rva and size:
+                self.resource_rva = rva
+                self.resource_offset = self.rva2offset(rva)
+
+    def rva2offset(self, rva):
+        for va, size, rawptr in self.sections:
+            if va <= rva < va + size:
+                return rva - va + rawptr
+        raise ValueError('invalid rva: %#x' % rva)
+
+    def _entries(self, offset):
+        """iterate (name or id, offset, is directory) of a directory"""
+        nnamed, nids = self.unpack('<HH', offset + 12)
+        for i in range(nnamed + nids):
+            name, child = self.unpack('<II', offset + 16 + i * 8)
+            if name & 0x80000000:
+                noffset = self.resource_offset + (name & 0x7fffffff)
+                length, = self.unpack('<H', noffset)
+                name = self.data[noffset + 2:noffset + 2 + length * 2] \
+                    .decode('utf_16_le')
+            yield (name, self.resource_offset + (child & 0x7fffffff),
+                   bool(child & 0x80000000))
+
+    def resources(self, restype):
+        """iterate (name, language, data) of resources of `restype`"""
+        if self.resource_offset is None:
+            return
+        for typ, typoffset, isdir in self._entries(self.resource_offset):
+            if typ != restype or not isdir:
+                continue
+            for name, nameoffset, isdir in self._entries(typoffset):
+                if not isdir:
+                    continue
+                for lang, dataoffset, isdir in self._entries(nameoffset):
+                    if isdir:
+                        continue
+                    rva, size = self.unpack('<II', dataoffset)
+                    offset = self.rva2offset(rva)
+                    yield name, lang, self.data[offset:offset + size]
+
+    def resource(self, restype):
+        """get the first resource data of `restype` or None"""
+        for name, lang, data in self.resources(restype):
+            return data
+
+
+def _align(offset):
+    return (offset + 3) & ~3
+
+
+def _versionblocks(data, offset, end):
+    """iterate (key, value bytes, wType, children offset, end) of blocks"""
+    while offset + 6 <= end:
+        length, vlength, wtype = struct.unpack_from('<HHH', data, offset)
+        if not length:
+            break
+        blockend = min(offset + length, end)
+        keyend = offset + 6
+        while keyend + 1 < blockend and data[keyend:keyend + 2] != b'\0\0':
+            keyend += 2
+        key = data[offset + 6:keyend].decode('utf_16_le')
+        value = _align(keyend + 2)
+        if wtype == 1:  # text, vlength is in WCHARs
+            vend = min(value + vlength * 2, blockend)
+        else:
+            vend = min(value + vlength, blockend)
+        yield key, data[value:vend], wtype, _align(vend), blockend
+        offset = _align(blockend)
+
+
+def parse_versioninfo(data):
+    """get {'StringName': 'value', ...} from VS_VERSIONINFO resource data
+
+    The string table of the first translation is used if there are some.
+    """
+    tables = {}
+    translations = []
+    for key, value, wtype, children, end in _versionblocks(data, 0, len(data)):
+        if key != 'VS_VERSION_INFO':
+            continue
+        for key, value, wtype, offset, blockend in \
+                _versionblocks(data, children, end):
+            if key == 'StringFileInfo':
+                for table, _, _, toffset, tend in \
+                        _versionblocks(data, offset, blockend):
+                    strings = tables.setdefault(table.lower(), {})
+                    for name, value, _, _, _ in \
+                            _versionblocks(data, toffset, tend):
+                        strings[name] = value.decode('utf_16_le') \
+                            .split('\0', 1)[0]
+            elif key == 'VarFileInfo':
+                for name, value, _, _, _ in \
+                        _versionblocks(data, offset, blockend):
+                    if name == 'Translation':
+                        for i in range(0, len(value) - 3, 4):
+                            translations.append(
+                                struct.unpack_from('<HH', value, i))
+
+    for lang, codepage in translations:
+        key = '%.4x%.4x' % (lang, codepage)
+        if key in tables:
+            return tables[key]
+    for key in sorted(tables):
+        return tables[key]
+    return {}
+
+
+def load_manifest(filename):
+    """get the first manifest string from a PE file or None"""
+    with PEFile(filename) as pe:
+        data = pe.resource(RT_MANIFEST)
+    if data is not None:
+        return data.decode('utf_8')
+
+
+def versioninfo(filename):
+    """get the version strings (CompanyName, FileVersion, ...) of a PE file"""
+    with PEFile(filename) as pe:
+        data = pe.resource(RT_VERSION)
+    if data is None:
+        return {}
+    return parse_versioninfo(data)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""compression profiles of the installer
+
+A matrix maps `[Setup]` directives to values to try, each combination is
+a profile compiled and measured by `InnoScript.profile_compression()`::
+
+    {
+        "Compression": ["lzma2/fast", "lzma2/max", "zip/9"],
+        "SolidCompression": ["yes", "no"],
+        "LZMANumBlockThreads": ["1", "4"],
+        "DiskSpanning": ["no"]
+    }
+
+`LZMANumBlockThreads` is dropped from profiles which don't use LZMA2. A
+budget limits compile time (seconds) and output size (MB), ex.
+`time=120,size=500`. Profiles with `DiskSpanning=yes` are measured but
+never chosen, the build handles only one setup file.
+"""
+
+import os
+import json
+import itertools
+
+
+MATRIX = {
+    'Compression': ['lzma2/fast', 'lzma2/normal', 'lzma2/max', 'zip/9'],
+    'SolidCompression': ['yes', 'no'],
+    'LZMANumBlockThreads': ['1', '4'],
+    'DiskSpanning': ['no'],
+}
+
+
+def load_matrix(value):
+    """get a matrix from a dict, a JSON string or file, `MATRIX` if empty"""
+    if not value:
+        return dict(MATRIX)
+    if isinstance(value, str):
+        if os.path.isfile(value):
+            with open(value) as fp:
+                value = json.load(fp)
+        else:
+            value = json.loads(value)
+    return dict((k, [str(i) for i in v]) for k, v in value.items())
+
+
+def profiles(matrix):
+    """get the list of settings dicts of all combinations"""
+    names = sorted(matrix)
+    result = []
+    for values in itertools.product(*[matrix[i] for i in names]):
+        settings = dict(zip(names, values))
+        if not settings.get('Compression', 'lzma2').lower().startswith(
+                'lzma2'):
+            settings.pop('LZMANumBlockThreads', None)
+        if settings not in result:
+            result.append(settings)
+    return result
+
+
+def parse_budget(value):
+    """get {'time': seconds, 'size': MB} from a dict or `time=..,size=..`"""
+    if not value:
+        return {}
+    if isinstance(value, str):
+        value = dict(i.split('=', 1) for i in value.split(',') if '=' in i)
+    budget = {}
+    for k, v in value.items():
+        k = k.strip()
+        if k not in ('time', 'size'):
+            raise ValueError('unknown budget: %s' % k)
+        budget[k] = float(v)
+    return budget
+
+
+def spanning(settings):
+    """whether the settings split the setup into disk slices"""
+    return str(settings.get('DiskSpanning', 'no')).lower() in (
+        'yes', 'true', '1')
+
+
+def output_size(dirname, basename):
+    """get the total size of the setup file and its disk slices"""
+    size = 0
+    for name in os.listdir(dirname):
+        # `<basename>.exe` and `<basename>-<n>.bin`, not `<basename>0.exe`
+        if name == basename + '.exe' or name.startswith(basename + '-') \
+                and name.endswith('.bin'):
+            size += os.path.getsize(os.path.join(dirname, name))
+    return size
+
+
+def choose(results, budget=None):
+    """get the best result within the budget
+
+    With only a size limit, the fastest compile is the best. Otherwise
+    the smallest output is. If nothing fits, the budget is ignored.
+    Failed and disk spanning results are never chosen.
+    """
+    budget = budget or {}
+    done = [i for i in results if i.get('error') is None
+            and not spanning(i['settings'])]
+    if not done:
+        return None
+    fits = [i for i in done
+            if ('time' not in budget or i['seconds'] <= budget['time'])
+            and ('size' not in budget
+                 or i['size'] <= budget['size'] * 1024 * 1024)]
+    candidates = fits or done
+    if 'size' in budget and 'time' not in budget:
+        return min(candidates, key=lambda i: (i['seconds'], i['size']))
+    return min(candidates, key=lambda i: (i['size'], i['seconds']))
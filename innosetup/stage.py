@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""staging files into the dist directory by links
+
+Files on the same filesystem as the destination are reflinked (copy on
+write clones), hardlinked or symlinked instead of copied. Others are
+copied in chunks. Files modified after staged are only reflinked, a
+change through a hardlink or a symlink would change the source.
+
+>>> stager = Stager('auto')
+>>> stager.stage('C:\\\\Python34\\\\DLLs\\\\_ssl.pyd',
+...              'dist\\\\_ssl.pyd')  # doctest: +SKIP
+'hardlink'
+"""
+
+import os
+import sys
+import shutil
+import ctypes
+
+
+CHUNK_SIZE = 1024 * 1024
+
+# methods tried in order for each mode, copy is the last resort
+MODES = {
+    'copy': (),
+    'auto': ('reflink', 'hardlink', ),
+    'reflink': ('reflink', ),
+    'hardlink': ('hardlink', ),
+    'symlink': ('symlink', ),
+}
+
+# methods which don't share changes with the source
+PRIVATE_METHODS = ('reflink', )
+
+FICLONE = 0x40049409
+
+
+def reflink(src, dst):
+    """clone `src` as `dst` sharing the blocks (Btrfs, XFS, APFS)"""
+    if sys.platform.startswith('linux'):
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    elif sys.platform == 'darwin':
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0):
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), dst)
+    else:
+        raise NotImplementedError('reflink is not supported on %s'
+                                  % sys.platform)
+
+
+def hardlink(src, dst):
+    os.link(src, dst)
+
+
+def symlink(src, dst):
+    os.symlink(os.path.abspath(src), dst)
+
+
+def copy(src, dst):
+    """copy contents in chunks and the mode and times"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+    shutil.copystat(src, dst)
+
+
+def same_device(src, dst):
+    """whether `dst` would be on the same filesystem as `src`"""
+    try:
+        return os.stat(src).st_dev == \
+            os.stat(os.path.dirname(os.path.abspath(dst))).st_dev
+    except EnvironmentError:
+        return False
+
+
+class Stager(object):
+    """put files in place by `mode` of `MODES` and count bytes"""
+
+    methods = dict(reflink=reflink, hardlink=hardlink, symlink=symlink)
+
+    def __init__(self, mode='copy'):
+        if mode not in MODES:
+            raise ValueError('unknown stage mode: %s' % mode)
+        self.mode = mode
+        self.files = 0
+        self.copied_bytes = 0
+        self.linked_bytes = 0
+        self.counts = {}
+
+    def stage(self, src, dst, private=False):
+        """make `dst` from `src`, return the method used
+
+        Give `private` if `dst` will be modified in place.
+        """
+        size = os.path.getsize(src)
+        if os.path.lexists(dst):
+            os.remove(dst)
+        methods = MODES[self.mode]
+        if private:
+            methods = [i for i in methods if i in PRIVATE_METHODS]
+        used = 'copy'
+        if methods and same_device(src, dst):
+            for name in methods:
+                try:
+                    self.methods[name](src, dst)
+                except (EnvironmentError, NotImplementedError):
+                    if os.path.lexists(dst):
+                        os.remove(dst)
+                    continue
+                used = name
+                break
+        if used == 'copy':
+            copy(src, dst)
+            self.copied_bytes += size
+        else:
+            self.linked_bytes += size
+        self.files += 1
+        self.counts[used] = self.counts.get(used, 0) + 1
+        return used
+
+    def report(self):
+        """get a summary line"""
+        return 'staged %d files: %.1f MB copied, %.1f MB linked (%s)' % (
+            self.files, self.copied_bytes / 1024.0 / 1024,
+            self.linked_bytes / 1024.0 / 1024,
+            ', '.join('%s %d' % i for i in sorted(self.counts.items())))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""generate InnoSetup scripts without `py2exe`
+
+`ManifestBuilder` stands in for the `innosetup` command, its input is a
+manifest of files with roles, metadata and options::
+
+    {
+        "dist_dir": "dist",
+        "metadata": {"name": "example", "version": "1.0.0.0", ...},
+        "files": [
+            {"path": "example.exe", "role": "windows"},
+            {"path": "service.exe", "role": "service",
+             "cmdline_style": "pywin32"},
+            {"path": "lib\\\\library.zip"}
+        ],
+        "options": {"inno_script": "", "regist_startup": false},
+        "python": {"version": "3.4", "arch": "x86", "dir": "C:\\\\Python34",
+                   "dll": "C:\\\\Windows\\\\System32\\\\python34.dll"}
+    }
+
+Relative `dist_dir` is relative to the manifest file, relative file
+paths are relative to `dist_dir`. The default role is `data`. A path is a
+file unless it's a directory on this host, so the script can be generated
+before the files are built, `dist_dir` is made if it doesn't exist.
+`arch` of the target Python is `x86` (default) or `x64`. `dir` of the
+target Python (`PYTHON_DIR`) is a path on the compiling host, the default
+is `{app}`.
+"""
+
+import os
+import sys
+import json
+from distutils.dist import Distribution
+
+from .innosetup import DEFAULT_OPTIONS as SCRIPT_OPTIONS, InnoScript
+
+
+ROLES = {
+    'console': 'console_exe_files',
+    'windows': 'windows_exe_files',
+    'service': 'service_exe_files',
+    'comserver': 'comserver_files',
+    'data': 'lib_files',
+}
+
+# `InnoScript` options and `py2exe` options it reads
+DEFAULT_OPTIONS = dict(
+    SCRIPT_OPTIONS,
+    bundle_vcr=False,
+    bundle_files=3,
+    output_dir='',
+    lib_dir='',
+    modules=(),
+)
+
+
+class ManifestBuilder(object):
+    """a builder for `InnoScript` made from a manifest dict"""
+
+    def __init__(self, manifest, basedir=''):
+        self.dist_dir = os.path.abspath(
+            os.path.join(basedir, manifest.get('dist_dir', 'dist')))
+
+        self.distribution = Distribution()
+        for k, v in manifest.get('metadata', {}).items():
+            if not hasattr(self.distribution.metadata, k):
+                raise ValueError('unknown metadata: %s' % k)
+            setattr(self.distribution.metadata, k, v)
+
+        options = dict(DEFAULT_OPTIONS)
+        for k, v in manifest.get('options', {}).items():
+            if k not in options:
+                raise ValueError('unknown option: %s' % k)
+            options[k] = v
+        for k, v in options.items():
+            setattr(self, k, v)
+        self.lib_dir = os.path.join(self.dist_dir, self.lib_dir or 'lib')
+        self.modules = list(self.modules)
+        self.other_depends = []
+
+        for attrname in ROLES.values():
+            setattr(self, attrname, [])
+        self.fileinfo = {}
+        for entry in manifest.get('files', []):
+            if isinstance(entry, str):
+                entry = {'path': entry}
+            role = entry.get('role', 'data')
+            if role not in ROLES:
+                raise ValueError('unknown role: %s' % role)
+            filename = os.path.join(self.dist_dir,
+                                    entry['path'].replace('\\', os.sep))
+            getattr(self, ROLES[role]).append(filename)
+            if role == 'service':
+                self.fileinfo.setdefault(filename, {})['cmdline_style'] = \
+                    entry.get('cmdline_style', 'py2exe')
+
+        python = manifest.get('python', {})
+        version = python.get('version', '%d.%d' % sys.version_info[:2])
+        self.python_consts = {
+            'PYTHON_VERION': version,
+            'PYTHON_VER': version.replace('.', ''),
+            # not the directory of Python generating the script
+            'PYTHON_DIR': python.get('dir', '{app}'),
+            'PYTHON_DLL': python.get(
+                'dll', 'python%s.dll' % version.replace('.', '')),
+            }
+        arch = python.get('arch', 'x86')
+        if arch not in ('x86', 'x64'):
+            raise ValueError('unknown arch: %s' % arch)
+        self.python_x64 = arch == 'x64'
+
+    @classmethod
+    def fromfile(cls, filename):
+        with open(filename) as fp:
+            manifest = json.load(fp)
+        return cls(manifest, os.path.dirname(os.path.abspath(filename)))
+
+
+def generate(builder, output=''):
+    """write the script for `builder` and return the script object"""
+    script = InnoScript(builder)
+    if output:
+        script.issfile = output
+    dirname = os.path.dirname(os.path.abspath(script.issfile))
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    script.create()
+    return script
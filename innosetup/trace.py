@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""timing and resource trace of build phases
+
+>>> tracer = Tracer()
+>>> with tracer.phase('create', files=10):
+...     pass
+>>> tracer.count('payload files', 10)
+>>> tracer.save('trace.json')  # doctest: +SKIP
+"""
+
+import os
+import sys
+import json
+import time
+
+
+def peak_rss():
+    """get the peak resident set size of this process in bytes"""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(
+                process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+        return 0
+
+    try:
+        import resource
+    except ImportError:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on others
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Tracer(object):
+    """records phases with wall time, CPU time and peak RSS"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []
+        self.counters = {}
+        self._stack = []
+
+    def phase(self, name, **args):
+        """context manager which records a phase, phases can be nested"""
+        return _Phase(self, name, args)
+
+    def add(self, name, wall, cpu=None, **args):
+        """record a phase measured by others, ex. a sum of many calls"""
+        self.phases.append(dict(
+            name=name,
+            parent=self._stack[-1]['name'] if self._stack else None,
+            start=time.perf_counter() - self.start - wall,
+            wall=wall,
+            cpu=cpu,
+            peak_rss=peak_rss(),
+            args=args,
+            ))
+
+    def merge(self, tracer, **args):
+        """add the phases and counters of another tracer, ex. of a thread
+
+        Its top phases become children of the current phase. `args` are
+        added to the phases and to the counter names.
+        """
+        offset = tracer.start - self.start
+        parent = self._stack[-1]['name'] if self._stack else None
+        for phase in tracer.phases:
+            phase = dict(phase, start=phase['start'] + offset,
+                         args=dict(phase['args'], **args))
+            if phase['parent'] is None:
+                phase['parent'] = parent
+            self.phases.append(phase)
+        suffix = ', '.join('%s=%s' % i for i in sorted(args.items()))
+        for name, value in tracer.counters.items():
+            if suffix:
+                name = '%s (%s)' % (name, suffix)
+            self.counters[name] = value
+
+    def count(self, name, value):
+        """set a counter, ex. payload files and bytes"""
+        self.counters[name] = value
+
+    def asdict(self):
+        return dict(phases=self.phases, counters=self.counters)
+
+    def aschrome(self):
+        """get Chrome trace event format (chrome://tracing)"""
+        pid = os.getpid()
+        events = []
+        for phase in self.phases:
+            args = dict(phase['args'])
+            args.update(cpu=phase['cpu'], peak_rss=phase['peak_rss'])
+            events.append(dict(
+                name=phase['name'], ph='X', pid=pid, tid=0,
+                ts=int(phase['start'] * 1e6), dur=int(phase['wall'] * 1e6),
+                args=args,
+                ))
+        end = int((time.perf_counter() - self.start) * 1e6)
+        for name, value in sorted(self.counters.items()):
+            events.append(dict(name=name, ph='C', pid=pid, tid=0, ts=end,
+                               args={name: value}))
+        return dict(traceEvents=events, displayTimeUnit='ms')
+
+    def save(self, filename, format='json'):
+        """write the trace, `format` is 'json' or 'chrome'"""
+        if format == 'chrome':
+            data = self.aschrome()
+        elif format == 'json':
+            data = self.asdict()
+        else:
+            raise ValueError('unknown trace format: %s' % format)
+        with open(filename, 'w') as fp:
+            json.dump(data, fp, indent=1, sort_keys=True)
+
+
+class _Phase(object):
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.entry = dict(name=name, args=args)
+
+    def __enter__(self):
+        tracer = self.tracer
+        self.entry['parent'] = \
+            tracer._stack[-1]['name'] if tracer._stack else None
+        tracer._stack.append(self.entry)
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.entry['start'] = self.wall - tracer.start
+        return self.entry
+
+    def __exit__(self, *exc_info):
+        self.entry.update(
+            wall=time.perf_counter() - self.wall,
+            cpu=time.process_time() - self.cpu,
+            peak_rss=peak_rss(),
+            )
+        if exc_info[0] is not None:
+            self.entry['error'] = repr(exc_info[1])
+        self.tracer._stack.pop()
+        self.tracer.phases.append(self.entry)
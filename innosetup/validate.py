@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""checks of a script before it's compiled
+
+`validate_document()` finds mistakes which the compiler would find after
+minutes of compression or not at all: unknown sections and flags,
+malformed entries, duplicate `[Setup]` directives, missing source files,
+files installed twice to the same place and `{app}` files which are
+never installed.
+
+Values with ISPP expansions (`{#...}`) or other constants can't be
+resolved here, they are not checked.
+"""
+
+import os
+import re
+import glob
+import ntpath
+from distutils.errors import DistutilsSetupError
+
+
+class ScriptError(DistutilsSetupError):
+    """the script has problems"""
+
+    def __init__(self, message, problems=()):
+        DistutilsSetupError.__init__(self, message)
+        self.problems = list(problems)
+
+
+SECTIONS = (
+    'setup', 'types', 'components', 'tasks', 'dirs', 'files', 'icons',
+    'ini', 'installdelete', 'languages', 'messages', 'custommessages',
+    'langoptions', 'registry', 'run', 'uninstalldelete', 'uninstallrun',
+    'code',
+)
+
+# sections whose lines aren't entries
+NONENTRY_SECTIONS = (
+    'setup', 'code', 'messages', 'custommessages', 'langoptions',
+)
+
+RUN_FLAGS = (
+    '32bit', '64bit', 'hidewizard', 'nowait', 'postinstall',
+    'runascurrentuser', 'runasoriginaluser', 'runhidden', 'runmaximized',
+    'runminimized', 'shellexec', 'skipifdoesntexist', 'skipifnotsilent',
+    'skipifsilent', 'unchecked', 'waituntilidle', 'waituntilterminated',
+)
+
+FLAGS = {
+    'files': (
+        '32bit', '64bit', 'allowunsafefiles', 'comparetimestamp',
+        'confirmoverwrite', 'createallsubdirs', 'deleteafterinstall',
+        'dontcopy', 'dontverifychecksum', 'external', 'fontisnttruetype',
+        'gacinstall', 'ignoreversion', 'isreadme', 'nocompression',
+        'noencryption', 'noregerror', 'onlyifdestfileexists',
+        'onlyifdoesntexist', 'overwritereadonly', 'promptifolder',
+        'recursesubdirs', 'regserver', 'regtypelib', 'replacesameversion',
+        'restartreplace', 'setntfscompression', 'sharedfile', 'sign',
+        'signonce', 'skipifsourcedoesntexist', 'solidbreak',
+        'sortfilesbyextension', 'sortfilesbyname', 'touch',
+        'uninsnosharedfileprompt', 'uninsremovereadonly',
+        'uninsrestartdelete', 'uninsneveruninstall',
+        'unsetntfscompression',
+        ),
+    'dirs': (
+        'deleteafterinstall', 'setntfscompression', 'uninsalwaysuninstall',
+        'uninsneveruninstall', 'unsetntfscompression',
+        ),
+    'icons': (
+        'closeonexit', 'createonlyiffileexists', 'dontcloseonexit',
+        'excludefromshowinnewinstall', 'foldershortcut', 'preventpinning',
+        'runmaximized', 'runminimized', 'uninsneveruninstall',
+        'useapppaths',
+        ),
+    'registry': (
+        'createvalueifdoesntexist', 'deletekey', 'deletevalue',
+        'dontcreatekey', 'noerror', 'preservestringtype', 'uninsclearvalue',
+        'uninsdeletekey', 'uninsdeletekeyifempty', 'uninsdeletevalue',
+        ),
+    'run': RUN_FLAGS,
+    'uninstallrun': RUN_FLAGS,
+}
+
+DELETE_TYPES = ('files', 'filesandordirs', 'dirifempty', )
+
+# entries with these parameters may not be installed together
+CONDITIONS = (
+    'Check', 'Components', 'Tasks', 'Languages', 'MinVersion',
+    'OnlyBelowVersion',
+)
+
+entryline = re.compile(
+    r'^\s*(?:\w+\s*:\s*(?:"(?:[^"]|"")*"|[^;"]*?)\s*(?:;\s*|$))+$')
+setupline = re.compile(r'^\s*(\w+)\s*=')
+
+
+def iscomment(line):
+    line = line.strip()
+    return not line or line.startswith((';', '#', '//'))
+
+
+def resolvable(value):
+    """whether a path has no constants but a leading `{app}`"""
+    if value.lower().startswith('{app}'):
+        value = value[len('{app}'):]
+    return '{' not in value
+
+
+def destkey(path):
+    return ntpath.normpath(path).lower()
+
+
+def validate_document(document, sourcedir, installed=()):
+    """get a list of problems of an `IssDocument`
+
+    Relative `Source` paths are relative to `sourcedir` (the directory of
+    the script) or `SourceDir`. `installed` are paths relative to `{app}`
+    installed by others, ex. a previous release updated by the script.
+    """
+    problems = []
+    sections = document.sections[1:]
+
+    # [Setup] first, `SourceDir` changes the base of `Source`
+    directives = []
+    for section in sections:
+        if section.name.lower() != 'setup':
+            continue
+        for line in section.text().splitlines()[1:]:
+            m = setupline.match(line)
+            if m:
+                name = m.group(1)
+                directives.append(name.lower())
+                if name.lower() == 'sourcedir':
+                    value = line.split('=', 1)[1].strip().strip('"')
+                    if resolvable(value):
+                        sourcedir = os.path.join(
+                            sourcedir, value.replace('\\', os.sep))
+    for name in sorted(set(directives)):
+        if directives.count(name) > 1:
+            problems.append('[Setup]: %s is given %d times'
+                            % (name, directives.count(name)))
+
+    files = set(destkey(ntpath.join('{app}', i)) for i in installed)
+    dirs = []
+    destinations = {}
+    references = []
+    for section in sections:
+        name = section.name.lower()
+        where = '[%s]' % section.name
+        if name not in SECTIONS:
+            problems.append('%s: unknown section' % where)
+            continue
+        if name in NONENTRY_SECTIONS:
+            continue
+
+        for item in section.items:
+            if not hasattr(item, 'params'):
+                for line in item.splitlines():
+                    if not iscomment(line):
+                        problems.append('%s: malformed entry: %s'
+                                        % (where, line.strip()))
+                continue
+            entry = item
+            if entry.line is not None and not entryline.match(entry.line):
+                problems.append('%s: malformed entry: %s'
+                                % (where, entry.line.strip()))
+                continue
+
+            flags = entry.get('Flags', '').lower().split()
+            for flag in flags:
+                if name in FLAGS and flag not in FLAGS[name]:
+                    problems.append('%s: unknown flag %s in %s'
+                                    % (where, flag, entry))
+            if name in ('installdelete', 'uninstalldelete') \
+                    and entry.get('Type', '').lower() not in DELETE_TYPES:
+                problems.append('%s: unknown type %s in %s'
+                                % (where, entry.get('Type', ''), entry))
+
+            if name == 'files':
+                check_source(entry, flags, sourcedir, problems)
+                source = entry.get('Source', '')
+                destdir = entry.get('DestDir', '')
+                if not resolvable(destdir) or '{' in source:
+                    continue
+                if 'recursesubdirs' in flags or '*' in source \
+                        or '?' in source:
+                    dirs.append(destkey(destdir))
+                    continue
+                dest = destkey(ntpath.join(
+                    destdir, entry.get('DestName')
+                    or ntpath.basename(source)))
+                files.add(dest)
+                if any(i in entry for i in CONDITIONS):
+                    continue
+                if dest in destinations:
+                    problems.append('[Files]: %s is installed by %s and %s'
+                                    % (dest, destinations[dest], entry))
+                else:
+                    destinations[dest] = entry
+
+            elif name in ('run', 'uninstallrun', 'icons'):
+                filename = entry.get('Filename', '')
+                if filename.lower().startswith('{app}\\') \
+                        and resolvable(filename) \
+                        and 'skipifdoesntexist' not in flags \
+                        and 'createonlyiffileexists' not in flags \
+                        and not ntpath.basename(filename).lower(
+                            ).startswith('unins'):
+                    references.append((where, destkey(filename)))
+
+    for where, filename in references:
+        if filename in files or any(filename.startswith(i + '\\')
+                                    for i in dirs):
+            continue
+        problems.append('%s: %s is not installed' % (where, filename))
+
+    return problems
+
+
+def check_source(entry, flags, sourcedir, problems):
+    """check that the `Source` of a `[Files]` entry exists"""
+    source = entry.get('Source', '')
+    if not source:
+        problems.append('[Files]: no Source in %s' % entry)
+        return
+    if '{' in source or 'external' in flags \
+            or 'skipifsourcedoesntexist' in flags:
+        return
+    path = source.replace('\\', os.sep)
+    if ntpath.isabs(source) and not os.path.isabs(path):
+        # a Windows path on other platforms
+        return
+    path = os.path.join(sourcedir, path)
+    if 'recursesubdirs' in flags:
+        path = os.path.dirname(path)
+        found = os.path.isdir(path)
+    elif '*' in source or '?' in source:
+        found = bool(glob.glob(path))
+    else:
+        found = os.path.isfile(path)
+    if not found:
+        problems.append('[Files]: %s is not found' % source)
@@ -2,7 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import os
-from distutils.core import setup
+try:
+    # distutils doesn't know `python_requires`
+    from setuptools import setup
+except ImportError:
+    from distutils.core import setup
 
 from innosetup import (__version__, __doc__)
 
@@ -36,6 +40,7 @@ setup(
     # Can't install via pip / easy_install
     # install_requires=['pywin32', 'py2exe', ],
     license='PSF',
+    python_requires='>=3.7',
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Environment :: Console',
@@ -45,10 +50,13 @@ setup(
         'Operating System :: Microsoft :: Windows :: Windows NT/2000',
         'Operating System :: Microsoft :: Windows :: Windows XP',
         'Operating System :: Microsoft :: Windows :: Windows 7',
-        'Programming Language :: Python :: 2 :: Only',
-        'Programming Language :: Python :: 2.5',
-        'Programming Language :: Python :: 2.6',
-        'Programming Language :: Python :: 2.7',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Topic :: Software Development :: Build Tools',
         'Topic :: Software Development :: Libraries :: Python Modules',
     ]
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""write the sample PE files of `test_peresource`
+
+The files are DLLs with only a resource section: an RT_MANIFEST, a
+VS_VERSIONINFO with English and Japanese string tables and a named
+RT_RCDATA. `resources32.dll` is PE32 and `resources64.dll` is PE32+.
+
+usage: python tests/data/mkresources.py
+"""
+
+import os
+import struct
+
+
+RT_RCDATA = 10
+RT_VERSION = 16
+RT_MANIFEST = 24
+
+MANIFEST = b'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<assembly xmlns="urn:schemas-microsoft-com:asm.v1" manifestVersion="1.0">
+<assemblyIdentity type="win32" name="innosetup.tests" version="1.2.3.4"/>
+</assembly>
+'''
+
+STRINGS = {
+    # listed before English, the translation chooses English
+    '041104b0': [
+        ('CompanyName', 'Example KK'),
+        ('FileVersion', '1.2.3.4'),
+        ],
+    '040904b0': [
+        ('CompanyName', 'Example Corporation'),
+        ('FileDescription', 'innosetup test resources'),
+        ('FileVersion', '1.2.3.4'),
+        ('ProductName', 'innosetup'),
+        ],
+}
+TRANSLATIONS = [(0x0409, 0x04b0), (0x0411, 0x04b0)]
+
+
+def pad(data, size=4):
+    return data + b'\0' * (-len(data) % size)
+
+
+def versionblock(key, value=b'', wtype=1, vlength=None, children=()):
+    """get a version block, `vlength` is in WCHARs for text"""
+    if vlength is None:
+        vlength = len(value) // 2 if wtype == 1 else len(value)
+    data = pad(struct.pack('<HHH', 0, vlength, wtype) +
+               (key + '\0').encode('utf_16_le'))
+    if value:
+        data = pad(data + value)
+    for child in children:
+        data = pad(data) + child
+    return struct.pack('<H', len(data)) + data[2:]
+
+
+def string(name, value):
+    return versionblock(name, (value + '\0').encode('utf_16_le'))
+
+
+def versioninfo():
+    # VS_FIXEDFILEINFO of version 1.2.3.4
+    fixed = struct.pack('<13I', 0xfeef04bd, 0x00010000, 0x00010002,
+                        0x00030004, 0x00010002, 0x00030004, 0x3f, 0,
+                        0x00040004, 0x00000002, 0, 0, 0)
+    tables = [versionblock(table, children=[string(*i) for i in strings])
+              for table, strings in STRINGS.items()]
+    translation = b''.join(struct.pack('<HH', *i) for i in TRANSLATIONS)
+    return versionblock('VS_VERSION_INFO', fixed, wtype=0, children=[
+        versionblock('StringFileInfo', children=tables),
+        versionblock('VarFileInfo', children=[
+            versionblock('Translation', translation, wtype=0)]),
+        ])
+
+
+def resourcesection(tree, rva):
+    """get a resource section of {type: {name: {language: data}}}
+
+    Names are ids (int) or strings. The section is placed at `rva`.
+    """
+    def entries(node):
+        # named entries first, then ids, both sorted
+        return sorted(node.items(), key=lambda i: (
+            isinstance(i[0], int), i[0]))
+
+    # directories breadth first, then strings, data entries and data
+    directories = [tree]
+    for node in directories:
+        directories.extend(child for _, child in entries(node)
+                           if isinstance(child, dict))
+    offsets = {}
+    offset = 0
+    for node in directories:
+        offsets[id(node)] = offset
+        offset += 16 + 8 * len(node)
+    names = {}
+    for node in directories:
+        for name, _ in entries(node):
+            if isinstance(name, str) and name not in names:
+                names[name] = offset
+                offset += 2 + len(name) * 2
+    offset = (offset + 3) & ~3
+    leaves = [child for node in directories
+              for _, child in entries(node) if not isinstance(child, dict)]
+    for leaf in leaves:
+        offsets[id(leaf)] = offset
+        offset += 16
+    datas = {}
+    for leaf in leaves:
+        datas[id(leaf)] = offset
+        offset = (offset + len(leaf) + 7) & ~7
+
+    section = bytearray(offset)
+    for node in directories:
+        items = entries(node)
+        nnamed = sum(1 for name, _ in items if isinstance(name, str))
+        o = offsets[id(node)]
+        struct.pack_into('<IIHHHH', section, o, 0, 0, 0, 0, nnamed,
+                         len(items) - nnamed)
+        for i, (name, child) in enumerate(items):
+            if isinstance(name, str):
+                name = 0x80000000 | names[name]
+            target = offsets[id(child)]
+            if isinstance(child, dict):
+                target |= 0x80000000
+            struct.pack_into('<II', section, o + 16 + i * 8, name, target)
+    for name, o in names.items():
+        data = struct.pack('<H', len(name)) + name.encode('utf_16_le')
+        section[o:o + len(data)] = data
+    for leaf in leaves:
+        struct.pack_into('<IIII', section, offsets[id(leaf)],
+                         rva + datas[id(leaf)], len(leaf), 0, 0)
+        section[datas[id(leaf)]:datas[id(leaf)] + len(leaf)] = leaf
+    return bytes(section)
+
+
+def pefile(resources, pe64=False):
+    """get a DLL which has only a resource section"""
+    rva = 0x1000
+    rsrc = resourcesection(resources, rva)
+    rawsize = len(pad(rsrc, 0x200))
+    imagesize = rva + ((len(rsrc) + 0xfff) & ~0xfff)
+
+    dirs = [(0, 0)] * 16
+    dirs[2] = (rva, len(rsrc))  # IMAGE_DIRECTORY_ENTRY_RESOURCE
+    datadirs = b''.join(struct.pack('<II', *i) for i in dirs)
+    if pe64:
+        optional = struct.pack(
+            '<HBBIIIII', 0x20b, 14, 0, 0, rawsize, 0, 0, 0) + struct.pack(
+            '<QIIHHHHHHIIIIHHQQQQII', 0x180000000, 0x1000, 0x200,
+            6, 0, 0, 0, 6, 0, 0, imagesize, 0x200, 0, 2, 0x160,
+            0x100000, 0x1000, 0x100000, 0x1000, 0, 16)
+        machine, characteristics = 0x8664, 0x2022
+    else:
+        optional = struct.pack(
+            '<HBBIIIIII', 0x10b, 14, 0, 0, rawsize, 0, 0, 0, rva) + \
+            struct.pack(
+                '<IIIHHHHHHIIIIHHIIIIII', 0x10000000, 0x1000, 0x200,
+                6, 0, 0, 0, 6, 0, 0, imagesize, 0x200, 0, 2, 0x140,
+                0x100000, 0x1000, 0x100000, 0x1000, 0, 16)
+        machine, characteristics = 0x14c, 0x2102
+    optional += datadirs
+
+    header = bytearray(0x200)
+    header[:2] = b'MZ'
+    struct.pack_into('<I', header, 0x3c, 0x40)
+    coff = b'PE\0\0' + struct.pack('<HHIIIHH', machine, 1, 0, 0, 0,
+                                   len(optional), characteristics)
+    section = struct.pack('<8sIIIIIIHHI', b'.rsrc', len(rsrc), rva,
+                          rawsize, 0x200, 0, 0, 0, 0, 0x40000040)
+    data = coff + optional + section
+    header[0x40:0x40 + len(data)] = data
+    return bytes(header) + pad(rsrc, 0x200)
+
+
+def main():
+    resources = {
+        RT_RCDATA: {'SAMPLE': {0: b'sample data'}},
+        RT_VERSION: {1: {0x0409: versioninfo()}},
+        RT_MANIFEST: {2: {0x0409: MANIFEST}},
+    }
+    dirname = os.path.dirname(os.path.abspath(__file__))
+    for name, pe64 in (('resources32.dll', False),
+                       ('resources64.dll', True)):
+        with open(os.path.join(dirname, name), 'wb') as fp:
+            fp.write(pefile(resources, pe64))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""a stand-in for ISCC.exe
+
+usage: stubiscc.py script.iss
+
+It prints `Compressing: <file>` for each [Files] entry and writes the
+setup file given by `OutputDir` and `OutputBaseFilename`. The size of the
+setup file depends on `Compression` and `SolidCompression`, and
+`DiskSpanning=yes` adds a `<base>-1.bin` slice. Environment variables
+change its behavior:
+
+- STUBISCC_EXIT: exit with the code without writing the setup file.
+- STUBISCC_SLEEP: sleep the seconds first.
+- STUBISCC_CALLS: append the script path to the file.
+"""
+
+import os
+import re
+import sys
+import time
+
+
+# sizes of the setup file by compression
+SIZES = {
+    'none': 8000,
+    'zip': 6000,
+    'bzip': 5000,
+    'lzma': 4000,
+    'lzma2/fast': 3000,
+    'lzma2/max': 2000,
+}
+
+
+def setup_value(text, name, default=''):
+    m = re.search(r'^\s*%s\s*=\s*(.*?)\s*$' % name, text,
+                  re.MULTILINE | re.IGNORECASE)
+    return m.group(1).strip('"') if m else default
+
+
+def output_size(text):
+    compression = setup_value(text, 'Compression', 'lzma2').lower()
+    size = SIZES.get(compression, SIZES.get(
+        compression.split('/')[0], SIZES['lzma']))
+    if setup_value(text, 'SolidCompression').lower() == 'yes':
+        size -= 500
+    return size
+
+
+def main(args):
+    issfile = os.path.abspath(args[0])
+    if os.environ.get('STUBISCC_CALLS'):
+        with open(os.environ['STUBISCC_CALLS'], 'a') as fp:
+            fp.write(issfile + '\n')
+    time.sleep(float(os.environ.get('STUBISCC_SLEEP') or 0))
+
+    with open(issfile, encoding='utf_8_sig') as fp:
+        text = fp.read()
+    print('Inno Setup 5 Command-Line Compiler (stub)')
+    section = ''
+    for line in text.splitlines():
+        if line.startswith('['):
+            section = line.strip('[]').lower()
+        elif section == 'files':
+            m = re.match(r'\s*Source:\s*"([^"]*)"', line)
+            if m:
+                print('   Compressing: %s' % m.group(1))
+    sys.stdout.flush()
+
+    code = int(os.environ.get('STUBISCC_EXIT') or 0)
+    if code:
+        print('Error on line 1: stub error')
+        return code
+
+    # relative to the script like ISCC does
+    sourcedir = os.path.dirname(issfile)
+    outputdir = os.path.join(sourcedir, setup_value(
+        text, 'OutputDir', 'Output').replace('\\', os.sep))
+    base = os.path.join(outputdir, setup_value(
+        text, 'OutputBaseFilename', 'setup'))
+    if not os.path.isdir(outputdir):
+        os.makedirs(outputdir)
+    data = text.encode('utf_8')
+    with open(base + '.exe', 'wb') as fp:
+        fp.write(data[:output_size(text)].ljust(output_size(text), b'\0'))
+    if setup_value(text, 'DiskSpanning').lower() == 'yes':
+        with open(base + '-1.bin', 'wb') as fp:
+            fp.write(b'\0' * 1000)
+    print('Successful compile')
+    return 0
+
+
+def launcher(dirname):
+    """write an executable which runs the stub, return its path"""
+    stub = os.path.abspath(__file__)
+    if sys.platform == 'win32':
+        filename = os.path.join(dirname, 'ISCC.cmd')
+        with open(filename, 'w') as fp:
+            fp.write('@"%s" "%s" %%*\n' % (sys.executable, stub))
+    else:
+        filename = os.path.join(dirname, 'ISCC')
+        with open(filename, 'w') as fp:
+            fp.write('#!/bin/sh\nexec "%s" "%s" "$@"\n'
+                     % (sys.executable, stub))
+        os.chmod(filename, 0o755)
+    return filename
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
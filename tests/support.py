@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""builds of a small project compiled by the stub compiler"""
+
+import os
+import io
+import shutil
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+import stubiscc
+from innosetup import locate
+from innosetup.cache import LanguageIndex
+from innosetup.innosetup import InnoScript, VariantBuilder
+from innosetup.standalone import ManifestBuilder
+
+
+class BuildTestCase(unittest.TestCase):
+    """a project with `dist` files, built by `build()`
+
+    Compiles are counted by `compiles`, the output of the last build is in
+    `output`.
+    """
+
+    files = {
+        'dist/app.exe': b'app',
+        'dist/lib/a.pyd': b'pyd',
+        'dist/lib/data.txt': b'data',
+    }
+    # files of the manifest
+    manifest_files = [{'path': 'app.exe', 'role': 'windows'}, 'lib\\a.pyd',
+                      'lib\\data.txt']
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.project = os.path.join(self.tmpdir, 'project')
+        for name, data in self.files.items():
+            self.write(name, data)
+        self.iscc = stubiscc.launcher(self.tmpdir)
+        self.calls = os.path.join(self.tmpdir, 'calls.txt')
+
+        patcher = mock.patch.dict(os.environ, STUBISCC_CALLS=self.calls)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(locate, 'languageindex', LanguageIndex(
+            os.path.join(self.tmpdir, 'languages.json')))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(os.chdir, os.getcwd())
+        self.output = ''
+
+    def write(self, name, data, project=None):
+        filename = os.path.join(project or self.project,
+                                name.replace('/', os.sep))
+        if not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        with open(filename, 'wb') as fp:
+            fp.write(data)
+        return filename
+
+    def builder(self, project=None, **options):
+        """get the builder of `project`
+
+        The current directory is `project` like `setup.py`.
+        """
+        project = project or self.project
+        os.chdir(project)
+        manifest = dict(
+            dist_dir='dist',
+            metadata=dict(name='example', version='1.0',
+                          url='http://example.com/'),
+            files=self.manifest_files,
+            options=dict(dict(inno_setup_exe=self.iscc), **options),
+            )
+        return ManifestBuilder(manifest, project)
+
+    def create(self, project=None, compile=False, variant=None, **options):
+        """create the script of `project` or its `variant`"""
+        builder = self.builder(project, **options)
+        if variant:
+            builder = VariantBuilder(builder, variant)
+        script = InnoScript(builder)
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                script.create()
+                if compile:
+                    script.compile()
+        finally:
+            self.output = output.getvalue()
+        return script
+
+    def build(self, project=None, **options):
+        """create and compile the script of `project`"""
+        return self.create(project, compile=True, **options)
+
+    def section(self, script, name):
+        """get the lines of a section of the saved script"""
+        with open(script.issfile, encoding='utf_8_sig') as fp:
+            text = fp.read()
+        lines = []
+        current = None
+        for line in text.splitlines():
+            if line.startswith('['):
+                current = line.strip('[]')
+            elif current == name and line.strip():
+                lines.append(line)
+        return lines
+
+    @property
+    def compiles(self):
+        """the number of compiler runs"""
+        if not os.path.isfile(self.calls):
+            return 0
+        with open(self.calls) as fp:
+            return len(fp.read().splitlines())
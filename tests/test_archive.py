@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of zipping and hashing the setup file by `innosetup.archive`"""
+
+import os
+import json
+import random
+import shutil
+import hashlib
+import zipfile
+import tempfile
+import unittest
+from unittest import mock
+
+from innosetup import archive
+
+
+def sample(size):
+    """get data which is partly compressible"""
+    rand = random.Random(size)
+    data = bytearray()
+    while len(data) < size:
+        data += bytes(rand.getrandbits(8) for _ in range(256))
+        data += b'setup data ' * rand.randint(1, 500)
+    return bytes(data[:size])
+
+
+def sha256(filename):
+    with open(filename, 'rb') as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
+
+
+class ArchiveTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        # several chunks
+        patcher = mock.patch.object(archive, 'CHUNK_SIZE', 64 * 1024)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def setupfile(self, size):
+        self.data = sample(size)
+        filename = os.path.join(self.tmpdir, 'example-1.0-setup.exe')
+        with open(filename, 'wb') as fp:
+            fp.write(self.data)
+        return filename
+
+    def assertZip(self, setupfile, zipname, checksums):
+        """the zip has the setup file, checksums are of the files"""
+        with zipfile.ZipFile(zipname) as zip:
+            self.assertIsNone(zip.testzip())
+            self.assertEqual(zip.namelist(), [os.path.basename(setupfile)])
+            self.assertEqual(zip.read(os.path.basename(setupfile)),
+                             self.data)
+        self.assertEqual(checksums, {
+            os.path.basename(setupfile): {
+                'size': len(self.data), 'sha256': sha256(setupfile)},
+            os.path.basename(zipname): {
+                'size': os.path.getsize(zipname), 'sha256': sha256(zipname)},
+            })
+
+
+class PackageTest(ArchiveTestCase):
+
+    def test_compressions(self):
+        setupfile = self.setupfile(300 * 1024 + 7)
+        zipname = os.path.join(self.tmpdir, 'example.zip')
+        for compression in sorted(archive.COMPRESSIONS):
+            checksums = archive.package(setupfile, zipname, compression)
+            self.assertZip(setupfile, zipname, checksums)
+            with zipfile.ZipFile(zipname) as zip:
+                self.assertEqual(zip.infolist()[0].compress_type,
+                                 archive.COMPRESSIONS[compression])
+
+    def test_level(self):
+        setupfile = self.setupfile(200 * 1024)
+        zipname = os.path.join(self.tmpdir, 'example.zip')
+        self.assertZip(setupfile, zipname,
+                       archive.package(setupfile, zipname, level='1'))
+
+    def test_empty(self):
+        setupfile = self.setupfile(0)
+        zipname = os.path.join(self.tmpdir, 'example.zip')
+        self.assertZip(setupfile, zipname, archive.package(setupfile, zipname))
+
+    def test_no_zip(self):
+        setupfile = self.setupfile(100 * 1024)
+        self.assertEqual(archive.package(setupfile), {
+            os.path.basename(setupfile): {
+                'size': len(self.data), 'sha256': sha256(setupfile)}})
+        self.assertEqual(archive.checksum(setupfile),
+                         {'size': len(self.data),
+                          'sha256': sha256(setupfile)})
+
+    def test_unknown_compression(self):
+        setupfile = self.setupfile(10)
+        self.assertRaises(ValueError, archive.package, setupfile,
+                          os.path.join(self.tmpdir, 'example.zip'), 'rar')
+
+
+class ParallelPackageTest(ArchiveTestCase):
+
+    def test_sizes(self):
+        zipname = os.path.join(self.tmpdir, 'example.zip')
+        # empty, one chunk, chunk boundaries and a part of a chunk
+        for size in (0, 1, 64 * 1024, 128 * 1024, 300 * 1024 + 7):
+            setupfile = self.setupfile(size)
+            checksums = archive.parallel_package(setupfile, zipname,
+                                                 workers=3)
+            self.assertZip(setupfile, zipname, checksums)
+
+    def test_zip64(self):
+        setupfile = self.setupfile(100 * 1024)
+        zipname = os.path.join(self.tmpdir, 'example.zip')
+        archive.parallel_package(setupfile, zipname, level=9, workers=2)
+        with zipfile.ZipFile(zipname) as zip:
+            info = zip.infolist()[0]
+            self.assertEqual(info.compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(info.file_size, len(self.data))
+            self.assertEqual(info.CRC, zipfile.crc32(self.data))
+            self.assertEqual(info.flag_bits & 0x08, 0x08)
+
+    def test_package(self):
+        setupfile = self.setupfile(200 * 1024)
+        zipname = os.path.join(self.tmpdir, 'example.zip')
+        with mock.patch.object(archive, 'parallel_package',
+                               wraps=archive.parallel_package) as parallel:
+            checksums = archive.package(setupfile, zipname, workers='4')
+        self.assertEqual(parallel.call_count, 1)
+        self.assertZip(setupfile, zipname, checksums)
+
+
+class ChecksumsTest(ArchiveTestCase):
+
+    def test_write_checksums(self):
+        setupfile = self.setupfile(1000)
+        zipname = os.path.join(self.tmpdir, 'example.zip')
+        checksums = archive.package(setupfile, zipname)
+        basename = os.path.join(self.tmpdir, 'example-1.0-setup')
+        filenames = archive.write_checksums(basename, checksums)
+        self.assertEqual(filenames, [basename + '.json',
+                                     basename + '.sha256sums'])
+        with open(basename + '.json') as fp:
+            self.assertEqual(json.load(fp), checksums)
+        # the format of `sha256sum -c`
+        with open(basename + '.sha256sums') as fp:
+            self.assertEqual(fp.read(), '%s *example-1.0-setup.exe\n'
+                             '%s *example.zip\n' % (sha256(setupfile),
+                                                     sha256(zipname)))
+
+
+if __name__ == '__main__':
+    unittest.main()
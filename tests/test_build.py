@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of incremental builds, the installer cache and the compiler driver
+with the stub compiler
+"""
+
+import os
+import time
+import shutil
+import unittest
+from unittest import mock
+
+from innosetup.compiler import CompileError
+from support import BuildTestCase
+
+
+class FingerprintTest(BuildTestCase):
+
+    def test_compile(self):
+        script = self.build()
+        self.assertTrue(os.path.isfile(script.setupfile))
+        self.assertEqual(self.compiles, 1)
+        self.assertIn('compiling distutils.iss: 100%', self.output)
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.project, 'dist', 'distutils.log')))
+
+    def test_unchanged(self):
+        self.build()
+        script = self.build()
+        self.assertEqual(self.compiles, 1)
+        self.assertIn('%s is up-to-date' % script.setupfile, self.output)
+
+    def test_force_compile(self):
+        self.build()
+        self.build(force_compile=True)
+        self.assertEqual(self.compiles, 2)
+
+    def test_changed_payload(self):
+        self.build()
+        self.write('dist/lib/data.txt', b'changed')
+        self.build()
+        self.assertEqual(self.compiles, 2)
+
+    def test_wildcard_source(self):
+        self.write('dist/extra/sub/doc.txt', b'doc')
+        inno_script = ('[Files]\n'
+                       'Source: "extra\\*"; DestDir: "{app}\\extra"; '
+                       'Flags: recursesubdirs\n')
+        self.build(inno_script=inno_script)
+        self.build(inno_script=inno_script)
+        self.assertEqual(self.compiles, 1)
+        self.write('dist/extra/sub/doc.txt', b'changed')
+        self.build(inno_script=inno_script)
+        self.assertEqual(self.compiles, 2)
+
+    def test_license(self):
+        self.write('license.txt', b'license')
+        script = self.build()
+        self.assertEqual(script.iss_metadata['LicenseFile'],
+                         '..\\license.txt')
+        self.build()
+        self.assertEqual(self.compiles, 1)
+        self.write('license.txt', b'changed')
+        self.build()
+        self.assertEqual(self.compiles, 2)
+
+
+class CacheTest(BuildTestCase):
+
+    def setUp(self):
+        BuildTestCase.setUp(self)
+        self.cache = os.path.join(self.tmpdir, 'cache')
+        self.write('license.txt', b'license')
+
+    def checkout(self):
+        """copy the project to another place without the build results"""
+        other = os.path.join(self.tmpdir, 'other')
+        shutil.copytree(self.project, other, ignore=shutil.ignore_patterns(
+            'example-*', 'distutils*'))
+        return other
+
+    def test_other_checkout(self):
+        self.build(cache_dir=self.cache)
+        other = self.checkout()
+        script = self.build(other, cache_dir=self.cache)
+        self.assertEqual(self.compiles, 1)
+        self.assertIn('restored from cache', self.output)
+        self.assertTrue(script.setupfile.startswith(other))
+        self.assertTrue(os.path.isfile(script.setupfile))
+
+    def test_other_license(self):
+        self.build(cache_dir=self.cache)
+        other = self.checkout()
+        self.write('license.txt', b'other license', other)
+        self.build(other, cache_dir=self.cache)
+        self.assertEqual(self.compiles, 2)
+        self.assertNotIn('restored from cache', self.output)
+
+    def test_miss(self):
+        self.build(cache_dir=self.cache)
+        self.write('dist/lib/data.txt', b'changed')
+        self.build(cache_dir=self.cache)
+        self.assertEqual(self.compiles, 2)
+
+    def test_back_to_cached(self):
+        self.build(cache_dir=self.cache)
+        self.write('dist/lib/data.txt', b'changed')
+        self.build(cache_dir=self.cache)
+        self.write('dist/lib/data.txt', b'data')
+        self.build(cache_dir=self.cache)
+        self.assertEqual(self.compiles, 2)
+        self.assertIn('restored from cache', self.output)
+
+
+class CompileErrorTest(BuildTestCase):
+
+    def test_exit_code(self):
+        with mock.patch.dict(os.environ, STUBISCC_EXIT='2'):
+            with self.assertRaises(CompileError) as cm:
+                self.build()
+        self.assertEqual(cm.exception.result.returncode, 2)
+        with open(os.path.join(self.project, 'dist', 'distutils.log')) as fp:
+            self.assertIn('Error on line 1', fp.read())
+        # compiled again, the failure isn't up-to-date
+        self.build()
+        self.assertEqual(self.compiles, 2)
+
+    def test_timeout(self):
+        start = time.perf_counter()
+        with mock.patch.dict(os.environ, STUBISCC_SLEEP='30'):
+            with self.assertRaises(CompileError) as cm:
+                self.build(compile_timeout=0.5)
+        self.assertIn('timed out', str(cm.exception))
+        self.assertIsNone(cm.exception.result.returncode)
+        self.assertLess(time.perf_counter() - start, 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
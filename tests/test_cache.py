@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of the shared installer cache (`InstallerCache`)"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from innosetup import cache
+
+
+class InstallerCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.root = os.path.join(self.tmpdir, 'cache')
+
+    def write(self, name, data):
+        filename = os.path.join(self.tmpdir, name)
+        with open(filename, 'wb') as fp:
+            fp.write(data)
+        return filename
+
+    def read(self, cache_, key, name='setup.exe'):
+        dst = os.path.join(self.tmpdir, 'got.exe')
+        if not cache_.get(key, name, dst):
+            return None
+        with open(dst, 'rb') as fp:
+            return fp.read()
+
+    def test_put(self):
+        installers = cache.InstallerCache(self.root)
+        installers.put('abcdef', 'setup.exe', self.write('a.exe', b'setup'))
+        self.assertEqual(self.read(installers, 'abcdef'), b'setup')
+        self.assertIsNone(self.read(installers, 'abcxyz'))
+        self.assertEqual((installers.hits, installers.misses), (1, 1))
+
+    def test_evict(self):
+        # the prefix directory of an evicted entry is removed
+        installers = cache.InstallerCache(self.root, maxsize=10)
+        installers.put('abcdef', 'setup.exe', self.write('a.exe', b'a' * 8))
+        os.utime(installers.entry('abcdef'), (1, 1))
+        installers.put('cdefab', 'setup.exe', self.write('c.exe', b'c' * 8))
+        self.assertEqual(os.listdir(self.root), ['cd'])
+        self.assertIsNone(self.read(installers, 'abcdef'))
+        self.assertEqual(self.read(installers, 'cdefab'), b'c' * 8)
+        # an entry can be stored under the removed prefix again
+        installers.put('abcdef', 'setup.exe', self.write('a.exe', b'a' * 4))
+        self.assertEqual(self.read(installers, 'abcdef'), b'a' * 4)
+
+    def test_shared_prefix(self):
+        installers = cache.InstallerCache(self.root, maxsize=10)
+        installers.put('abcdef', 'setup.exe', self.write('a.exe', b'a' * 8))
+        os.utime(installers.entry('abcdef'), (1, 1))
+        installers.put('ab1234', 'setup.exe', self.write('b.exe', b'b' * 8))
+        self.assertEqual(os.listdir(os.path.join(self.root, 'ab')),
+                         ['ab1234'])
+
+    def test_clear(self):
+        installers = cache.InstallerCache(self.root)
+        installers.put('abcdef', 'setup.exe', self.write('a.exe', b'a'))
+        installers.put('cdefab', 'setup.exe', self.write('c.exe', b'c'))
+        installers.clear()
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_race(self):
+        # both puts copy the file before either renames its entry
+        barrier = threading.Barrier(2, timeout=10)
+        copyfile = shutil.copyfile
+
+        def wait(src, dst):
+            barrier.wait()
+            return copyfile(src, dst)
+
+        installers = [cache.InstallerCache(self.root) for _ in range(2)]
+        srcs = [self.write('%d.exe' % i, b'setup') for i in range(2)]
+        errors = []
+
+        def put(installer, src):
+            try:
+                installer.put('abcdef', 'setup.exe', src)
+            except Exception as e:
+                errors.append(e)
+
+        with mock.patch.object(cache.shutil, 'copyfile', side_effect=wait):
+            threads = [threading.Thread(target=put, args=i)
+                       for i in zip(installers, srcs)]
+            for i in threads:
+                i.start()
+            for i in threads:
+                i.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.read(installers[0], 'abcdef'), b'setup')
+        # no temporary nor trash directories are left
+        self.assertEqual(os.listdir(self.root), ['ab'])
+        self.assertEqual(os.listdir(installers[0].entry('abcdef')),
+                         ['setup.exe'])
+
+
+if __name__ == '__main__':
+    unittest.main()
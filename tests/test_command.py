@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of the py2exe patches and variants of `innosetup.command`
+
+They are skipped without `py2exe`.
+"""
+
+import os
+import io
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import importlib
+import contextlib
+import modulefinder
+from distutils.errors import DistutilsExecError, DistutilsOptionError
+
+from innosetup.cache import ModuleGraphCache
+from innosetup.trace import Tracer
+from support import BuildTestCase
+
+try:
+    from innosetup import command
+except ImportError:
+    command = None
+
+
+def write(filename, text=''):
+    if not os.path.isdir(os.path.dirname(filename)):
+        os.makedirs(os.path.dirname(filename))
+    with open(filename, 'w') as fp:
+        fp.write(text)
+
+
+@unittest.skipIf(command is None, 'py2exe is not installed')
+class PackagePathMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.extra = os.path.join(self.tmpdir, 'extra')
+        # like win32com which adds win32comext to its __path__
+        write(os.path.join(self.tmpdir, 'site', 'extpkg', '__init__.py'),
+              '__path__.append(%r)\n' % self.extra)
+        write(os.path.join(self.extra, 'sub', '__init__.py'))
+        write(os.path.join(self.tmpdir, 'site', 'nspkg', 'mod.py'))
+        sys.path.insert(0, os.path.join(self.tmpdir, 'site'))
+        self.addCleanup(sys.path.remove, os.path.join(self.tmpdir, 'site'))
+        self.addCleanup(self.unload)
+        importlib.invalidate_caches()
+        self.map = command.PackagePathMap()
+
+    def unload(self):
+        for name in list(sys.modules):
+            if name.split('.')[0] in ('extpkg', 'nspkg'):
+                del sys.modules[name]
+
+    def test_extended_path(self):
+        self.assertEqual(self.map.get('extpkg'), [self.extra])
+        # found in the extra directory, it has no extra path
+        self.assertEqual(self.map.get('extpkg.sub', None), [])
+        self.assertEqual(self.map.locations('extpkg.sub'),
+                         [os.path.join(self.extra, 'sub')])
+
+    def test_not_imported(self):
+        self.assertEqual(self.map.get('nspkg'), [])
+        self.assertEqual(self.map.get('nspkg.mod'), [])
+        self.assertIsNone(self.map.get('nspkg.missing'))
+        self.assertEqual(self.map.get('missing_pkg', 'default'), 'default')
+        self.assertNotIn('nspkg', sys.modules)
+        self.assertNotIn('nspkg.mod', sys.modules)
+
+    def test_memo(self):
+        self.map.get('extpkg')
+        self.map.get('extpkg')
+        self.map.get('missing_pkg')
+        self.map.get('missing_pkg')
+        self.assertEqual((self.map.lookups, self.map.hits), (4, 2))
+
+
+@unittest.skipIf(command is None, 'py2exe is not installed')
+class ModifiedDLLTest(unittest.TestCase):
+
+    def test_modified_dlls(self):
+        # they are staged privately
+        for name in ('python34.dll', 'PYTHON3.DLL', 'python27_d.dll'):
+            self.assertTrue(command.modified_dlls.match(name), name)
+        for name in ('pythoncom34.dll', 'pywintypes34.dll', 'python.exe'):
+            self.assertFalse(command.modified_dlls.match(name), name)
+
+
+@unittest.skipIf(command is None, 'py2exe is not installed')
+class CachingModuleFinderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.src = os.path.join(self.tmpdir, 'src')
+        write(os.path.join(self.src, 'main.py'),
+              'import helper\nfrom pkg import sub\n'
+              'def f():\n    import lazy\n')
+        write(os.path.join(self.src, 'helper.py'), 'from pkg import *\n')
+        write(os.path.join(self.src, 'lazy.py'))
+        write(os.path.join(self.src, 'pkg', '__init__.py'), 'name = 1\n')
+        write(os.path.join(self.src, 'pkg', 'sub.py'), 'from . import other\n')
+        write(os.path.join(self.src, 'pkg', 'other.py'))
+        self.cachefile = os.path.join(self.tmpdir, 'modules.json')
+
+    def find(self):
+        """get the modules of main.py and the cache"""
+        class Finder(command.CachingModuleFinder, modulefinder.ModuleFinder):
+            graphcache = ModuleGraphCache(self.cachefile)
+
+        finder = Finder([self.src])
+        finder.run_script(os.path.join(self.src, 'main.py'))
+        Finder.graphcache.save()
+        modules = dict((name, (sorted(m.globalnames), sorted(m.starimports)))
+                       for name, m in finder.modules.items())
+        return modules, Finder.graphcache
+
+    def test_replay(self):
+        modules, cache = self.find()
+        self.assertEqual(sorted(modules), [
+            '__main__', 'helper', 'lazy', 'pkg', 'pkg.other', 'pkg.sub'])
+        self.assertEqual((cache.hits, cache.misses), (0, 6))
+        # the same graph without scanning the code
+        again, cache = self.find()
+        self.assertEqual(again, modules)
+        self.assertEqual((cache.hits, cache.misses), (6, 0))
+
+    def test_invalidate(self):
+        self.find()
+        filename = os.path.join(self.src, 'helper.py')
+        write(filename, 'import added\n')
+        write(os.path.join(self.src, 'added.py'))
+        st = os.stat(filename)
+        os.utime(filename, (st.st_atime, st.st_mtime + 10))
+        modules, cache = self.find()
+        self.assertIn('added', modules)
+        self.assertEqual(modules['helper'], (['added'], []))
+        self.assertEqual((cache.hits, cache.misses), (5, 2))
+
+
+@unittest.skipIf(command is None, 'py2exe is not installed')
+class BuildVariantsTest(BuildTestCase):
+
+    def build_variants(self, variants, **options):
+        """run `innosetup.build_variants` with a manifest builder"""
+        builder = self.builder(**options)
+        builder.variants = variants
+        builder.variant_jobs = 2
+        builder.tracer = Tracer()
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                command.innosetup.build_variants(builder)
+        finally:
+            self.output = output.getvalue()
+        return builder
+
+    def setupfile(self, variant):
+        return os.path.join(self.project, 'dist',
+                            'example-1.0-%s-setup.exe' % variant)
+
+    def test_variants(self):
+        builder = self.build_variants(json.dumps([
+            {'name': 'full'}, {'name': 'lite', 'exclude_files': ['lib/*']}]))
+        self.assertTrue(os.path.isfile(self.setupfile('full')))
+        self.assertTrue(os.path.isfile(self.setupfile('lite')))
+        self.assertEqual(self.compiles, 2)
+        # phases of the variants are in the command's trace
+        variants = set(entry['args'].get('variant')
+                       for entry in builder.tracer.phases)
+        self.assertEqual(variants, {None, 'full', 'lite'})
+
+    def test_failed_variant(self):
+        # create() of "broken" fails, "full" is built anyway
+        with self.assertRaises(DistutilsExecError) as cm:
+            self.build_variants([
+                {'name': 'broken', 'update_from': 'missing.files.json'},
+                {'name': 'full'}])
+        self.assertIn('1 of 2 variants failed: broken', str(cm.exception))
+        self.assertTrue(os.path.isfile(self.setupfile('full')))
+
+    def test_shared_zip(self):
+        with self.assertRaises(DistutilsExecError) as cm:
+            self.build_variants([
+                {'name': 'full', 'zip': 'example.zip'},
+                {'name': 'lite', 'zip': 'example.zip'}])
+        self.assertIn('variants failed: lite', str(cm.exception))
+        self.assertIn('also written by variant full', self.output)
+
+    def test_names(self):
+        for variants in ([{'name': 'a'}, {'name': 'a'}], [{}]):
+            self.assertRaises(DistutilsOptionError, self.build_variants,
+                              variants)
+
+
+if __name__ == '__main__':
+    unittest.main()
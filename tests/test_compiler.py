@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of reading the compiler output in `innosetup.compiler`"""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from innosetup.compiler import Compiler
+
+
+def read(compiler, data):
+    """get the log and events of `compiler` reading `data`"""
+    events = []
+    compiler.callback = lambda event, value: events.append((event, value))
+
+    async def run():
+        stream = asyncio.StreamReader()
+        stream.feed_data(data)
+        stream.feed_eof()
+        log = []
+        await compiler._read(stream, log)
+        return log
+
+    with mock.patch('locale.getpreferredencoding', return_value='utf_8'):
+        return asyncio.run(run()), events
+
+
+class ReadTest(unittest.TestCase):
+
+    def test_split_character(self):
+        # 'é' is split between the first and the second chunk
+        line = 'a' * 4095 + '\xe9b'
+        log, _ = read(Compiler('ISCC'), (line + '\r\nend').encode('utf_8'))
+        self.assertEqual(log, [line, 'end'])
+
+    def test_incomplete_character(self):
+        log, _ = read(Compiler('ISCC'), b'abc\xc3')
+        self.assertEqual(log, ['abc\ufffd'])
+
+    def test_progress(self):
+        _, events = read(Compiler('ISCC', files=3), (
+            'Compiler\n   Compressing: a.exe\r\n'
+            '   Compressing: b.pyd\n   Compressing: c.txt\n').encode('utf_8'))
+        self.assertEqual([i for i in events if i[0] != 'line'], [
+            ('file', 'a.exe'), ('progress', 33),
+            ('file', 'b.pyd'), ('progress', 66),
+            ('file', 'c.txt'), ('progress', 100)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of release manifests and update installers (`innosetup.delta`)"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from innosetup import delta
+from support import BuildTestCase
+
+
+def entry(size, digest):
+    return {'size': size, 'sha256': digest}
+
+
+class DiffTest(unittest.TestCase):
+
+    def test_diff(self):
+        previous = {'app.exe': entry(1, 'a'), 'lib\\a.pyd': entry(2, 'b'),
+                    'lib\\old.txt': entry(3, 'c')}
+        current = {'app.exe': entry(1, 'a'), 'lib\\a.pyd': entry(2, 'x'),
+                   'lib\\new.txt': entry(3, 'c')}
+        self.assertEqual(delta.diff(previous, current),
+                         (['lib\\a.pyd'], ['lib\\new.txt'], ['lib\\old.txt']))
+
+    def test_case_insensitive(self):
+        # removed paths are spelled as the previous release
+        previous = {'APP.EXE': entry(1, 'a'), 'Lib\\A.pyd': entry(2, 'b'),
+                    'Lib\\Old.txt': entry(3, 'c')}
+        current = {'app.exe': entry(1, 'a'), 'lib\\a.pyd': entry(4, 'b')}
+        self.assertEqual(delta.diff(previous, current),
+                         (['lib\\a.pyd'], [], ['Lib\\Old.txt']))
+
+    def test_size(self):
+        self.assertEqual(delta.diff({'a': entry(1, 'a')},
+                                    {'a': entry(2, 'a')}), (['a'], [], []))
+
+    def test_release_files(self):
+        self.assertEqual(delta.release_files(
+            {'lib\\a.pyd': '/dist/lib/a.pyd'},
+            {'/dist/lib/a.pyd': (3, 1.0, 'abc')}),
+            {'lib\\a.pyd': entry(3, 'abc')})
+
+
+class ReleaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def test_roundtrip(self):
+        filename = os.path.join(self.tmpdir, 'setup.files.json')
+        files = {'app.exe': entry(1, 'a')}
+        delta.write_release(filename, '{{APPID}', '1.0', files)
+        self.assertEqual(delta.read_release(filename), dict(
+            app_id='{{APPID}', version='1.0', files=files))
+
+    def test_not_release(self):
+        filename = os.path.join(self.tmpdir, 'setup.files.json')
+        with open(filename, 'w') as fp:
+            json.dump({'files': []}, fp)
+        self.assertRaises(ValueError, delta.read_release, filename)
+
+
+class UpdateTest(BuildTestCase):
+
+    def release(self):
+        """build the first release and keep its release manifest"""
+        script = self.build(release_manifest=True)
+        filename = os.path.splitext(script.setupfile)[0] + '.files.json'
+        previous = os.path.join(self.tmpdir, 'previous.files.json')
+        shutil.copy(filename, previous)
+        return previous
+
+    def test_release_manifest(self):
+        with open(self.release()) as fp:
+            release = json.load(fp)
+        self.assertEqual(release['version'], '1.0')
+        self.assertEqual(sorted(release['files']),
+                         ['app.exe', 'lib\\a.pyd', 'lib\\data.txt'])
+        self.assertEqual(release['files']['lib\\data.txt']['size'], 4)
+
+    def test_update(self):
+        previous = self.release()
+        with open(previous) as fp:
+            release = json.load(fp)
+        # the previous release spelled the names in another case
+        release['files']['APP.EXE'] = release['files'].pop('app.exe')
+        with open(previous, 'w') as fp:
+            json.dump(release, fp)
+
+        self.write('dist/lib/data.txt', b'changed')
+        self.write('dist/lib/b.pyd', b'new')
+        self.manifest_files = [{'path': 'app.exe', 'role': 'windows'},
+                               'lib\\b.pyd', 'lib\\data.txt']
+        script = self.build(update_from=previous)
+        self.assertEqual([line.split(';')[:2]
+                          for line in self.section(script, 'Files')], [
+            ['Source: "lib\\b.pyd"', ' DestDir: "{app}\\lib"'],
+            ['Source: "lib\\data.txt"', ' DestDir: "{app}\\lib"'],
+            ])
+        self.assertEqual(self.section(script, 'InstallDelete'), [
+            'Type: files; Name: "{app}\\lib\\a.pyd"'])
+        self.assertIn('1 changed, 1 added, 1 removed, 1 unchanged',
+                      self.output)
+
+    def test_other_appid(self):
+        previous = self.release()
+        with open(previous) as fp:
+            release = json.load(fp)
+        release['app_id'] = '{{00000000-0000-0000-0000-000000000000}'
+        with open(previous, 'w') as fp:
+            json.dump(release, fp)
+        with self.assertRaises(ValueError):
+            self.build(update_from=previous)
+
+
+if __name__ == '__main__':
+    unittest.main()
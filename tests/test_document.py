@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of the script document (`IssDocument`, `IssSection`, `IssEntry`)"""
+
+import os
+import codecs
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from innosetup.innosetup import (IssDocument, IssEntry, IssSection,
+                                 parse_issline)
+
+
+class EntryTest(unittest.TestCase):
+
+    def test_quote(self):
+        entry = IssEntry(Source='say "hello".txt', DestDir='{app}',
+                         Flags='ignoreversion')
+        self.assertEqual(str(entry), 'Source: "say ""hello"".txt"; '
+                         'DestDir: "{app}"; Flags: ignoreversion')
+        self.assertEqual(parse_issline(str(entry)), entry.params)
+
+    def test_parsed(self):
+        line = 'Source:  "a.txt" ;DestDir: {app}'
+        entry = IssEntry.parse(line)
+        self.assertEqual(entry['DestDir'], '{app}')
+        self.assertEqual(str(entry), line)
+        entry['DestDir'] = '{app}\\doc'
+        self.assertEqual(str(entry),
+                         'Source: "a.txt"; DestDir: "{app}\\doc"')
+
+    def test_parse_quoted(self):
+        self.assertEqual(parse_issline(
+            'Name: "a ""b""; c"; Parameters: "";  Flags: x y'),
+            {'Name': 'a "b"; c', 'Parameters': '', 'Flags': 'x y'})
+        self.assertEqual(parse_issline('; Source: "a.txt"'), {})
+
+
+class SectionTest(unittest.TestCase):
+
+    def test_addline(self):
+        files = IssSection('Files', '[Files]')
+        files.addline('Source: "a.txt"; DestDir: "{app}"')
+        files.addline('; a comment')
+        self.assertEqual(len(files.entries), 1)
+        setup = IssSection('Setup', '[Setup]')
+        setup.addline('AppName=a: b')
+        self.assertEqual(setup.entries, [])
+        self.assertEqual(setup.text(), '[Setup]\nAppName=a: b\n')
+
+    def test_setdirective(self):
+        setup = IssSection('Setup', '[Setup]')
+        setup.write('compression=zip\n')
+        setup.write('\n')
+        setup.setdirective('Compression', 'lzma2')
+        setup.setdirective('SolidCompression', 'yes')
+        self.assertEqual(setup.text(), '[Setup]\nCompression=lzma2\n'
+                         'SolidCompression=yes\n\n')
+
+
+class DocumentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.filename = os.path.join(self.tmpdir, 'distutils.iss')
+        self.doc = IssDocument()
+        self.doc.preamble.write('; comment\n')
+        self.doc.add_section('Files').issline(Source='テ.txt',
+                                              DestDir='{app}')
+
+    def test_section(self):
+        self.assertIs(self.doc.section('FILES'), self.doc.sections[1])
+        self.assertIsNone(self.doc.section('Run'))
+
+    def test_save(self):
+        self.doc.save(self.filename)
+        with open(self.filename, 'rb') as fp:
+            data = fp.read()
+        self.assertEqual(data, codecs.BOM_UTF8 + (
+            '; comment\n[Files]\nSource: "テ.txt"; DestDir: "{app}"\n'
+            ).encode('utf_8'))
+        self.assertEqual(os.listdir(self.tmpdir), ['distutils.iss'])
+
+    def test_atomic(self):
+        # the saved script is kept if the new one can't be renamed to it
+        with open(self.filename, 'w') as fp:
+            fp.write('old')
+        with mock.patch('os.replace', side_effect=OSError('busy')):
+            self.assertRaises(OSError, self.doc.save, self.filename)
+        with open(self.filename) as fp:
+            self.assertEqual(fp.read(), 'old')
+        self.assertEqual(os.listdir(self.tmpdir), ['distutils.iss'])
+        self.doc.save(self.filename)
+        with open(self.filename, encoding='utf_8_sig') as fp:
+            self.assertEqual(fp.read(), self.doc.text())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests that importing `innosetup` imports only what it needs"""
+
+import os
+import sys
+import subprocess
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported(statement):
+    """get modules of the package and `py2exe` imported by `statement`"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.check_output([sys.executable, '-c', (
+        '%s\nimport sys\nprint(" ".join(sorted(i for i in sys.modules '
+        'if i.split(".")[0] in ("innosetup", "py2exe"))))') % statement],
+        env=env)
+    return out.decode().split()
+
+
+class ImportTest(unittest.TestCase):
+
+    def test_package(self):
+        self.assertEqual(imported('import innosetup'),
+                         ['innosetup', 'innosetup.innosetup'])
+
+    def test_script(self):
+        self.assertEqual(
+            imported('from innosetup.innosetup import InnoScript'),
+            ['innosetup', 'innosetup.innosetup'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of file name conditions (`innosetup.match`)"""
+
+import os
+import unittest
+
+from innosetup.innosetup import findfiles
+from innosetup.match import Matcher, patterns
+
+
+def old_findfiles(filenames, *conditions):
+    """`findfiles` before `Matcher`"""
+    def check(filename):
+        filename = filename.lower()
+        for i in conditions:
+            i = i.lower()
+            if i.startswith('.'):  # compare ext
+                if os.path.splitext(filename)[1] != i:
+                    return
+            elif i.count('.') == 1:  # compare basename
+                if os.path.basename(filename) != i:
+                    return
+            else:  # contains
+                if i not in os.path.basename(filename):
+                    return
+        return True
+
+    return [i for i in filenames if check(i)]
+
+
+NAMES = [
+    'python34.dll', 'lib/_ssl.pyd', 'lib/pywintypes34.dll', 'w9xpopen.exe',
+    'Microsoft.VC90.CRT.manifest', 'msvcr90.dll', 'msvcp90.dll',
+    'mfc90.dll', 'mfc90u.dll', 'mfcm90.dll', 'lib/tcl/tk8.6/tk.tcl',
+    'x86_microsoft.vc90.crt_1fc8b3b9a1e18e3b_9.0.21022.8_x-ww_d08d0375'
+    '.manifest', 'amd64_microsoft.vc90.crt_1fc8b3b9a1e18e3b_9.0.21022.8_'
+    'none_750b37ff97f4f68b.manifest', 'data/archive.tar.gz', 'doc/[1].txt',
+    'doc/1.txt',
+]
+
+
+class MatcherTest(unittest.TestCase):
+
+    def matches(self, *conditions, **kwargs):
+        return Matcher(conditions, **kwargs).filter(NAMES)
+
+    def test_old_conditions(self):
+        # the conditions `InnoScript` gives to `findfiles`
+        for conditions in (
+                ['python34.dll'], ['w9xpopen.exe'], ['mfc90.dll'], ['mfc'],
+                ['Microsoft.VC90.CRT', '9.0.21022.8', 'x86', '.manifest'],
+                ['msvcr', '.dll'], ['.DLL'], ['vc90'], ['lib']):
+            self.assertEqual(findfiles(NAMES, *conditions),
+                             old_findfiles(NAMES, *conditions), conditions)
+
+    def test_any(self):
+        self.assertEqual(self.matches('.pyd', 'w9xpopen.exe'),
+                         ['lib/_ssl.pyd', 'w9xpopen.exe'])
+        self.assertEqual(Matcher([]).filter(NAMES), [])
+
+    def test_separators(self):
+        matcher = Matcher(['re:^lib/tcl/', 'lib/*.pyd'])
+        self.assertTrue(matcher.match('lib\\tcl\\tk8.6\\tk.tcl'))
+        self.assertTrue(matcher.match('LIB\\_SSL.PYD'))
+        self.assertFalse(matcher.match('_ssl.pyd'))
+
+    def test_glob(self):
+        self.assertEqual(self.matches('*.pyd'), ['lib/_ssl.pyd'])
+        self.assertEqual(self.matches('mfc??.dll'), ['mfc90.dll'])
+        self.assertEqual(self.matches('mfc[!m]*.dll'),
+                         ['mfc90.dll', 'mfc90u.dll'])
+        # `*` doesn't match a separator
+        self.assertEqual(self.matches('lib/*.tcl'), [])
+        self.assertEqual(self.matches('lib/*/*/*.tcl'),
+                         ['lib/tcl/tk8.6/tk.tcl'])
+        self.assertEqual(self.matches('glob:python34.dll'), ['python34.dll'])
+
+    def test_regex(self):
+        self.assertEqual(self.matches(r're:^mfc\d+\.dll$'), ['mfc90.dll'])
+
+    def test_multiple_dots(self):
+        # an extension of dots matches, `findfiles` compared the last one
+        self.assertEqual(self.matches('.tar.gz'), ['data/archive.tar.gz'])
+        self.assertEqual(old_findfiles(NAMES, '.tar.gz'), [])
+        self.assertEqual(self.matches('.gz'), ['data/archive.tar.gz'])
+
+    def test_bracket(self):
+        # `[` starts a glob class, `findfiles` compared it literally
+        self.assertEqual(self.matches('[1].txt'), ['doc/1.txt'])
+        self.assertEqual(self.matches('[[]1].txt'), ['doc/[1].txt'])
+        self.assertEqual(self.matches(r're:\[1\]\.txt$'), ['doc/[1].txt'])
+        self.assertEqual(self.matches('[1'), [])
+
+    def test_patterns(self):
+        self.assertEqual(patterns(' *.pdb, re:^lib/tests/ ,'),
+                         ['*.pdb', 're:^lib/tests/'])
+        self.assertEqual(patterns(['*.pdb']), ['*.pdb'])
+        self.assertEqual(patterns(''), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of `innosetup.peresource` against the sample DLLs in `data`
+
+The DLLs are written by `data/mkresources.py`.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from innosetup import peresource
+
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SAMPLES = ('resources32.dll', 'resources64.dll', )
+
+
+class PEResourceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def sample(self, name, data):
+        filename = os.path.join(self.tmpdir, name)
+        with open(filename, 'wb') as fp:
+            fp.write(data)
+        return filename
+
+    def test_load_manifest(self):
+        for name in SAMPLES:
+            manifest = peresource.load_manifest(os.path.join(DATA, name))
+            self.assertTrue(manifest.startswith('<?xml'), name)
+            self.assertIn('name="innosetup.tests"', manifest)
+
+    def test_versioninfo(self):
+        # the English table of the first translation, not the first table
+        for name in SAMPLES:
+            self.assertEqual(
+                peresource.versioninfo(os.path.join(DATA, name)), {
+                    'CompanyName': 'Example Corporation',
+                    'FileDescription': 'innosetup test resources',
+                    'FileVersion': '1.2.3.4',
+                    'ProductName': 'innosetup',
+                    })
+
+    def test_resources(self):
+        with peresource.PEFile(os.path.join(DATA, SAMPLES[0])) as pe:
+            self.assertEqual(list(pe.resources(10)),
+                             [('SAMPLE', 0, b'sample data')])
+            self.assertIsNone(pe.resource(3))
+
+    def test_not_pe(self):
+        for data in (b'', b'MZ' + b'\0' * 100, b'text file\n'):
+            filename = self.sample('bad.dll', data)
+            self.assertRaises(ValueError, peresource.versioninfo, filename)
+
+    def test_truncated(self):
+        with open(os.path.join(DATA, SAMPLES[0]), 'rb') as fp:
+            data = fp.read()
+        filename = self.sample('truncated.dll', data[:0x100])
+        self.assertRaises(ValueError, peresource.load_manifest, filename)
+
+    def test_parse_versioninfo(self):
+        self.assertEqual(peresource.parse_versioninfo(b''), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
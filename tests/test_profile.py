@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of `innosetup.profile` and profiling with the stub compiler"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import stubiscc
+from innosetup import profile
+from support import BuildTestCase
+
+
+def result(seconds, size, error=None, **settings):
+    return dict(settings=settings or {'Compression': 'lzma2'},
+                seconds=seconds, size=size, error=error)
+
+
+class ProfileTest(unittest.TestCase):
+
+    def test_profiles(self):
+        profiles = profile.profiles(profile.MATRIX)
+        self.assertEqual(len(profiles), 14)
+        for settings in profiles:
+            if settings['Compression'] == 'zip/9':
+                self.assertNotIn('LZMANumBlockThreads', settings)
+            else:
+                self.assertIn('LZMANumBlockThreads', settings)
+
+    def test_load_matrix(self):
+        self.assertEqual(profile.load_matrix(''), profile.MATRIX)
+        self.assertEqual(profile.load_matrix('{"LZMANumBlockThreads": [1]}'),
+                         {'LZMANumBlockThreads': ['1']})
+
+    def test_parse_budget(self):
+        self.assertEqual(profile.parse_budget('time=120, size=500'),
+                         {'time': 120.0, 'size': 500.0})
+        self.assertEqual(profile.parse_budget(''), {})
+        self.assertRaises(ValueError, profile.parse_budget, 'memory=1')
+
+    def test_output_size(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        for name, size in (('profile-1.exe', 100), ('profile-1-1.bin', 10),
+                           ('profile-1-2.bin', 1), ('profile-10.exe', 1000),
+                           ('profile-10-1.bin', 10000), ('profile-1.iss', 5)):
+            with open(os.path.join(tmpdir, name), 'wb') as fp:
+                fp.write(b'\0' * size)
+        self.assertEqual(profile.output_size(tmpdir, 'profile-1'), 111)
+        self.assertEqual(profile.output_size(tmpdir, 'profile-10'), 11000)
+
+    def test_choose_smallest(self):
+        results = [result(10, 3000), result(20, 2000), result(5, 4000)]
+        self.assertIs(profile.choose(results), results[1])
+
+    def test_choose_size_budget(self):
+        # the fastest within the size
+        results = [result(10, 3 << 20), result(20, 2 << 20),
+                   result(5, 4 << 20)]
+        self.assertIs(profile.choose(results, {'size': 3}), results[0])
+
+    def test_choose_time_budget(self):
+        results = [result(10, 3000), result(20, 2000), result(5, 4000)]
+        self.assertIs(profile.choose(results, {'time': 15}), results[0])
+        self.assertIs(profile.choose(results, {'time': 15, 'size': 1}),
+                      results[0])
+
+    def test_choose_over_budget(self):
+        results = [result(10, 3000), result(20, 2000)]
+        self.assertIs(profile.choose(results, {'time': 1}), results[1])
+
+    def test_choose_failed_and_spanning(self):
+        results = [result(None, None, 'failed'),
+                   result(5, 1000, DiskSpanning='yes'),
+                   result(10, 3000, DiskSpanning='no')]
+        self.assertIs(profile.choose(results), results[2])
+        self.assertIsNone(profile.choose(results[:2]))
+
+
+class ProfileBuildTest(BuildTestCase):
+
+    options = dict(
+        profile_compression=True,
+        profile_matrix=json.dumps({'Compression': ['zip/9', 'lzma2/max'],
+                                   'DiskSpanning': ['no', 'yes']}),
+        )
+
+    def test_profile(self):
+        script = self.build(**self.options)
+        # 4 profiles and the installer
+        self.assertEqual(self.compiles, 5)
+        self.assertIn('(disk spanning, not chosen)', self.output)
+        self.assertIn('chosen compression profile: Compression=lzma2/max, '
+                      'DiskSpanning=no', self.output)
+        with open(script.issfile, encoding='utf_8_sig') as fp:
+            text = fp.read()
+        self.assertIn('Compression=lzma2/max', text)
+        self.assertIn('DiskSpanning=no', text)
+        with open(os.path.splitext(script.issfile)[0] +
+                  '.profile.json') as fp:
+            report = json.load(fp)
+        self.assertEqual(len(report['results']), 4)
+        self.assertEqual(report['chosen'], {'Compression': 'lzma2/max',
+                                            'DiskSpanning': 'no'})
+        self.assertEqual(os.path.getsize(script.setupfile),
+                         stubiscc.output_size(text))
+
+    def test_unchanged(self):
+        self.build(**self.options)
+        self.build(**self.options)
+        self.assertEqual(self.compiles, 5)
+        self.assertNotIn('profile', self.output)
+
+    def test_changed_matrix(self):
+        self.build(**self.options)
+        options = dict(self.options, profile_matrix=json.dumps(
+            {'Compression': ['zip/9', 'lzma2/max']}))
+        self.build(**options)
+        self.assertEqual(self.compiles, 5 + 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
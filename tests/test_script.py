@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of scripts made by `InnoScript`"""
+
+import os
+import unittest
+
+from innosetup.innosetup import parse_issline
+from support import BuildTestCase
+
+
+class SetupTest(BuildTestCase):
+
+    def directives(self, script):
+        return [line.split('=', 1)[0].lower()
+                for line in self.section(script, 'Setup')]
+
+    def test_user_directive(self):
+        script = self.build(inno_script='[Setup]\nAppName=Other\n')
+        self.assertEqual(self.directives(script).count('appname'), 1)
+        self.assertIn('AppName=Other', self.section(script, 'Setup'))
+
+    def test_case_insensitive(self):
+        # the generated AppName and AppId aren't given again
+        script = self.build(inno_script=(
+            '[Setup]\nappname=Other\nappid={{11111111-2222-3333-4444-'
+            '555555555555}\noutputdir=out\n'))
+        directives = self.directives(script)
+        for name in ('appname', 'appid', 'outputdir'):
+            self.assertEqual(directives.count(name), 1, name)
+        self.assertIn('appname=Other', self.section(script, 'Setup'))
+        self.assertEqual(script.iss_metadata['AppName'], 'Other')
+        self.assertEqual(script.iss_metadata['OutputDir'], 'out')
+        self.assertNotIn('automatically generated', self.output)
+        self.assertEqual(os.path.dirname(script.setupfile),
+                         os.path.join(self.project, 'dist', 'out'))
+        self.assertTrue(os.path.isfile(script.setupfile))
+
+
+class ReferencesTest(BuildTestCase):
+    """user entries replace generated ones of the same file"""
+
+    manifest_files = BuildTestCase.manifest_files + [
+        {'path': 'svc.exe', 'role': 'service'}]
+
+    def setUp(self):
+        BuildTestCase.setUp(self)
+        self.write('dist/svc.exe', b'svc')
+
+    def sources(self, script):
+        return [parse_issline(line)['Source']
+                for line in self.section(script, 'Files')]
+
+    def test_isskey(self):
+        script = self.create()
+        for path in ('lib\\a.pyd', 'lib/a.pyd', 'LIB\\A.PYD',
+                     '{app}\\lib\\a.pyd', '{APP}\\Lib\\a.pyd',
+                     '.\\lib\\a.pyd',
+                     os.path.join(self.project, 'dist', 'lib', 'a.pyd')):
+            self.assertEqual(script.isskey(path), 'lib\\a.pyd', path)
+        self.assertEqual(script.isskey('lib\\*'), 'lib')
+        self.assertEqual(script.isskey('{app}\\lib\\*'), 'lib')
+
+    def test_files(self):
+        script = self.create(inno_script=(
+            '[Files]\nSource: "{app}\\LIB\\A.pyd"; DestDir: "{sys}"\n'))
+        self.assertEqual(self.sources(script), [
+            'app.exe', 'svc.exe', 'lib\\data.txt', '{app}\\LIB\\A.pyd'])
+
+    def test_files_exact(self):
+        # neither a prefix nor a directory of a file replaces it
+        script = self.create(inno_script=(
+            '[Files]\nSource: "app"; DestDir: "{app}"\n'
+            'Source: "lib\\*"; DestDir: "{app}\\lib"\n'))
+        self.assertEqual(self.sources(script), [
+            'app.exe', 'svc.exe', 'lib\\a.pyd', 'lib\\data.txt', 'app',
+            'lib\\*'])
+
+    def test_icons(self):
+        script = self.create(inno_script=(
+            '[Icons]\nName: "{group}\\Example"; '
+            'Filename: "{app}\\App.EXE"\n'))
+        icons = [parse_issline(line)['Filename']
+                 for line in self.section(script, 'Icons')]
+        self.assertEqual(icons, ['{app}\\App.EXE', '{uninstallexe}'])
+
+    def test_run(self):
+        script = self.create(inno_script=(
+            '[Run]\nFilename: "{app}\\SVC.exe"; Parameters: "-install"\n'))
+        self.assertEqual(self.section(script, 'Run'), [
+            'Filename: "{app}\\SVC.exe"; Parameters: "-install"'])
+        # not given by the user
+        self.assertEqual([parse_issline(line)['Parameters']
+                          for line in self.section(script, 'UninstallRun')],
+                         ['-remove'])
+
+
+class CoalesceTest(BuildTestCase):
+
+    manifest_files = BuildTestCase.manifest_files + [
+        'docs\\a.txt', 'docs\\sub\\b.txt', 'docs\\sub\\c.txt']
+
+    def setUp(self):
+        BuildTestCase.setUp(self)
+        for name in ('a.txt', 'sub/b.txt', 'sub/c.txt'):
+            self.write('dist/docs/' + name, b'doc')
+
+    def entries(self, script):
+        return [(params['Source'], params['DestDir']) for params in map(
+            parse_issline, self.section(script, 'Files'))]
+
+    def test_coalesce(self):
+        script = self.build(coalesce_files=True)
+        # lib has a binary file which has its own flags
+        self.assertEqual(self.entries(script), [
+            ('app.exe', '{app}\\'), ('lib\\a.pyd', '{app}\\lib'),
+            ('lib\\data.txt', '{app}\\lib'), ('docs\\*', '{app}\\docs')])
+        self.assertIn('coalesced [Files] entries: 2 lines saved', self.output)
+        self.assertTrue(os.path.isfile(script.setupfile))
+
+    def test_not_given(self):
+        # a file in the directory isn't installed
+        script = self.create(coalesce_files=True,
+                             exclude_files=['docs/sub/c.txt'])
+        self.assertEqual(self.entries(script)[3:], [
+            ('docs\\a.txt', '{app}\\docs'),
+            ('docs\\sub\\b.txt', '{app}\\docs\\sub')])
+
+    def test_off(self):
+        script = self.create()
+        self.assertEqual(len(self.entries(script)), 6)
+
+
+class VariantTest(BuildTestCase):
+
+    lite = dict(name='lite', setup={'Compression': 'zip'},
+                exclude_files=['lib/data.txt'])
+
+    def test_variant(self):
+        script = self.build(variant=self.lite)
+        self.assertEqual(os.path.basename(script.issfile),
+                         'distutils-lite.iss')
+        self.assertEqual(os.path.basename(script.setupfile),
+                         'example-1.0-lite-setup.exe')
+        self.assertTrue(os.path.isfile(script.setupfile))
+        self.assertIn('Compression=zip', self.section(script, 'Setup'))
+        self.assertEqual([parse_issline(line)['Source']
+                          for line in self.section(script, 'Files')],
+                         ['app.exe', 'lib\\a.pyd'])
+
+    def test_variants(self):
+        full = self.build(variant=dict(name='full'))
+        lite = self.build(variant=self.lite)
+        self.assertNotEqual(full.setupfile, lite.setupfile)
+        self.assertTrue(os.path.isfile(full.setupfile))
+        self.assertEqual(self.compiles, 2)
+
+    def test_user_directive(self):
+        # the variant's values are written instead of the user's, variants
+        # don't write the same setup file
+        script = self.create(variant=self.lite, inno_script=(
+            '[Setup]\ncompression=lzma2\nOutputBaseFilename=mine\n'))
+        setup = self.section(script, 'Setup')
+        self.assertNotIn('compression=lzma2', setup)
+        self.assertNotIn('OutputBaseFilename=mine', setup)
+        self.assertIn('Compression=zip', setup)
+        self.assertIn('OutputBaseFilename=example-1.0-lite-setup', setup)
+
+    def test_zipname(self):
+        script = self.create(variant=self.lite, zip='example.zip')
+        self.assertEqual(script.zipname, 'example-lite.zip')
+        script = self.create(variant=dict(self.lite, zip='lite.zip'),
+                             zip='example.zip')
+        self.assertEqual(script.zipname, 'lite.zip')
+        script = self.create(variant=self.lite, zip=True)
+        self.assertEqual(script.zipname, script.setupfile + '.zip')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of staging files by links (`innosetup.stage`)"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from innosetup import stage
+
+
+def fail(src, dst):
+    # a partial file is left like a failed clone does
+    with open(dst, 'wb') as fp:
+        fp.write(b'partial')
+    raise OSError('not supported')
+
+
+def unsupported(src, dst):
+    raise NotImplementedError
+
+
+class StagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.src = os.path.join(self.tmpdir, 'python34.dll')
+        with open(self.src, 'wb') as fp:
+            fp.write(b'source data')
+        self.dst = os.path.join(self.tmpdir, 'dist', 'python34.dll')
+        os.mkdir(os.path.dirname(self.dst))
+
+    def stager(self, mode, **methods):
+        stager = stage.Stager(mode)
+        stager.methods = dict(stager.methods, **methods)
+        return stager
+
+    def assertStaged(self, linked):
+        with open(self.dst, 'rb') as fp:
+            self.assertEqual(fp.read(), b'source data')
+        self.assertEqual(os.path.samefile(self.src, self.dst), linked)
+
+    def test_copy(self):
+        stager = self.stager('copy', reflink=fail, hardlink=fail)
+        self.assertEqual(stager.stage(self.src, self.dst), 'copy')
+        self.assertStaged(False)
+        self.assertEqual((stager.copied_bytes, stager.linked_bytes), (11, 0))
+
+    def test_fallback(self):
+        stager = self.stager('auto', reflink=fail)
+        self.assertEqual(stager.stage(self.src, self.dst), 'hardlink')
+        self.assertStaged(True)
+        self.assertEqual((stager.copied_bytes, stager.linked_bytes), (0, 11))
+
+    def test_all_failed(self):
+        stager = self.stager('auto', reflink=unsupported, hardlink=fail)
+        self.assertEqual(stager.stage(self.src, self.dst), 'copy')
+        self.assertStaged(False)
+
+    def test_private(self):
+        # a file modified in place isn't hardlinked nor symlinked
+        for mode in ('auto', 'hardlink', 'symlink'):
+            stager = self.stager(mode, reflink=fail)
+            self.assertEqual(stager.stage(self.src, self.dst, private=True),
+                             'copy', mode)
+            self.assertStaged(False)
+
+    def test_symlink(self):
+        stager = self.stager('symlink')
+        self.assertEqual(stager.stage(self.src, self.dst), 'symlink')
+        self.assertTrue(os.path.islink(self.dst))
+        self.assertStaged(True)
+
+    def test_other_device(self):
+        stager = self.stager('hardlink')
+        with mock.patch.object(stage, 'same_device', return_value=False):
+            self.assertEqual(stager.stage(self.src, self.dst), 'copy')
+        self.assertStaged(False)
+
+    def test_replace_link(self):
+        # a copy over a link doesn't write to the source
+        self.stager('hardlink').stage(self.src, self.dst)
+        with open(self.src, 'wb') as fp:
+            fp.write(b'new data')
+        self.stager('copy').stage(self.src, self.dst)
+        with open(self.dst, 'r+b') as fp:
+            fp.write(b'modified')
+        with open(self.src, 'rb') as fp:
+            self.assertEqual(fp.read(), b'new data')
+
+    def test_report(self):
+        stager = self.stager('auto', reflink=fail)
+        stager.stage(self.src, self.dst)
+        stager.stage(self.src, self.dst, private=True)
+        self.assertEqual(stager.counts, {'hardlink': 1, 'copy': 1})
+        self.assertEqual(stager.report(), 'staged 2 files: 0.0 MB copied, '
+                         '0.0 MB linked (copy 1, hardlink 1)')
+
+    def test_mode(self):
+        self.assertRaises(ValueError, stage.Stager, 'move')
+
+
+if __name__ == '__main__':
+    unittest.main()
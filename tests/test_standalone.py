@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""tests of `python -m innosetup generate`"""
+
+import os
+import io
+import json
+import unittest
+import contextlib
+
+from innosetup.__main__ import main
+from support import BuildTestCase
+
+
+class GenerateTest(BuildTestCase):
+
+    def generate(self, manifest):
+        filename = os.path.join(self.tmpdir, 'manifest.json')
+        with open(filename, 'w') as fp:
+            json.dump(manifest, fp)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(['generate', filename])
+        return output.getvalue().splitlines()[-1]
+
+    def test_no_dist_dir(self):
+        # generated before the files are built
+        issfile = self.generate(dict(
+            dist_dir='build/dist',
+            metadata=dict(name='example', version='1.0',
+                          url='http://example.com/'),
+            files=[{'path': 'app.exe', 'role': 'windows'}, 'lib\\a.pyd']))
+        self.assertEqual(issfile, os.path.join(
+            self.tmpdir, 'build', 'dist', 'distutils.iss'))
+        with open(issfile, encoding='utf_8_sig') as fp:
+            text = fp.read()
+        self.assertIn('#define PYTHON_DIR "{app}"\n', text)
+        self.assertIn('OutputDir=.\n', text)
+        self.assertIn('Source: "app.exe"', text)
+
+    def test_python_dir(self):
+        issfile = self.generate(dict(
+            metadata=dict(name='example', version='1.0'),
+            python=dict(dir='C:\\Python34')))
+        with open(issfile, encoding='utf_8_sig') as fp:
+            self.assertIn('#define PYTHON_DIR "C:\\Python34"\n', fp.read())
+
+    def test_error(self):
+        output = io.StringIO()
+        with contextlib.redirect_stderr(output):
+            with self.assertRaises(SystemExit):
+                self.generate(dict(files=[{'path': 'a', 'role': 'x'}]))
+        self.assertIn('unknown role: x', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()